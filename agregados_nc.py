@@ -0,0 +1,287 @@
+"""Contadores pré-agregados do dashboard de NC.
+
+Em vez de varrer todos os registros a cada rerun, o dashboard lê um agregado
+com contagens por (armazém, rua, nível, dia) e por (avaria, armazém, rua, nível, dia).
+
+O agregado do histórico interno fica em disco em duas partes: um snapshot
+(<caminho>) e um log de deltas (<caminho>.deltas.<geração>) onde cada
+gravação de NC só acrescenta uma linha. De tempos em tempos os deltas são
+incorporados num snapshot novo. Snapshot e deltas guardam a versão da fonte
+(tamanho/mtime dos arquivos, ou contagem no SQLite) que eles refletem: se a
+fonte mudar por fora do app (edição no Excel, cópia de arquivos), a versão
+não bate e o agregado é reconstruído.
+"""
+import json
+import os
+import threading
+from collections import Counter
+
+import pandas as pd
+
+import historico_uploads
+from armazenamento import COLUNAS_AVARIAS, FORMATO_DATA, avarias_para_bool, trava_arquivo
+
+DIMENSOES = ["Armazem", "Rua", "Local_Avaria"]
+VERSAO = 2
+MAX_DELTAS = 1000  # linhas no log de deltas antes de gerar um snapshot novo
+
+
+def _dia(data):
+    """'dd/mm/AAAA' -> 'AAAA-MM-DD' (vazio se não der para converter)."""
+    try:
+        return pd.to_datetime(data, format=FORMATO_DATA).strftime("%Y-%m-%d")
+    except (ValueError, TypeError):
+        return ""
+
+
+def _texto(valor):
+    return "" if valor is None or pd.isna(valor) else str(valor).strip()
+
+
+class AgregadoNC:
+    """Contagens de registros e de avarias marcadas por armazém × rua × nível × dia."""
+
+    def __init__(self, dimensoes=DIMENSOES):
+        self.total = 0
+        self.registros = Counter()   # (armazem, rua, nivel, dia) -> registros
+        self.avarias = Counter()     # (avaria, armazem, rua, nivel, dia) -> marcações "Sim"
+        self.dimensoes = set(dimensoes)
+        self.versao_fonte = None     # versão da fonte refletida (só no agregado do histórico interno)
+        self.geracao = 0
+        self.deltas = 0              # linhas de delta aplicadas sobre o snapshot
+
+    def copia(self):
+        agregado = AgregadoNC(self.dimensoes)
+        agregado.total = self.total
+        agregado.registros = self.registros.copy()
+        agregado.avarias = self.avarias.copy()
+        agregado.versao_fonte, agregado.geracao, agregado.deltas = self.versao_fonte, self.geracao, self.deltas
+        return agregado
+
+    # --- Atualização ---
+
+    def adicionar(self, registro):
+        """Soma um registro no formato salvo por salvar_nc (avarias 'Sim'/'Não')."""
+        chave = tuple(_texto(registro.get(d)) for d in DIMENSOES) + (_dia(registro.get("Data")),)
+        self.total += 1
+        self.registros[chave] += 1
+        for avaria in COLUNAS_AVARIAS:
+            valor = registro.get(avaria)
+            if valor is True or _texto(valor).lower() == "sim":
+                self.avarias[(avaria,) + chave] += 1
+
+    @classmethod
+    def de_dataframe(cls, df):
+        """Agrega um DataFrame inteiro de uma vez (usado na reconstrução e em arquivos enviados)."""
+        agregado = cls(dimensoes=[d for d in DIMENSOES if d in df.columns])
+        if df.empty:
+            return agregado
+        chaves = pd.DataFrame({d: df[d].astype(object).map(_texto) if d in df.columns else "" for d in DIMENSOES}, index=df.index)
+        datas = df["Data"] if "Data" in df.columns else pd.Series("", index=df.index)
+        chaves["Dia"] = pd.to_datetime(datas, format=FORMATO_DATA, errors="coerce").dt.strftime("%Y-%m-%d").fillna("")
+        colunas_chave = DIMENSOES + ["Dia"]
+
+        agregado.total = len(df)
+        for chave, n in chaves.groupby(colunas_chave).size().items():
+            agregado.registros[chave] = int(n)
+        bools = avarias_para_bool(df)
+        for avaria in bools.columns:
+            marcadas = bools[avaria]
+            if marcadas.any():
+                for chave, n in chaves[marcadas].groupby(colunas_chave).size().items():
+                    agregado.avarias[(avaria,) + chave] += int(n)
+        return agregado
+
+    # --- Consultas do dashboard ---
+
+    def por_avaria(self):
+        contagem = Counter()
+        for (avaria, *_), n in self.avarias.items():
+            contagem[avaria] += n
+        return {a: contagem[a] for a in COLUNAS_AVARIAS if contagem[a] > 0}
+
+    def por_dimensao(self, dimensao):
+        """Registros por valor da dimensão, do maior para o menor (como value_counts)."""
+        i = DIMENSOES.index(dimensao)
+        contagem = Counter()
+        for chave, n in self.registros.items():
+            if chave[i]:
+                contagem[chave[i]] += n
+        return pd.Series(dict(contagem.most_common()), dtype="int64")
+
+    # --- Persistência ---
+
+    def para_json(self):
+        return {
+            "versao": VERSAO,
+            "versao_fonte": self.versao_fonte,
+            "geracao": self.geracao,
+            "total": self.total,
+            "registros": [list(k) + [n] for k, n in self.registros.items()],
+            "avarias": [list(k) + [n] for k, n in self.avarias.items()],
+        }
+
+    @classmethod
+    def de_json(cls, conteudo):
+        agregado = cls()
+        agregado.versao_fonte = conteudo.get("versao_fonte")
+        agregado.geracao = conteudo.get("geracao", 0)
+        agregado.total = conteudo["total"]
+        agregado.registros = Counter({tuple(item[:-1]): item[-1] for item in conteudo["registros"]})
+        agregado.avarias = Counter({tuple(item[:-1]): item[-1] for item in conteudo["avarias"]})
+        return agregado
+
+
+def ler_agregado(caminho):
+    with open(caminho, "r", encoding="utf-8") as f:
+        conteudo = json.load(f)
+    if conteudo.get("versao") != VERSAO:
+        raise ValueError("Versão do agregado desatualizada")
+    return AgregadoNC.de_json(conteudo)
+
+
+def _gravar(caminho, agregado):
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(agregado.para_json(), f, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def _caminho_deltas(caminho, geracao):
+    return f"{caminho}.deltas.{geracao}"
+
+
+# Estado de leitura por caminho: (assinatura do snapshot, posição lida nos deltas, agregado)
+_leituras = {}
+_trava_leituras = threading.Lock()
+
+
+def carregar(caminho):
+    """Snapshot + deltas, lendo do log só as linhas novas desde a última chamada.
+
+    O agregado devolvido é compartilhado entre sessões: não alterar.
+    Levanta FileNotFoundError se não houver agregado e ValueError se ele estiver corrompido.
+    """
+    with _trava_leituras:
+        assinatura = os.stat(caminho)
+        assinatura = (assinatura.st_mtime_ns, assinatura.st_size, assinatura.st_ino)
+        estado = _leituras.get(caminho)
+        if estado is None or estado[0] != assinatura:
+            estado = (assinatura, 0, ler_agregado(caminho))
+        _, posicao, agregado = estado
+        try:
+            with open(_caminho_deltas(caminho, agregado.geracao), "rb") as f:
+                f.seek(posicao)
+                novos = f.read()
+        except FileNotFoundError:
+            novos = b""
+        completos = novos[:novos.rfind(b"\n") + 1]  # linha em escrita por outro processo fica para depois
+        if completos:
+            agregado = agregado.copia()
+            for linha in completos.splitlines():
+                try:
+                    delta = json.loads(linha)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Delta corrompido no agregado: {e}") from e
+                for registro in delta["registros"]:
+                    agregado.adicionar(registro)
+                agregado.versao_fonte = delta["versao_fonte"]
+                agregado.deltas += 1
+        _leituras[caminho] = (assinatura, posicao + len(completos), agregado)
+        return agregado
+
+
+def gravar(caminho, registros, anexar, versao_fonte):
+    """Grava os registros na fonte (`anexar`) e soma o delta no agregado, sob a trava do agregado.
+
+    `versao_fonte()` é lida antes e depois de anexar: se antes já não batia
+    com o agregado, a fonte mudou por fora e o agregado é descartado (a
+    próxima leitura reconstrói). Sem agregado em disco só grava na fonte.
+    """
+    with trava_arquivo(caminho):
+        antes = versao_fonte()
+        anexar(registros)
+        try:
+            _somar_delta(caminho, registros, antes, versao_fonte())
+        except FileNotFoundError:
+            pass
+        except Exception:
+            # Os registros já estão na fonte: melhor recalcular depois do que contar errado
+            descartar(caminho)
+
+
+def _somar_delta(caminho, registros, antes, depois):
+    agregado = carregar(caminho)
+    if agregado.versao_fonte != antes:
+        descartar(caminho)
+        return
+    if agregado.deltas + 1 >= MAX_DELTAS:
+        # Incorpora os deltas num snapshot da geração seguinte e apaga o log antigo
+        agregado = agregado.copia()
+        for registro in registros:
+            agregado.adicionar(registro)
+        agregado.versao_fonte = depois
+        _gravar_snapshot(caminho, agregado)
+        return
+    linha = json.dumps({"versao_fonte": depois, "registros": list(registros)}, ensure_ascii=False, default=str)
+    with open(_caminho_deltas(caminho, agregado.geracao), "ab") as f:
+        f.write(linha.encode("utf-8") + b"\n")
+
+
+def _gravar_snapshot(caminho, agregado):
+    """Grava o snapshot numa geração nova (deltas vazios). Chamar com a trava."""
+    antiga = agregado.geracao
+    agregado.geracao = antiga + 1
+    agregado.deltas = 0
+    _gravar(caminho, agregado)
+    for deltas in (_caminho_deltas(caminho, antiga), _caminho_deltas(caminho, agregado.geracao)):
+        try:
+            os.remove(deltas)
+        except FileNotFoundError:
+            pass
+
+
+def reconstruir(caminho, carregar_historico, versao_fonte):
+    """Recalcula o agregado a partir do histórico completo e grava em disco.
+
+    Versão e histórico são lidos sob a trava: uma gravação concorrente
+    (gravar) espera a reconstrução terminar em vez de ser sobrescrita.
+    """
+    with trava_arquivo(caminho):
+        versao = versao_fonte()
+        try:
+            atual = carregar(caminho)
+            if atual.versao_fonte == versao:
+                return atual  # outra sessão reconstruiu (ou uma gravação terminou) enquanto esta esperava a trava
+        except (OSError, ValueError, KeyError):
+            pass
+        agregado = AgregadoNC.de_dataframe(carregar_historico())
+        agregado.dimensoes = set(DIMENSOES)
+        agregado.versao_fonte = versao
+        try:
+            agregado.geracao = ler_agregado(caminho).geracao
+        except (OSError, ValueError, KeyError):
+            pass
+        _gravar_snapshot(caminho, agregado)
+    return agregado
+
+
+def agregar_arquivo(caminho):
+    """Leitor para o cache de dados: agrega um CSV de NC enviado (recalcula só se o arquivo mudar)."""
+    return AgregadoNC.de_dataframe(historico_uploads.ler_nc(caminho))
+
+
+def descartar(caminho):
+    """Apaga o agregado (ele será reconstruído na próxima leitura)."""
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+    pasta = os.path.dirname(caminho) or "."
+    prefixo = os.path.basename(caminho) + ".deltas."
+    for nome in os.listdir(pasta):
+        if nome.startswith(prefixo):
+            try:
+                os.remove(os.path.join(pasta, nome))
+            except OSError:
+                pass
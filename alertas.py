@@ -0,0 +1,319 @@
+"""Motor de alertas de temperatura em tempo real.
+
+As leituras são publicadas numa fila e avaliadas por uma thread própria
+(fora da thread da requisição). Cada regra guarda um estado pequeno por
+sensor/câmara e custa O(1) por leitura. Os alertas disparados vão para
+"sinks" plugáveis: arquivo de log (JSON por linha), webhook e memória.
+"""
+import json
+import os
+import queue
+import threading
+import urllib.request
+from collections import deque
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+ARQUIVO_ALERTAS = "alertas.log"
+MARGEM_REGISTRO = timedelta(minutes=1)  # processos diferentes anexam ao log com relógios de registro quase iguais
+
+
+def _hora_local(momento):
+    """Datetime com fuso -> hora local sem fuso (o formato de todo o histórico); sem fuso fica como está."""
+    if momento.tzinfo is not None:
+        return momento.astimezone().replace(tzinfo=None)
+    return momento
+
+
+def _alerta(regra, chave, leitura, mensagem):
+    return {
+        "regra": regra,
+        "chave": chave,
+        "timestamp": _hora_local(leitura["timestamp"]).isoformat(timespec="seconds"),
+        "temperatura": leitura["temperatura"],
+        "mensagem": mensagem,
+    }
+
+
+# --- REGRAS ---
+# Cada regra recebe (chave, leitura) e devolve um alerta ou None.
+# A leitura é um dict com 'temperatura' (float) e 'timestamp' (datetime).
+# As regras de faixa aceitam `limites`: função chave -> (lie, lse), para
+# cada câmara ter os próprios limites (lie/lse ficam como padrão).
+
+def _limites_fixos(lie, lse):
+    return lambda chave: (lie, lse)
+
+
+class RegraConsecutivos:
+    """N leituras seguidas fora da faixa (dispara uma vez por sequência)."""
+    nome = "consecutivos"
+
+    def __init__(self, n, lie, lse, limites=None):
+        self.n = n
+        self.limites = limites or _limites_fixos(lie, lse)
+        self._seguidas = {}
+
+    def avaliar(self, chave, leitura):
+        lie, lse = self.limites(chave)
+        fora = not (lie <= leitura["temperatura"] <= lse)
+        seguidas = self._seguidas.get(chave, 0) + 1 if fora else 0
+        self._seguidas[chave] = seguidas
+        if seguidas == self.n:
+            return _alerta(self.nome, chave, leitura, f"{self.n} leituras seguidas fora da faixa ({lie}–{lse}ºC)")
+        return None
+
+
+class RegraTempoAcima:
+    """Temperatura acima do LSE por mais de X minutos seguidos."""
+    nome = "tempo_acima_lse"
+
+    def __init__(self, minutos, lse, limites=None):
+        self.duracao = timedelta(minutes=minutos)
+        self.minutos = minutos
+        self.limites = limites or _limites_fixos(None, lse)
+        self._inicio = {}    # chave -> instante em que passou do LSE
+        self._avisado = set()
+
+    def avaliar(self, chave, leitura):
+        lse = self.limites(chave)[1]
+        if leitura["temperatura"] <= lse:
+            self._inicio.pop(chave, None)
+            self._avisado.discard(chave)
+            return None
+        inicio = self._inicio.setdefault(chave, leitura["timestamp"])
+        if chave not in self._avisado and leitura["timestamp"] - inicio >= self.duracao:
+            self._avisado.add(chave)
+            return _alerta(self.nome, chave, leitura, f"Acima de {lse}ºC há mais de {self.minutos} min")
+        return None
+
+
+class _JanelaRegressao:
+    """Leituras de uma janela deslizante com as somas da reta de mínimos quadrados (O(1) por leitura)."""
+    __slots__ = ("origem", "pontos", "n", "sx", "sy", "sxx", "sxy")
+
+    REBASE = timedelta(hours=6)  # tempos relativos à origem ficam pequenos (somas sem cancelamento)
+
+    def __init__(self, origem):
+        self.origem = origem
+        self.pontos = deque()    # (timestamp, minutos desde a origem, temperatura)
+        self.n = self.sx = self.sy = self.sxx = self.sxy = 0.0
+
+    def _somar(self, x, y, sinal):
+        self.n += sinal
+        self.sx += sinal * x
+        self.sy += sinal * y
+        self.sxx += sinal * x * x
+        self.sxy += sinal * x * y
+
+    def adicionar(self, ts, temp, janela):
+        if ts - self.origem > self.REBASE:
+            self._rebase(ts - janela)
+        x = (ts - self.origem).total_seconds() / 60
+        self.pontos.append((ts, x, temp))
+        self._somar(x, temp, 1)
+        while self.pontos and ts - self.pontos[0][0] > janela:
+            _, x0, y0 = self.pontos.popleft()
+            self._somar(x0, y0, -1)
+
+    def _rebase(self, origem):
+        self.origem = origem
+        self.n = self.sx = self.sy = self.sxx = self.sxy = 0.0
+        pontos, self.pontos = self.pontos, deque()
+        for ts, _, temp in pontos:
+            x = (ts - origem).total_seconds() / 60
+            self.pontos.append((ts, x, temp))
+            self._somar(x, temp, 1)
+
+    def minutos_cobertos(self):
+        return (self.pontos[-1][0] - self.pontos[0][0]).total_seconds() / 60 if self.pontos else 0.0
+
+    def inclinacao(self):
+        """ºC/min da reta ajustada às leituras da janela."""
+        variancia = self.n * self.sxx - self.sx * self.sx
+        if self.n < 3 or variancia <= 0:
+            return 0.0
+        return (self.n * self.sxy - self.sx * self.sy) / variancia
+
+
+class RegraTaxaSubida:
+    """Subida mais rápida que X ºC/min: inclinação da reta ajustada às leituras da janela deslizante.
+
+    A taxa só é avaliada quando a janela cobre pelo menos `span_minimo_minutos`
+    (ruído entre duas leituras próximas não vira taxa). Depois de disparar, a
+    regra só rearma quando a taxa cai abaixo de `rearme` × limite.
+    """
+    nome = "taxa_subida"
+
+    def __init__(self, graus_por_minuto, janela_minutos=10, span_minimo_minutos=2, rearme=0.5):
+        self.limite = graus_por_minuto
+        self.janela = timedelta(minutes=janela_minutos)
+        self.span_minimo = span_minimo_minutos
+        self.limite_rearme = graus_por_minuto * rearme
+        self._janelas = {}    # chave -> _JanelaRegressao
+        self._avisado = set()
+
+    def avaliar(self, chave, leitura):
+        ts = leitura["timestamp"]
+        janela = self._janelas.get(chave)
+        if janela is None:
+            janela = self._janelas[chave] = _JanelaRegressao(ts)
+        janela.adicionar(ts, leitura["temperatura"], self.janela)
+        if janela.minutos_cobertos() < self.span_minimo:
+            return None
+        taxa = janela.inclinacao()
+        if chave in self._avisado:
+            if taxa < self.limite_rearme:
+                self._avisado.discard(chave)
+            return None
+        if taxa < self.limite:
+            return None
+        self._avisado.add(chave)
+        return _alerta(self.nome, chave, leitura, f"Subida de {taxa:.1f}ºC/min (limite {self.limite}ºC/min)")
+
+
+def regras_padrao(lie, lse, limites=None):
+    return [RegraConsecutivos(3, lie, lse, limites), RegraTempoAcima(15, lse, limites), RegraTaxaSubida(0.5, 5)]
+
+
+# --- SINKS ---
+
+class SinkArquivo:
+    """Acrescenta cada alerta como uma linha JSON no arquivo."""
+
+    def __init__(self, caminho=ARQUIVO_ALERTAS):
+        self.caminho = caminho
+        self._trava = threading.Lock()
+
+    def __call__(self, alerta):
+        with self._trava, open(self.caminho, "a", encoding="utf-8") as f:
+            f.write(json.dumps(alerta, ensure_ascii=False) + "\n")
+
+
+class SinkWebhook:
+    """POST do alerta em JSON para uma URL (ex.: um receptor local de testes)."""
+
+    def __init__(self, url, timeout=2):
+        self.url, self.timeout = url, timeout
+
+    def __call__(self, alerta):
+        requisicao = urllib.request.Request(self.url, data=json.dumps(alerta).encode("utf-8"),
+                                            headers={"Content-Type": "application/json"})
+        urllib.request.urlopen(requisicao, timeout=self.timeout).read()
+
+
+class SinkMemoria:
+    """Guarda os últimos alertas em memória (para exibir no próprio processo)."""
+
+    def __init__(self, maximo=50):
+        self.alertas = deque(maxlen=maximo)
+
+    def __call__(self, alerta):
+        self.alertas.append(alerta)
+
+
+# --- MOTOR ---
+
+class MotorAlertas:
+    def __init__(self, regras, sinks):
+        self.regras = regras
+        self.sinks = sinks
+        self.fila = queue.Queue()
+        self.avaliadas = 0
+        self.disparados = 0
+        self.erros_sink = 0
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._laco, name="motor-alertas", daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join()
+
+    def publicar(self, chave, temperatura, timestamp=None):
+        """Enfileira uma leitura; não bloqueia quem chamou."""
+        self.fila.put((chave, {"temperatura": float(temperatura), "timestamp": _hora_local(timestamp or datetime.now())}))
+
+    def publicar_lote(self, chaves, temperaturas, timestamps):
+        for chave, temp, ts in zip(chaves, temperaturas, timestamps):
+            if not pd.isna(temp):
+                self.fila.put((chave, {"temperatura": float(temp), "timestamp": _hora_local(pd.Timestamp(ts).to_pydatetime())}))
+
+    def avaliar(self, chave, leitura):
+        self.avaliadas += 1
+        for regra in self.regras:
+            alerta = regra.avaliar(chave, leitura)
+            if alerta is not None:
+                self._entregar(alerta)
+
+    def _entregar(self, alerta):
+        self.disparados += 1
+        # O timestamp é o da leitura (pode ser antigo, num reenvio); o log fica na ordem de registro
+        alerta["registrado_em"] = datetime.now().isoformat(timespec="seconds")
+        for sink in self.sinks:
+            try:
+                sink(alerta)
+            except Exception:
+                self.erros_sink += 1  # um sink fora do ar não pode parar os demais
+
+    def _laco(self):
+        while not self._parar.is_set() or not self.fila.empty():
+            try:
+                chave, leitura = self.fila.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            self.avaliar(chave, leitura)
+
+
+def _linhas_do_fim(caminho, bloco=64 * 1024):
+    """Linhas do arquivo da última para a primeira, lendo em blocos a partir do fim."""
+    with open(caminho, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        posicao, resto = f.tell(), b""
+        while posicao > 0:
+            tamanho = min(bloco, posicao)
+            posicao -= tamanho
+            f.seek(posicao)
+            partes = (f.read(tamanho) + resto).split(b"\n")
+            resto = partes[0]  # pode continuar no bloco anterior
+            for linha in reversed(partes[1:]):
+                if linha.strip():
+                    yield linha
+        if resto.strip():
+            yield resto
+
+
+def _registrado_em(alerta):
+    """Momento em que o alerta entrou no log (logs antigos: o da leitura), em hora local sem fuso."""
+    return _hora_local(datetime.fromisoformat(alerta.get("registrado_em") or alerta["timestamp"]))
+
+
+def ler_recentes(caminho=ARQUIVO_ALERTAS, desde=None, maximo=20):
+    """(total de alertas registrados desde `desde`, os `maximo` mais recentes) gravados pelo SinkArquivo.
+
+    Lê o arquivo do fim para o começo pela ordem de registro (registrado_em),
+    não pelo timestamp da leitura, que pode ser antigo num reenvio: para
+    quando passa de `desde` com folga de MARGEM_REGISTRO. O custo acompanha
+    os alertas do período, não o tamanho do log.
+    """
+    if not os.path.exists(caminho):
+        return 0, []
+    total, alertas = 0, []
+    for linha in _linhas_do_fim(caminho):
+        try:
+            alerta = json.loads(linha)
+            registrado_em = _registrado_em(alerta)
+        except (ValueError, TypeError, KeyError, AttributeError):
+            continue  # linha cortada por uma escrita em andamento ou sem data legível
+        if desde is not None and registrado_em < desde:
+            if registrado_em < desde - MARGEM_REGISTRO:
+                break
+            continue
+        total += 1
+        if len(alertas) < maximo:
+            alertas.append(alerta)
+    return total, alertas[::-1]
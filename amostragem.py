@@ -0,0 +1,109 @@
+"""Redução de séries temporais para o gráfico (LTTB e mín/máx por balde).
+
+O navegador não precisa de mais pontos do que pixels: a série é reduzida a
+um orçamento de pontos antes de ir para o plotly. Leituras fora dos limites
+de especificação (LIE/LSE) são sempre mantidas para nenhuma excursão sumir
+do gráfico.
+"""
+import numpy as np
+import pandas as pd
+
+PONTOS_MAXIMOS = 2000
+MODOS = {"LTTB": "lttb", "Mín/Máx por intervalo": "minmax"}
+
+
+def indices_lttb(x, y, alvo):
+    """Largest-Triangle-Three-Buckets: escolhe `alvo` índices preservando a forma da curva."""
+    n = len(y)
+    if alvo >= n or alvo < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Baldes internos (o primeiro e o último ponto são sempre mantidos)
+    limites = np.linspace(1, n - 1, alvo - 1).astype(np.int64)
+    selecionados = np.empty(alvo, dtype=np.int64)
+    selecionados[0] = 0
+    anterior = 0
+    for i in range(alvo - 2):
+        ini, fim = limites[i], limites[i + 1]
+        # Média do próximo balde (ou o último ponto, no último balde)
+        prox_ini, prox_fim = fim, limites[i + 2] if i + 2 < len(limites) else n
+        media_x = x[prox_ini:prox_fim].mean() if prox_fim > prox_ini else x[-1]
+        media_y = y[prox_ini:prox_fim].mean() if prox_fim > prox_ini else y[-1]
+        ax, ay = x[anterior], y[anterior]
+        areas = np.abs((ax - media_x) * (y[ini:fim] - ay) - (ax - x[ini:fim]) * (media_y - ay))
+        anterior = ini + int(np.argmax(areas)) if fim > ini else ini
+        selecionados[i + 1] = anterior
+    selecionados[-1] = n - 1
+    return np.unique(selecionados)
+
+
+def indices_minmax(y, alvo):
+    """Mínimo e máximo de cada balde (alvo/2 baldes de tamanho igual)."""
+    n = len(y)
+    if alvo >= n or alvo < 2:
+        return np.arange(n)
+    baldes = max(1, alvo // 2)
+    tamanho = int(np.ceil(n / baldes))
+    preenchido = np.full(baldes * tamanho, np.nan)
+    preenchido[:n] = np.asarray(y, dtype=np.float64)
+    matriz = preenchido.reshape(baldes, tamanho)
+    validos = ~np.all(np.isnan(matriz), axis=1)
+    base = np.arange(baldes)[validos] * tamanho
+    matriz = matriz[validos]
+    minimos = base + np.nanargmin(matriz, axis=1)
+    maximos = base + np.nanargmax(matriz, axis=1)
+    return np.unique(np.concatenate([[0, n - 1], minimos, maximos]))
+
+
+def reduzir_serie(df, col_x="Datetime", col_y="Temperatura", alvo=PONTOS_MAXIMOS,
+                  modo="lttb", lie=None, lse=None):
+    """Devolve no máximo ~`alvo` linhas de `df` (ordenado por col_x) + todas as excursões.
+
+    Se houver mais excursões do que metade do orçamento, elas também são
+    reduzidas por mín/máx, para o total continuar limitado.
+    """
+    n = len(df)
+    if n <= alvo:
+        return df
+    x = df[col_x].to_numpy()
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype("datetime64[ns]").astype(np.int64)
+    y = df[col_y].to_numpy(dtype=np.float64)
+
+    fora = np.zeros(n, dtype=bool)
+    if lie is not None:
+        fora |= y < lie
+    if lse is not None:
+        fora |= y > lse
+    idx_fora = np.flatnonzero(fora)
+    if len(idx_fora) > alvo // 2:
+        idx_fora = idx_fora[indices_minmax(y[idx_fora], alvo // 2)]
+
+    orcamento = max(3, alvo - len(idx_fora))
+    if modo == "minmax":
+        idx = indices_minmax(y, orcamento)
+    else:
+        idx = indices_lttb(x, y, orcamento)
+    return df.iloc[np.union1d(idx, idx_fora)]
+
+
+# --- JANELAS DE TEMPO ---
+
+JANELAS = {
+    "Últimas 24 horas": pd.Timedelta(days=1),
+    "Últimos 7 dias": pd.Timedelta(days=7),
+    "Últimos 30 dias": pd.Timedelta(days=30),
+    "Últimos 365 dias": pd.Timedelta(days=365),
+    "Tudo": None,
+}
+
+
+def recortar_janela(df, janela, col_x="Datetime", referencia=None):
+    """Filtra df (ordenado por col_x) para a janela terminando em `referencia` (padrão: último ponto)."""
+    duracao = JANELAS.get(janela)
+    if duracao is None or df.empty:
+        return df
+    fim = referencia if referencia is not None else df[col_x].iloc[-1]
+    inicio = df[col_x].searchsorted(fim - duracao, side="left")
+    return df.iloc[inicio:]
@@ -0,0 +1,168 @@
+"""Análise de NC somando todos os arquivos do histórico de uploads (e os dados atuais).
+
+Cada arquivo vira um agregado parcial pequeno: registros e marcações de avaria
+por (dia, armazém, rua, nível, SKU). Como os arquivos do histórico são
+endereçados por conteúdo, o parcial de um arquivo nunca muda: é calculado uma
+vez (num pool de processos quando há vários pendentes), gravado ao lado do
+CSV como <hash>.parcial.parquet e mantido em memória. Uma consulta só
+concatena os parciais do período e soma.
+
+O parcial dos registros internos (backend) fica em memória junto com a
+versão do histórico de NC (backend.versao_nc()) e só é recalculado quando
+ela muda.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import historico_uploads
+from armazenamento import COLUNAS_AVARIAS, PARQUET_DISPONIVEL, tipar_nc
+
+CHAVES = ["Dia", "Armazem", "Rua", "Local_Avaria", "SKU"]
+HOTSPOT = ["Armazem", "Rua", "Local_Avaria"]
+SUFIXO_PARCIAL = ".parcial.parquet"
+MAX_PROCESSOS = 4
+
+_parciais = {}   # hash do arquivo -> parcial (o conteúdo do arquivo nunca muda)
+_atuais = {}     # nome do backend -> (versão do histórico de NC, parcial)
+_trava = threading.Lock()
+
+
+def _vazio():
+    return pd.DataFrame({c: pd.Series(dtype="datetime64[ns]" if c == "Dia" else object) for c in CHAVES}
+                        | {c: pd.Series(dtype="int64") for c in ["Registros", "Avarias"] + COLUNAS_AVARIAS})
+
+
+def parcial(tipado):
+    """Agrega NC no layout tipado (Timestamp + avarias bool) por CHAVES."""
+    if tipado.empty:
+        return _vazio()
+    df = pd.DataFrame({"Dia": tipado["Timestamp"].dt.normalize()})
+    for col in CHAVES[1:]:
+        df[col] = tipado[col].astype(object).where(tipado[col].notna(), "").map(lambda v: str(v).strip())
+    df["Registros"] = 1
+    for col in COLUNAS_AVARIAS:
+        df[col] = tipado[col].fillna(False).astype("int64")
+    df["Avarias"] = df[COLUNAS_AVARIAS].sum(axis=1)
+    return df.groupby(CHAVES, as_index=False, sort=False).sum()
+
+
+# --- PARCIAIS DO HISTÓRICO ---
+
+def caminho_parcial(caminho_csv):
+    return os.path.splitext(caminho_csv)[0] + SUFIXO_PARCIAL
+
+
+def calcular_parcial(caminho_csv):
+    """Lê um arquivo do histórico e devolve seu parcial, gravando-o em disco quando possível.
+
+    Roda nos processos do pool, por isso só recebe e devolve dados serializáveis.
+    """
+    resultado = parcial(tipar_nc(historico_uploads.ler_nc(caminho_csv)))
+    if PARQUET_DISPONIVEL:
+        destino = caminho_parcial(caminho_csv)
+        temporario = f"{destino}.{os.getpid()}.tmp"
+        try:
+            resultado.to_parquet(temporario, index=False)
+            os.replace(temporario, destino)
+        except OSError:
+            pass  # sem disco o parcial ainda fica em memória
+    return resultado
+
+
+def _ler_parcial(caminho_csv):
+    destino = caminho_parcial(caminho_csv)
+    if not PARQUET_DISPONIVEL or not os.path.exists(destino):
+        return None
+    try:
+        return pd.read_parquet(destino)
+    except Exception:
+        return None  # parcial corrompido: recalcula
+
+
+def _no_periodo(entrada, inicio, fim):
+    """Pelo período do manifesto dá para pular arquivos sem abrir (sem datas: sempre entra)."""
+    if not entrada.get("data_min"):
+        return True
+    return (fim is None or entrada["data_min"] <= fim.strftime("%Y-%m-%d")) and \
+           (inicio is None or entrada["data_max"] >= inicio.strftime("%Y-%m-%d"))
+
+
+def parciais_historico(pasta, inicio=None, fim=None, max_processos=MAX_PROCESSOS):
+    """Parciais dos arquivos do histórico que têm dados no período (datas inclusivas)."""
+    entradas = [e for e in historico_uploads.listar(pasta) if _no_periodo(e, inicio, fim)]
+    with _trava:
+        # Arquivo que saiu do manifesto (retenção) sai da memória também
+        for chave in set(_parciais) - set(historico_uploads.ler_manifesto(pasta)):
+            del _parciais[chave]
+        faltando = [e for e in entradas if e["hash"] not in _parciais]
+
+    calculados = {}
+    pendentes = []
+    for entrada in faltando:
+        lido = _ler_parcial(entrada["caminho"])
+        if lido is None:
+            pendentes.append(entrada)
+        else:
+            calculados[entrada["hash"]] = lido
+
+    processos = min(max_processos, len(pendentes), os.cpu_count() or 1)
+    if processos > 1:
+        with ProcessPoolExecutor(max_workers=processos) as pool:
+            for entrada, resultado in zip(pendentes, pool.map(calcular_parcial, [e["caminho"] for e in pendentes])):
+                calculados[entrada["hash"]] = resultado
+    else:
+        for entrada in pendentes:
+            calculados[entrada["hash"]] = calcular_parcial(entrada["caminho"])
+
+    with _trava:
+        _parciais.update(calculados)
+        return [_parciais[e["hash"]] for e in entradas if e["hash"] in _parciais]
+
+
+def parcial_atual(backend):
+    """Parcial dos registros internos; relê o histórico só quando backend.versao_nc() muda."""
+    versao = backend.versao_nc()  # lida antes: gravação no meio da leitura só força recalcular na próxima
+    with _trava:
+        guardado = _atuais.get(backend.nome)
+    if guardado is not None and guardado[0] == versao:
+        return guardado[1]
+    resultado = parcial(backend.carregar_nc_tipado())
+    with _trava:
+        _atuais[backend.nome] = (versao, resultado)
+    return resultado
+
+
+# --- CONSULTAS ---
+
+def combinar(parciais, inicio=None, fim=None):
+    """Soma os parciais (mesma chave em arquivos diferentes vira uma linha) dentro do período."""
+    parciais = [p for p in parciais if not p.empty]
+    if not parciais:
+        return _vazio()
+    df = pd.concat(parciais, ignore_index=True)
+    if inicio is not None:
+        df = df[df["Dia"] >= pd.Timestamp(inicio)]
+    if fim is not None:
+        df = df[df["Dia"] <= pd.Timestamp(fim)]
+    return df.groupby(CHAVES, as_index=False, sort=False).sum()
+
+
+def tendencia_semanal(combinado):
+    """Registros e avarias por semana (semana começando na segunda)."""
+    semanas = combinado["Dia"].dt.to_period("W-SUN").dt.start_time.rename("Semana")
+    return combinado.groupby(semanas)[["Registros", "Avarias"] + COLUNAS_AVARIAS].sum().sort_index()
+
+
+def top_skus(combinado, n=10):
+    """SKUs com mais marcações de avaria (empate: mais registros)."""
+    por_sku = combinado[combinado["SKU"] != ""].groupby("SKU")[["Avarias", "Registros"] + COLUNAS_AVARIAS].sum()
+    return por_sku.sort_values(["Avarias", "Registros"], ascending=False).head(n)
+
+
+def pontos_criticos(combinado, n=10):
+    """Combinações armazém × rua × nível com mais registros."""
+    por_local = combinado.groupby(HOTSPOT)[["Registros", "Avarias"]].sum()
+    return por_local.sort_values(["Registros", "Avarias"], ascending=False).head(n).reset_index()
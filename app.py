@@ -6,6 +6,20 @@ import os
 import time
 import shutil
 
+from armazenamento import criar_backend, grupo_gravacao, normalizar_nc, nc_para_csv
+import dados
+import agregados_nc
+import ingestao
+import amostragem
+import alertas
+import camaras
+import historico_uploads
+import analise_nc
+import cep
+import perfil
+import fila_gravacao
+from indices import construir_indice_sku, construir_diretorio_usuarios, tentativas_login
+
 # --- CONFIGURAÇÕES DA PÁGINA ---
 st.set_page_config(
     page_title="ColdSpec | Qualidade",
@@ -19,9 +33,47 @@ ARQUIVO_DADOS_TEMP = "dados_temperatura.csv"
 ARQUIVO_DADOS_NC = "dados_nao_conformidade.csv"
 ARQUIVO_SKU = "sku (1).csv"
 PASTA_HISTORICO = "historico_uploads"
+PASTA_PARQUET = "dados_parquet"
+ARQUIVO_SQLITE = "coldspec.db"
+ARQUIVO_CAMARAS = "camaras.csv"
+CARGOS_ADMIN = {"supervisor"}  # cargos (users.csv, coluna tipo) que veem a página de Performance
+
+# "csv" (padrão), "parquet" ou "sqlite" — ver migrar_historico.py para converter o histórico
+BACKEND_ARMAZENAMENTO = os.environ.get("COLDSPEC_BACKEND", "csv")
+
+@st.cache_resource
+def obter_backend(nome):
+    """Uma instância por processo, compartilhada entre sessões (conexões, travas)."""
+    return criar_backend(nome, ARQUIVO_DADOS_TEMP, ARQUIVO_DADOS_NC, PASTA_PARQUET, ARQUIVO_SQLITE)
 
-LIE = 2.0
-LSE = 7.0
+backend = obter_backend(BACKEND_ARMAZENAMENTO)
+ARQUIVO_AGREGADO_NC = f"agregado_nc_{BACKEND_ARMAZENAMENTO}.json"
+ARQUIVO_FILA_GRAVACAO = f"fila_gravacao_{BACKEND_ARMAZENAMENTO}.jsonl"
+
+# Limites padrão; cada câmara pode ter os seus em camaras.csv
+LIE = camaras.LIE_PADRAO
+LSE = camaras.LSE_PADRAO
+
+def carregar_cadastro_camaras():
+    if not os.path.exists(ARQUIVO_CAMARAS): return camaras.camaras_padrao()
+    try:
+        return dados.carregar(ARQUIVO_CAMARAS, camaras.ler_camaras)
+    except Exception: return camaras.camaras_padrao()
+
+@perfil.medido()
+def carregar_camaras():
+    """Cadastro + câmaras que já têm leituras sem estar no cadastro (com os limites padrão)."""
+    cadastro = dict(carregar_cadastro_camaras())
+    for id_camara in backend.camaras_com_dados():
+        if id_camara not in cadastro:
+            cadastro[id_camara] = {"nome": id_camara, "site": "", "lie": LIE, "lse": LSE}
+    return cadastro
+
+@st.cache_resource
+def obter_motor_alertas():
+    """Motor de alertas do processo do app (leituras manuais); grava no mesmo log do serviço de sensores."""
+    regras = alertas.regras_padrao(LIE, LSE, limites=lambda c: camaras.limites(carregar_cadastro_camaras(), c))
+    return alertas.MotorAlertas(regras, [alertas.SinkArquivo(alertas.ARQUIVO_ALERTAS)]).iniciar()
 
 # --- ESTILO CSS ---
 st.markdown("""
@@ -60,107 +112,133 @@ st.markdown("""
 
 # --- FUNÇÕES DE ARQUIVO E DADOS ---
 
-def gerenciar_pasta_historico():
-    """Cria a pasta se não existir e remove arquivos com mais de 15 dias."""
-    if not os.path.exists(PASTA_HISTORICO):
-        os.makedirs(PASTA_HISTORICO)
-    
-    agora = time.time()
-    limite_dias = 15 * 86400  # 15 dias em segundos
+@st.cache_resource
+def obter_limpeza_historico():
+    """Retenção de 15 dias da pasta de histórico, numa thread de limpeza (uma por processo)."""
+    return historico_uploads.LimpezaHistorico(PASTA_HISTORICO, dias=15).iniciar()
 
-    for f in os.listdir(PASTA_HISTORICO):
-        caminho_arquivo = os.path.join(PASTA_HISTORICO, f)
-        if os.path.isfile(caminho_arquivo):
-            # Se a data de modificação for mais antiga que o limite, apaga
-            if os.stat(caminho_arquivo).st_mtime < (agora - limite_dias):
-                os.remove(caminho_arquivo)
+obter_limpeza_historico()
 
+@perfil.medido()
 def salvar_arquivo_historico(uploaded_file):
-    """Salva o arquivo enviado na pasta de histórico."""
-    gerenciar_pasta_historico()
-    caminho = os.path.join(PASTA_HISTORICO, uploaded_file.name)
-    with open(caminho, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    return caminho
+    """Salva o arquivo enviado no histórico (conteúdo repetido não é gravado de novo)."""
+    return historico_uploads.salvar(PASTA_HISTORICO, uploaded_file.getvalue(), uploaded_file.name)
 
+@perfil.medido()
 def carregar_usuarios():
     if not os.path.exists(ARQUIVO_USUARIOS): return None
     try:
-        df = pd.read_csv(ARQUIVO_USUARIOS, sep=';', encoding='latin1', dtype=str)
-        df.columns = df.columns.str.strip().str.lower()
-        return df
+        return dados.carregar(ARQUIVO_USUARIOS, dados.ler_usuarios)
     except: return None
 
+@perfil.medido()
 def carregar_sku():
     if not os.path.exists(ARQUIVO_SKU): return None
     try:
-        df = pd.read_csv(ARQUIVO_SKU, sep=';', encoding='latin1', dtype=str)
-        if df.shape[1] < 2:
-            df = pd.read_csv(ARQUIVO_SKU, sep=',', encoding='latin1', dtype=str)
-        return df
+        return dados.carregar(ARQUIVO_SKU, dados.ler_sku)
     except: return pd.DataFrame()
 
-def carregar_historico_temp():
-    if not os.path.exists(ARQUIVO_DADOS_TEMP):
-        return pd.DataFrame(columns=["Usuario", "Cargo", "Data", "Horario", "Temperatura", "Status"])
+@perfil.medido()
+def carregar_diretorio_usuarios():
+    if not os.path.exists(ARQUIVO_USUARIOS): return None
     try:
-        return pd.read_csv(ARQUIVO_DADOS_TEMP, sep=";")
-    except:
-        return pd.read_csv(ARQUIVO_DADOS_TEMP, sep=";", on_bad_lines='skip', engine='python')
+        return dados.carregar(ARQUIVO_USUARIOS, construir_diretorio_usuarios)
+    except: return None
 
-def carregar_historico_nc(caminho_arquivo=None):
-    """Carrega o histórico interno ou um arquivo específico se passado o caminho."""
-    arquivo_alvo = caminho_arquivo if caminho_arquivo else ARQUIVO_DADOS_NC
-    
-    if not os.path.exists(arquivo_alvo):
-        return pd.DataFrame()
+@perfil.medido()
+def carregar_indice_sku():
+    if not os.path.exists(ARQUIVO_SKU): return None
     try:
-        # Tenta ler com utf-8 primeiro
-        df = pd.read_csv(arquivo_alvo, sep=";", encoding='utf-8')
-        return df
-    except:
-        try:
-            # Tenta latin1 se falhar
-            return pd.read_csv(arquivo_alvo, sep=";", encoding='latin1', on_bad_lines='skip', engine='python')
-        except:
-            return pd.DataFrame()
+        return dados.carregar(ARQUIVO_SKU, construir_indice_sku)
+    except: return None
 
-def salvar_temp(usuario, cargo, temp, status):
+def ler_csv_nc_normalizado(caminho):
+    return normalizar_nc(historico_uploads.ler_nc(caminho))
+
+@st.cache_resource(max_entries=1)
+def nc_interno_normalizado(versao):
+    """Histórico interno de NC normalizado, guardado pela versão (backend.versao_nc()): só relê quando ela muda."""
+    return normalizar_nc(backend.carregar_nc())
+
+@perfil.medido()
+def carregar_historico_nc(caminho_arquivo=None):
+    """Carrega o histórico interno ou um arquivo específico se passado o caminho.
+
+    Avarias vêm como bool e Armazem/Local_Avaria/Cargo/Usuario como category.
+    """
+    if caminho_arquivo:
+        if not os.path.exists(caminho_arquivo):
+            return pd.DataFrame()
+        # Normalizado uma vez por versão do arquivo (fica no cache já convertido)
+        return dados.carregar(caminho_arquivo, ler_csv_nc_normalizado)
+
+    # Versão lida antes: gravação no meio da leitura só força reler na próxima
+    return nc_interno_normalizado(backend.versao_nc()).copy()
+
+@perfil.medido()
+def carregar_agregado_nc(caminho_arquivo=None):
+    """Contadores do dashboard: do arquivo enviado ou do agregado mantido por salvar_nc."""
+    if caminho_arquivo:
+        if not os.path.exists(caminho_arquivo):
+            return agregados_nc.AgregadoNC()
+        return dados.carregar(caminho_arquivo, agregados_nc.agregar_arquivo, copiar=False)
+    try:
+        agregado = agregados_nc.carregar(ARQUIVO_AGREGADO_NC)
+        if agregado.versao_fonte == backend.versao_nc():
+            return agregado
+    except (OSError, ValueError, KeyError):
+        pass
+    # Primeira execução, agregado corrompido ou histórico alterado por fora do app: recalcula a partir do histórico
+    return agregados_nc.reconstruir(ARQUIVO_AGREGADO_NC, carregar_historico_nc, backend.versao_nc)
+
+def gravar_lote_nc(registros):
+    """Gravador da fila para NC: anexa o lote e soma o delta no agregado do dashboard."""
+    # Apenas anexa as linhas novas: não relê nem reescreve o histórico
+    agregados_nc.gravar(ARQUIVO_AGREGADO_NC, registros, backend.anexar_nc, backend.versao_nc)
+
+@st.cache_resource
+def obter_fila_gravacao():
+    """Fila do processo: salvar_temp/salvar_nc só enfileiram; uma thread grava em lote (e tenta de novo se o arquivo estiver travado)."""
+    return fila_gravacao.FilaGravacao({"temp": backend.anexar_temp, "nc": gravar_lote_nc}, ARQUIVO_FILA_GRAVACAO,
+                                      agrupar=grupo_gravacao).iniciar()
+
+@perfil.medido()
+def salvar_temp(usuario, cargo, temp, status, camara=camaras.CAMARA_PADRAO):
     agora = datetime.now()
-    nova_linha = pd.DataFrame([{
+    nova_linha = {
         "Usuario": usuario, "Cargo": cargo, "Data": agora.strftime("%d/%m/%Y"),
-        "Horario": agora.strftime("%H:%M:%S"), "Temperatura": temp, "Status": status
-    }])
-    try: 
-        nova_linha.to_csv(ARQUIVO_DADOS_TEMP, mode='a', header=not os.path.exists(ARQUIVO_DADOS_TEMP), index=False, sep=";")
-    except PermissionError: st.error("Erro: Feche o arquivo Excel!")
+        "Horario": agora.strftime("%H:%M:%S"), "Temperatura": temp, "Status": status,
+        "Camara": camara
+    }
+    try:
+        # Fica no log da fila antes de voltar: arquivo aberto no Excel só atrasa a gravação
+        obter_fila_gravacao().enfileirar("temp", nova_linha)
+        obter_motor_alertas().publicar(camara, temp, agora)
+        return True
+    except OSError as e:
+        st.error(f"Erro ao registrar a leitura: {e}")
+        return False
 
+@perfil.medido()
 def salvar_nc(dados_dict):
     agora = datetime.now()
     dados_dict['Data'] = agora.strftime("%d/%m/%Y")
     
-    df_novo = pd.DataFrame([dados_dict])
-    
     try:
-        if os.path.exists(ARQUIVO_DADOS_NC):
-            try:
-                df_antigo = pd.read_csv(ARQUIVO_DADOS_NC, sep=";")
-            except:
-                df_antigo = pd.DataFrame()
-            
-            df_final = pd.concat([df_antigo, df_novo], ignore_index=True)
-            df_final.to_csv(ARQUIVO_DADOS_NC, index=False, sep=";")
-        else:
-            df_novo.to_csv(ARQUIVO_DADOS_NC, index=False, sep=";")
-            
+        obter_fila_gravacao().enfileirar("nc", dados_dict)
         return True
-    except PermissionError:
-        st.error("Erro: Feche o arquivo de Não Conformidade (Excel)!")
-        return False
     except Exception as e:
         st.error(f"Erro ao salvar: {e}")
         return False
 
+def exibir_grafico(fig, etapa):
+    """st.plotly_chart medido (serializar a figura costuma ser a parte cara do gráfico)."""
+    with perfil.etapa(etapa):
+        st.plotly_chart(fig, use_container_width=True)
+
+def usuario_admin():
+    return str(st.session_state.get('usuario_cargo', '')).strip().lower() in CARGOS_ADMIN
+
 # --- TELAS ---
 
 def tela_login():
@@ -172,79 +250,171 @@ def tela_login():
         st.info("Acesso Restrito 👩🏻‍💻")
         login_id = st.text_input("ID de Matrícula").strip()
         if st.button("ACESSAR"):
-            df_users = carregar_usuarios()
-            if df_users is None or df_users.empty:
+            segundos = tentativas_login.bloqueado(login_id)
+            if segundos:
+                st.error(f"🔒 Muitas tentativas. Tente novamente em {segundos // 60 + 1} min.")
+                return
+            diretorio = carregar_diretorio_usuarios()
+            if diretorio is None or diretorio.vazio:
                 st.error("Erro: users.csv não encontrado.")
                 return 
-            if 'id_login' in df_users.columns:
-                usuario = df_users[df_users['id_login'].str.strip() == login_id]
-                if not usuario.empty:
-                    st.session_state['usuario_nome'] = usuario.iloc[0]['nome']
-                    st.session_state['usuario_cargo'] = usuario.iloc[0]['tipo']
+            if diretorio.tem_id_login:
+                usuario = diretorio.buscar(login_id)
+                if usuario is not None:
+                    tentativas_login.registrar_sucesso(login_id)
+                    st.session_state['usuario_nome'] = usuario['nome']
+                    st.session_state['usuario_cargo'] = usuario['tipo']
                     st.rerun()
-                else: st.error("❌ Matrícula não encontrada.")
+                else:
+                    tentativas_login.registrar_falha(login_id)
+                    st.error("❌ Matrícula não encontrada.")
             else: st.error("Erro: CSV sem coluna id_login.")
 
+ORDENACOES_HISTORICO = {
+    "Mais recentes": ("Timestamp", False), "Mais antigas": ("Timestamp", True),
+    "Maior temperatura": ("Temperatura", False), "Menor temperatura": ("Temperatura", True),
+}
+
+def controles_paginacao(total, chave, tamanhos=(25, 50, 100, 250)):
+    """Seletores de página; devolve (primeira linha, linhas por página)."""
+    c1, c2, c3 = st.columns([1, 1, 2])
+    tamanho = c1.selectbox("Linhas por página", tamanhos, key=f"{chave}_tamanho")
+    paginas = max(1, -(-total // tamanho))
+    # Filtro novo pode deixar a página guardada além da última
+    if st.session_state.get(f"{chave}_pagina", 1) > paginas:
+        st.session_state[f"{chave}_pagina"] = paginas
+    pagina = c2.number_input("Página", min_value=1, max_value=paginas, step=1, key=f"{chave}_pagina")
+    c3.caption(f"{total} registro(s) · página {pagina} de {paginas}")
+    return (pagina - 1) * tamanho, tamanho
+
+def seletor_camara(cadastro, chave, opcoes_extras=()):
+    opcoes = list(opcoes_extras) + list(cadastro)
+    if len(cadastro) <= 1 and not opcoes_extras:
+        return opcoes[0] if opcoes else camaras.CAMARA_PADRAO
+    return st.selectbox("❄️ Câmara:", opcoes, key=chave,
+                        format_func=lambda c: c if c in opcoes_extras else camaras.rotulo(cadastro, c))
+
+def painel_nc_consolidado():
+    """Tendência semanal, top SKUs e pontos críticos somando todo o histórico de uploads."""
+    incluir_atuais = st.checkbox("Incluir dados atuais (registros internos)", value=True, key="nc_cons_atuais")
+    inicio_consulta = time.perf_counter()
+    with perfil.etapa("analise_nc_parciais"):
+        parciais = analise_nc.parciais_historico(PASTA_HISTORICO)
+        if incluir_atuais:
+            parciais.append(analise_nc.parcial_atual(backend))
+    with perfil.etapa("analise_nc_combinar"):
+        combinado = analise_nc.combinar(parciais)
+    if combinado.empty:
+        st.info("Sem dados no histórico de uploads.")
+        return
+
+    dia_min, dia_max = combinado["Dia"].min().date(), combinado["Dia"].max().date()
+    periodo = st.date_input("📅 Período:", value=(dia_min, dia_max), min_value=dia_min, max_value=dia_max, key="nc_cons_periodo")
+    if isinstance(periodo, (tuple, list)) and len(periodo) == 2:
+        combinado = analise_nc.combinar([combinado], *periodo)
+    st.caption(f"{len(parciais)} fonte(s) · {(time.perf_counter() - inicio_consulta) * 1000:.0f} ms")
+    if combinado.empty:
+        st.info("Sem registros no período.")
+        return
+
+    c1, c2 = st.columns(2)
+    c1.metric("📦 Total de Ocorrências", int(combinado["Registros"].sum()))
+    c2.metric("⚠️ Avarias Marcadas", int(combinado["Avarias"].sum()))
+
+    semanal = analise_nc.tendencia_semanal(combinado)
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=semanal.index, y=semanal["Registros"], mode='lines+markers', name='Ocorrências', line=dict(color='#479bd8')))
+    fig.add_trace(go.Scatter(x=semanal.index, y=semanal["Avarias"], mode='lines+markers', name='Avarias', line=dict(color='#ff4444')))
+    fig.update_layout(title="📈 Tendência Semanal", template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', font=dict(color="#f0f0f0"))
+    exibir_grafico(fig, "grafico_nc_semanal")
+
+    st.markdown("#### 🏷️ SKUs com Mais Avarias")
+    top = analise_nc.top_skus(combinado)
+    indice_sku = carregar_indice_sku()
+    if indice_sku is not None and len(indice_sku):
+        top.insert(0, "Descrição", [indice_sku.buscar(sku) or "" for sku in top.index])
+    st.dataframe(top[[c for c in top.columns if c == "Descrição" or top[c].any()]], use_container_width=True)
+
+    st.markdown("#### 📍 Pontos Críticos (Armazém × Rua × Nível)")
+    st.dataframe(analise_nc.pontos_criticos(combinado), use_container_width=True, hide_index=True)
+
 def tela_cadastro_temp():
     st.markdown("## 🌡️ Monitoramento de Temperatura")
+    cadastro = carregar_camaras()
+    camara = seletor_camara(cadastro, "camara_temp")
+    lie, lse = camaras.limites(cadastro, camara)
     
     tab1, tab2 = st.tabs(["📝 Nova Leitura", "📊 Histórico Geral"])
 
     with tab1:
-        st.markdown(f"**Faixa:** <span style='color:#479bd8'>{LIE}ºC</span> a <span style='color:#479bd8'>{LSE}ºC</span>", unsafe_allow_html=True)
+        st.markdown(f"**Faixa:** <span style='color:#479bd8'>{lie}ºC</span> a <span style='color:#479bd8'>{lse}ºC</span>", unsafe_allow_html=True)
         st.write("") 
         temp_input = st.number_input("🌡️ Temperatura Atual (ºC):", step=0.1, format="%.1f", key="temp_input_field")
         
         if st.button("SALVAR LEITURA"):
-            status = "OK" if LIE <= temp_input <= LSE else "ERRO"
-            salvar_temp(st.session_state['usuario_nome'], st.session_state['usuario_cargo'], temp_input, status)
-            if status == "OK":
-                st.markdown(f"""<div class="alert-box-green"><p>✅ SUCESSO</p><p>{temp_input}ºC registrada.</p></div>""", unsafe_allow_html=True)
+            status = "OK" if lie <= temp_input <= lse else "ERRO"
+            if salvar_temp(st.session_state['usuario_nome'], st.session_state['usuario_cargo'], temp_input, status, camara):
+                # O aviso aparece no próximo rerun (sem segurar a tela com sleep)
+                st.session_state['temp_salva'] = (temp_input, status)
+                st.rerun()
+
+        salva = st.session_state.pop('temp_salva', None)
+        if salva is not None:
+            if salva[1] == "OK":
+                st.markdown(f"""<div class="alert-box-green"><p>✅ SUCESSO</p><p>{salva[0]}ºC registrada.</p></div>""", unsafe_allow_html=True)
                 st.balloons()
-                time.sleep(1)
-                st.rerun()    
             else:
-                st.markdown(f"""<div class="alert-box-red"><p>🚨 FORA DA FAIXA!</p><p>{temp_input}ºC</p></div>""", unsafe_allow_html=True)
-                time.sleep(1)
-                st.rerun()
+                st.markdown(f"""<div class="alert-box-red"><p>🚨 FORA DA FAIXA!</p><p>{salva[0]}ºC</p></div>""", unsafe_allow_html=True)
 
     with tab2:
-        df = carregar_historico_temp()
+        if len(cadastro) > 1:
+            with st.expander("🏢 Visão geral das câmaras (últimas 24h)"):
+                with perfil.etapa("visao_geral_camaras"):
+                    st.dataframe(camaras.visao_geral(backend, cadastro, datetime.now() - timedelta(days=1)),
+                                 use_container_width=True, hide_index=True)
+        total_leituras = backend.contar_temp(camara=camara)
         
-        if df.empty:
+        if total_leituras == 0:
             st.info("Nenhum registro encontrado.")
         else:
-            if 'Data' in df.columns and 'Horario' in df.columns:
-                try:
-                    df['Datetime'] = pd.to_datetime(df['Data'] + ' ' + df['Horario'], dayfirst=True, errors='coerce')
-                    df = df.sort_values(by='Datetime', ascending=False).drop(columns=['Datetime'])
-                except:
-                    pass 
-
-            csv_data = df.to_csv(index=False, sep=";").encode('utf-8')
-            st.download_button("📥 Baixar Histórico Completo", data=csv_data, file_name="historico_temperatura.csv", mime="text/csv")
+            # O CSV só é gerado quando alguém clica em baixar
+            st.download_button("📥 Baixar Histórico Completo", data=lambda: backend.exportar_temp_csv(camara),
+                               file_name="historico_temperatura.csv", mime="text/csv")
             
             st.markdown("---")
             
             col_met1, col_met2, col_met3 = st.columns(3)
-            col_met1.metric("Total de Leituras", len(df))
+            col_met1.metric("Total de Leituras", total_leituras)
             
-            ultima_temp = df.iloc[0]['Temperatura'] if not df.empty else 0
+            # Métricas consultadas direto no armazenamento (no SQLite, via índice)
+            ultimas = backend.ultimas_temp(2, camara=camara)
+            ultima_temp = ultimas.iloc[0]['Temperatura'] if not ultimas.empty else 0
             delta_temp = None
-            if len(df) > 1:
-                penultima = pd.to_numeric(df.iloc[1]['Temperatura'], errors='coerce')
+            if len(ultimas) > 1:
+                penultima = pd.to_numeric(ultimas.iloc[1]['Temperatura'], errors='coerce')
                 atual = pd.to_numeric(ultima_temp, errors='coerce')
                 if not pd.isna(penultima) and not pd.isna(atual):
                     delta_temp = round(atual - penultima, 1)
 
             col_met2.metric("Última Temp.", f"{ultima_temp}ºC", delta=delta_temp)
             
-            erros = df[df['Status'] == 'ERRO'].shape[0]
+            erros = backend.contar_temp("ERRO", camara=camara)
             col_met3.metric("Desvios (ERRO)", erros, delta_color="inverse")
             
             st.divider()
             st.write("📋 **Registros Recentes:**")
-            st.dataframe(df, use_container_width=True, hide_index=True)
+            f1, f2, f3 = st.columns(3)
+            filtro_status = f1.selectbox("Status", ["Todos", "OK", "ERRO"], key="hist_status")
+            filtro_usuario = f2.text_input("Usuário contém", key="hist_usuario").strip()
+            ordem, crescente = ORDENACOES_HISTORICO[f3.selectbox("Ordenar por", list(ORDENACOES_HISTORICO), key="hist_ordem")]
+            status = None if filtro_status == "Todos" else filtro_status
+            # Filtro, ordenação e paginação no armazenamento: só a página visível é carregada
+            total = backend.contar_temp(status, camara=camara, usuario=filtro_usuario)
+            inicio, tamanho = controles_paginacao(total, "hist_temp")
+            with perfil.etapa("pagina_temp"):
+                pagina = backend.pagina_temp(inicio, tamanho, camara=camara, status=status, usuario=filtro_usuario,
+                                             ordem=ordem, crescente=crescente)
+            st.dataframe(pagina, use_container_width=True, hide_index=True)
 
 
 def tela_nao_conformidade():
@@ -272,20 +442,24 @@ def tela_nao_conformidade():
     
     # --- ABA 1: CADASTRO ---
     with tab1:
-        df_sku = carregar_sku()
+        indice_sku = carregar_indice_sku()
         codigo_input = st.text_input("📦 Código do SKU:", key="nc_sku")
         material_nome = ""
+        sugestoes = []
         
-        if df_sku is not None and not df_sku.empty and codigo_input:
+        if indice_sku is not None and len(indice_sku) and codigo_input:
             try:
-                col_cod = df_sku.columns[0]
-                res = df_sku[df_sku[col_cod].astype(str).str.strip() == codigo_input.strip()]
-                if not res.empty:
-                    material_nome = str(res.iloc[0].values[1]) if len(res.columns) > 1 else "Encontrado"
-                else: material_nome = "Não encontrado"
+                material = indice_sku.buscar(codigo_input)
+                if material is not None:
+                    material_nome = material or "Encontrado"
+                else:
+                    material_nome = "Não encontrado"
+                    sugestoes = indice_sku.sugerir(codigo_input)
             except: material_nome = "Erro ao buscar"
         
         st.text_input("Descrição do Item:", value=material_nome, disabled=True)
+        if sugestoes:
+            st.caption("Você quis dizer: " + " · ".join(f"`{cod}` {mat}" for cod, mat in sugestoes))
         st.markdown("---")
         
         with st.form("form_nc"):
@@ -339,61 +513,75 @@ def tela_nao_conformidade():
 
     # --- ABA 2: DASHBOARD ---
     with tab2:
-        st.markdown(f"**Visualizando:** `{st.session_state['nc_arquivo_atual']}`")
-        if st.button("🔄 Voltar para Dados Atuais (Ao Vivo)", key="btn_reset_dash"):
-            st.session_state['nc_arquivo_atual'] = "Dados Atuais"
-            st.session_state['nc_caminho_arquivo'] = None
-            st.rerun()
-        
-        st.markdown("---")
-        
-        # Carrega dados baseados na seleção do histórico
-        df_nc = carregar_historico_nc(st.session_state['nc_caminho_arquivo'])
-
-        if df_nc.empty:
-            st.info("Sem dados para exibir no arquivo selecionado.")
+        modo = st.radio("Modo:", ["Arquivo selecionado", "Histórico completo"], horizontal=True, key="nc_modo_dashboard")
+        if modo == "Histórico completo":
+            # Soma todos os arquivos do histórico (parciais em cache), sem escolher um por vez
+            painel_nc_consolidado()
         else:
-            # Opção de baixar o que está sendo visualizado
-            csv_data = df_nc.to_csv(index=False, sep=";").encode('utf-8')
-            st.download_button("📥 Baixar CSV Visualizado", data=csv_data, file_name="relatorio_nc.csv", mime="text/csv")
-            
-            st.metric("📦 Total de Ocorrências", len(df_nc))
-            
-            colunas_avarias = ["Quebra_Garrafa", "Lata_Amassada", "Filme_Rasgado", "Falta_SKU", 
-                               "Emb_Avariada", "Palete_Quebrado", "Palete_Desalinhado", "Vazamento", "Palete_Molhado"]
-            
-            contagem_avarias = {}
-            for col in colunas_avarias:
-                if col in df_nc.columns:
-                    # Conta "Sim", ignorando maiúsculas/minúsculas e espaços
-                    qtd = df_nc[df_nc[col].astype(str).str.strip().str.lower() == 'sim'].shape[0]
-                    if qtd > 0:
-                        contagem_avarias[col.replace('_', ' ')] = qtd
+            st.markdown(f"**Visualizando:** `{st.session_state['nc_arquivo_atual']}`")
+            if st.button("🔄 Voltar para Dados Atuais (Ao Vivo)", key="btn_reset_dash"):
+                st.session_state['nc_arquivo_atual'] = "Dados Atuais"
+                st.session_state['nc_caminho_arquivo'] = None
+                st.rerun()
             
-            if contagem_avarias:
-                fig_donut = go.Figure(data=[go.Pie(labels=list(contagem_avarias.keys()), values=list(contagem_avarias.values()), hole=.4)])
-                fig_donut.update_layout(title="📊 Tipos de Avaria", template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', font=dict(color="#f0f0f0"))
-                st.plotly_chart(fig_donut, use_container_width=True)
-            else:
-                st.warning("Nenhuma avaria marcada como 'Sim' encontrada.")
-
-            c1, c2 = st.columns(2)
-            with c1:
-                if 'Armazem' in df_nc.columns:
-                    counts = df_nc['Armazem'].value_counts()
-                    fig = go.Figure(go.Bar(x=counts.values, y=counts.index, orientation='h', marker=dict(color='#479bd8')))
-                    fig.update_layout(title="🚚 Por Armazém", template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', font=dict(color="#f0f0f0"))
-                    st.plotly_chart(fig, use_container_width=True)
+            st.markdown("---")
             
-            with c2:
-                if 'Local_Avaria' in df_nc.columns:
-                    counts = df_nc['Local_Avaria'].value_counts()
-                    fig = go.Figure(go.Bar(x=counts.index, y=counts.values, marker=dict(color=['#ff4444', '#44ff44', '#ffff44'])))
-                    fig.update_layout(title="📍 Por Posição", template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', font=dict(color="#f0f0f0"))
-                    st.plotly_chart(fig, use_container_width=True)
+            # Carrega dados baseados na seleção do histórico
+            caminho_nc = st.session_state['nc_caminho_arquivo']
+            agregado = carregar_agregado_nc(caminho_nc)
 
-            with st.expander("Ver Dados Brutos"):
-                st.dataframe(df_nc, use_container_width=True)
+            if agregado.total == 0:
+                st.info("Sem dados para exibir no arquivo selecionado.")
+            else:
+                # Opção de baixar o que está sendo visualizado (gerado só no clique)
+                st.download_button("📥 Baixar CSV Visualizado", data=lambda: nc_para_csv(carregar_historico_nc(caminho_nc)),
+                                   file_name="relatorio_nc.csv", mime="text/csv")
+                
+                st.metric("📦 Total de Ocorrências", agregado.total)
+                
+                # Contagens vêm prontas do agregado (não depende do número de registros)
+                contagem_avarias = {col.replace('_', ' '): qtd for col, qtd in agregado.por_avaria().items()}
+                
+                if contagem_avarias:
+                    fig_donut = go.Figure(data=[go.Pie(labels=list(contagem_avarias.keys()), values=list(contagem_avarias.values()), hole=.4)])
+                    fig_donut.update_layout(title="📊 Tipos de Avaria", template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', font=dict(color="#f0f0f0"))
+                    exibir_grafico(fig_donut, "grafico_nc_avarias")
+                else:
+                    st.warning("Nenhuma avaria marcada como 'Sim' encontrada.")
+
+                c1, c2 = st.columns(2)
+                with c1:
+                    if 'Armazem' in agregado.dimensoes:
+                        counts = agregado.por_dimensao('Armazem')
+                        fig = go.Figure(go.Bar(x=counts.values, y=counts.index, orientation='h', marker=dict(color='#479bd8')))
+                        fig.update_layout(title="🚚 Por Armazém", template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', font=dict(color="#f0f0f0"))
+                        exibir_grafico(fig, "grafico_nc_armazem")
+                
+                with c2:
+                    if 'Local_Avaria' in agregado.dimensoes:
+                        counts = agregado.por_dimensao('Local_Avaria')
+                        fig = go.Figure(go.Bar(x=counts.index, y=counts.values, marker=dict(color=['#ff4444', '#44ff44', '#ffff44'])))
+                        fig.update_layout(title="📍 Por Posição", template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', font=dict(color="#f0f0f0"))
+                        exibir_grafico(fig, "grafico_nc_posicao")
+
+                # Os registros só são lidos quando a tabela é aberta
+                if st.toggle("Ver Dados Brutos", key="nc_ver_brutos"):
+                    df_nc = carregar_historico_nc(caminho_nc)
+                    f1, f2 = st.columns(2)
+                    armazens = sorted(df_nc['Armazem'].dropna().astype(str).unique()) if 'Armazem' in df_nc.columns else []
+                    filtro_armazem = f1.selectbox("Armazém", ["Todos"] + armazens, key="nc_brutos_armazem")
+                    busca = f2.text_input("Buscar (SKU, descrição, usuário, obs.)", key="nc_brutos_busca").strip()
+                    if filtro_armazem != "Todos":
+                        df_nc = df_nc[df_nc['Armazem'].astype(str) == filtro_armazem]
+                    if busca:
+                        colunas_busca = [c for c in ['SKU', 'Descricao_SKU', 'Usuario', 'Observacoes'] if c in df_nc.columns]
+                        encontrado = pd.Series(False, index=df_nc.index)
+                        for col in colunas_busca:
+                            encontrado |= df_nc[col].astype(str).str.contains(busca, case=False, regex=False)
+                        df_nc = df_nc[encontrado]
+                    # Mais recentes primeiro (o histórico é gravado em ordem de chegada)
+                    inicio, tamanho = controles_paginacao(len(df_nc), "nc_brutos")
+                    st.dataframe(df_nc.iloc[::-1].iloc[inicio:inicio + tamanho], use_container_width=True)
 
     # --- ABA 3: HISTÓRICO E UPLOAD ---
     with tab3:
@@ -402,99 +590,116 @@ def tela_nao_conformidade():
         
         uploaded_nc = st.file_uploader("Selecionar Arquivo", type=['csv'], key="upload_nc_externo")
         
-        if uploaded_nc is not None:
-            caminho_salvo = salvar_arquivo_historico(uploaded_nc)
+        # O uploader continua com o arquivo nos próximos reruns: salva uma vez por envio
+        if uploaded_nc is not None and st.session_state.get('upload_nc_salvo') != uploaded_nc.file_id:
+            salvar_arquivo_historico(uploaded_nc)
+            st.session_state['upload_nc_salvo'] = uploaded_nc.file_id
             st.success(f"Arquivo salvo em histórico: {uploaded_nc.name}")
-            time.sleep(1)
-            st.rerun()
 
         st.divider()
         st.markdown("### 🗂️ Arquivos Salvos (Últimos 15 dias)")
         
-        gerenciar_pasta_historico() # Limpa antigos antes de listar
-        arquivos = [f for f in os.listdir(PASTA_HISTORICO) if f.endswith('.csv')]
+        # Lista pelo manifesto (sem listdir/stat nem releitura dos CSVs)
+        with perfil.etapa("listar_historico"):
+            arquivos = historico_uploads.listar(PASTA_HISTORICO)
         
         if arquivos:
-            # Ordenar por data de modificação (mais recente primeiro)
-            arquivos.sort(key=lambda x: os.path.getmtime(os.path.join(PASTA_HISTORICO, x)), reverse=True)
-            
             for arq in arquivos:
                 col_f1, col_f2 = st.columns([3, 1])
-                col_f1.text(f"📄 {arq}")
-                if col_f2.button("VISUALIZAR", key=f"btn_view_{arq}"):
-                    st.session_state['nc_arquivo_atual'] = arq
-                    st.session_state['nc_caminho_arquivo'] = os.path.join(PASTA_HISTORICO, arq)
+                periodo = f" · {arq['data_min']} a {arq['data_max']}" if arq.get('data_min') else ""
+                col_f1.text(f"📄 {arq['nome']}")
+                col_f1.caption(f"{arq['linhas']} registros · {arq['tamanho'] / 1024:.1f} KB{periodo} · enviado em {arq['enviado_em'].replace('T', ' ')}")
+                if col_f2.button("VISUALIZAR", key=f"btn_view_{arq['hash']}"):
+                    st.session_state['nc_arquivo_atual'] = arq['nome']
+                    st.session_state['nc_caminho_arquivo'] = arq['caminho']
                     # Muda para a aba de dashboard (hack visual ou apenas aviso)
-                    st.success(f"Carregado! Vá para a aba 'Dashboard' para ver os gráficos de: {arq}")
+                    st.success(f"Carregado! Vá para a aba 'Dashboard' para ver os gráficos de: {arq['nome']}")
         else:
             st.info("Nenhum arquivo no histórico recente.")
 
 
+@perfil.medido()
+def carregar_upload_temp(uploaded_file):
+    """Lê o CSV enviado em blocos; o resultado fica na sessão enquanto o mesmo arquivo estiver carregado."""
+    chave = (uploaded_file.file_id, uploaded_file.name, uploaded_file.size)
+    cache = st.session_state.get('upload_temp_cache')
+    if cache is None or cache[0] != chave:
+        cache = (chave, ingestao.ler_temperaturas(uploaded_file))
+        st.session_state['upload_temp_cache'] = cache
+    return cache[1]
+
 def tela_grafico_temp():
     st.markdown("## 📊 Análise Gráfica")
     st.markdown("---")
 
     uploaded_file = st.file_uploader("📂 Carregar CSV externo (Para gerar gráfico)", type=["csv"])
+
+    cadastro = carregar_camaras()
+    todas = "Todas (visão geral)"
+    camara = camaras.CAMARA_PADRAO
+    if uploaded_file is None:
+        camara = seletor_camara(cadastro, "graf_camara", (todas,) if len(cadastro) > 1 else ())
+    lie, lse = camaras.limites(cadastro, camara)
+
+    c_jan, c_modo = st.columns(2)
+    janela = c_jan.selectbox("🕒 Janela de tempo:", list(amostragem.JANELAS), index=1, key="graf_janela")
+    modo_reducao = c_modo.radio("Redução de pontos:", list(amostragem.MODOS), horizontal=True, key="graf_modo")
     
     df_final = pd.DataFrame()
     origem_dados = "interno"
 
     if uploaded_file is not None:
         try:
-            try:
-                df_upload = pd.read_csv(uploaded_file, sep=";")
-            except UnicodeDecodeError:
-                uploaded_file.seek(0)
-                df_upload = pd.read_csv(uploaded_file, sep=";", encoding="latin1")
-            
-            col_data_csv = "Hora de conclusão"
-            col_temp_csv = "Temperatura da Câmara Fria:"
-
-            if col_data_csv in df_upload.columns and col_temp_csv in df_upload.columns:
-                df_upload['Temperatura'] = df_upload[col_temp_csv].astype(str).str.replace(',', '.')
-                df_upload['Temperatura'] = pd.to_numeric(df_upload['Temperatura'], errors='coerce')
-                df_upload['Datetime'] = pd.to_datetime(df_upload[col_data_csv], dayfirst=True, errors='coerce')
-                df_final = df_upload.dropna(subset=['Temperatura', 'Datetime'])
-                origem_dados = "upload"
-                if df_final.empty:
-                    st.warning("Arquivo lido, mas sem dados válidos.")
-            else:
-                st.error(f"Erro: O CSV precisa ter as colunas: '{col_data_csv}' e '{col_temp_csv}'")
+            df_final = carregar_upload_temp(uploaded_file)
+            origem_dados = "upload"
+            if df_final.empty:
+                st.warning("Arquivo lido, mas sem dados válidos.")
+            # No arquivo externo a janela termina na última leitura do arquivo
+            df_final = amostragem.recortar_janela(df_final, janela)
+        except ingestao.ColunasAusentesError as e:
+            st.error(f"Erro: {e}")
         except Exception as e:
             st.error(f"Erro ao processar arquivo: {e}")
 
     else:
-        df = carregar_historico_temp()
-        if not df.empty:
-            df['Datetime'] = pd.to_datetime(df['Data'] + ' ' + df['Horario'], dayfirst=True, errors='coerce')
-            df_final = df.dropna(subset=['Datetime'])
+        # Só a janela escolhida é lida do armazenamento
+        duracao = amostragem.JANELAS[janela]
+        inicio = datetime.now() - duracao if duracao is not None else datetime(1970, 1, 1)
+        if camara == todas:
+            # Um resumo por câmara; os shards de cada uma são lidos em paralelo
+            with perfil.etapa("visao_geral_camaras"):
+                st.dataframe(camaras.visao_geral(backend, cadastro, inicio), use_container_width=True, hide_index=True)
+            return
+        with perfil.etapa("carregar_temp_periodo"):
+            df_final = backend.carregar_temp_periodo(inicio, camara=camara)
+        if df_final.empty and backend.contar_temp(camara=camara) > 0:
+            st.warning("Sem dados recentes.")
+            return
 
     if df_final.empty:
         st.info("Aguardando dados para gerar o gráfico.")
         return
 
-    if origem_dados == "interno":
-        data_limite = datetime.now() - timedelta(days=7)
-        df_plot = df_final[df_final['Datetime'] >= data_limite]
-    else:
-        df_plot = df_final
+    # Armazenamento e ingestão já entregam a série ordenada por Datetime
+    if not df_final['Datetime'].is_monotonic_increasing:
+        df_final = df_final.sort_values(by='Datetime')
 
-    if df_plot.empty:
-        st.warning("Sem dados recentes.")
-        return
-
-    df_plot = df_plot.sort_values(by='Datetime')
+    # Reduz a série ao orçamento de pontos, sem perder leituras fora da faixa
+    with perfil.etapa("reduzir_serie"):
+        df_plot = amostragem.reduzir_serie(df_final, alvo=amostragem.PONTOS_MAXIMOS, modo=amostragem.MODOS[modo_reducao], lie=lie, lse=lse)
+    if len(df_plot) < len(df_final):
+        st.caption(f"Exibindo {len(df_plot)} de {len(df_final)} leituras. Escolha uma janela menor para ver a resolução completa.")
 
     fig = go.Figure()
     fig.add_trace(go.Scatter(
         x=df_plot['Datetime'], y=df_plot['Temperatura'], 
-        mode='lines+markers', name='Temperatura', 
+        mode='lines+markers' if len(df_plot) <= 300 else 'lines', name='Temperatura', 
         line=dict(color='#479bd8', width=4), 
         marker=dict(size=8, color='white', line=dict(width=2, color='#479bd8'))
     ))
     
-    fig.add_hline(y=LSE, line_dash="dash", line_color="#ff4444", annotation_text=f"Max {LSE}ºC")
-    fig.add_hline(y=LIE, line_dash="dash", line_color="#44ff44", annotation_text=f"Min {LIE}ºC")
+    fig.add_hline(y=lse, line_dash="dash", line_color="#ff4444", annotation_text=f"Max {lse}ºC")
+    fig.add_hline(y=lie, line_dash="dash", line_color="#44ff44", annotation_text=f"Min {lie}ºC")
     
     fig.update_layout(
         title=f"Variação Térmica ({'Arquivo Externo' if origem_dados == 'upload' else 'Registros Manuais'})", 
@@ -503,27 +708,157 @@ def tela_grafico_temp():
         paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
         font=dict(color="#f0f0f0")
     )
-    st.plotly_chart(fig, use_container_width=True)
+    exibir_grafico(fig, "grafico_temp")
     
     with st.expander("Ver Dados Detalhados"):
         if origem_dados == "upload":
-            cols_exibir = ['Datetime', 'Temperatura da Câmara Fria:', 'Nome', 'Conferente coletor:']
-            cols_finais = [c for c in cols_exibir if c in df_plot.columns]
-            st.dataframe(df_plot[cols_finais], use_container_width=True)
+            cols_exibir = ['Datetime', 'Temperatura', 'Nome', 'Conferente coletor:']
         else:
-            st.dataframe(df_plot[['Data', 'Horario', 'Usuario', 'Temperatura', 'Status']], use_container_width=True)
+            cols_exibir = ['Data', 'Horario', 'Usuario', 'Temperatura', 'Status']
+        cols_finais = [c for c in cols_exibir if c in df_final.columns]
+        detalhe = df_final
+        if st.checkbox("Só leituras fora da faixa", key="detalhe_temp_fora"):
+            detalhe = df_final[(df_final['Temperatura'] < lie) | (df_final['Temperatura'] > lse)]
+        # Só a página visível vai para o navegador (a janela pode ter o histórico inteiro)
+        inicio_pag, tamanho_pag = controles_paginacao(len(detalhe), "detalhe_temp")
+        st.dataframe(detalhe[cols_finais].iloc[inicio_pag:inicio_pag + tamanho_pag], use_container_width=True, hide_index=True)
 
     if origem_dados == "interno":
-        with open(ARQUIVO_DADOS_TEMP, "rb") as file:
-            st.download_button(label="📥 Baixar Histórico (Excel)", data=file, file_name="relatorio_temperatura.csv", mime="text/csv")
+        st.download_button(label="📥 Baixar Histórico (Excel)", data=lambda: backend.exportar_temp_csv(camara), file_name=f"relatorio_temperatura_{camara}.csv", mime="text/csv")
+
+def tela_cep_temp():
+    st.markdown("## 📐 Controle Estatístico (CEP)")
+    st.markdown("---")
+
+    cadastro = carregar_camaras()
+    camara = seletor_camara(cadastro, "cep_camara")
+    lie, lse = camaras.limites(cadastro, camara)
+
+    c_jan, c_carta, c_n = st.columns(3)
+    janela = c_jan.selectbox("🕒 Período:", list(amostragem.JANELAS), index=1, key="cep_janela")
+    carta = c_carta.radio("Carta:", ["I-AM", "X̄-R"], horizontal=True, key="cep_carta")
+    n = c_n.selectbox("Subgrupo (leituras):", list(cep.FATORES), index=3, key="cep_n", disabled=carta != "X̄-R")
+
+    duracao = amostragem.JANELAS[janela]
+    inicio = datetime.now() - duracao if duracao is not None else datetime(1970, 1, 1)
+    # Dias já resumidos vêm do cache do CEP; só o dia com leituras novas é recalculado
+    with perfil.etapa("carregar_temp_tipado"):
+        tipado = backend.carregar_temp_tipado(inicio, camara=camara)
+    with perfil.etapa("cep_analisar"):
+        resultado = cep.analisar(tipado, camara, lie, lse, carta, n)
+    if resultado is None:
+        st.info("Leituras insuficientes no período para a carta escolhida.")
+        return
+
+    cap = resultado["capacidade"]
+    m1, m2, m3, m4 = st.columns(4)
+    for coluna, indice in zip((m1, m2, m3, m4), ("Cp", "Cpk", "Pp", "Ppk")):
+        coluna.metric(indice, "—" if pd.isna(cap[indice]) else f"{cap[indice]:.2f}")
+    st.caption(f"{resultado['leituras']} leituras em {resultado['dias']} dia(s) · {resultado['recalculados']} dia(s) recalculado(s) · LIE {lie}ºC / LSE {lse}ºC")
+
+    pontos, lim = resultado["pontos"], resultado["limites"]
+    colunas_regras = [f"Regra_{r}" for r in cep.REGRAS]
+    fora = pontos[pontos[colunas_regras].any(axis=1)]
+    # Linha reduzida ao orçamento de pontos, mantendo tudo que passou dos limites de controle
+    linha = amostragem.reduzir_serie(pontos, col_x="Timestamp", col_y="Valor", lie=lim["lic"], lse=lim["lsc"])
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=linha["Timestamp"], y=linha["Valor"], mode='lines', name='X̄' if carta == "X̄-R" else 'Temperatura', line=dict(color='#479bd8')))
+    fig.add_trace(go.Scatter(x=fora["Timestamp"], y=fora["Valor"], mode='markers', name='Fora de controle', marker=dict(color='#ff4444', size=7)))
+    fig.add_hline(y=lim["centro"], line_color="#f0f0f0", annotation_text=f"LC {lim['centro']:.2f}")
+    fig.add_hline(y=lim["lsc"], line_dash="dash", line_color="#ff4444", annotation_text=f"LSC {lim['lsc']:.2f}")
+    fig.add_hline(y=lim["lic"], line_dash="dash", line_color="#ff4444", annotation_text=f"LIC {lim['lic']:.2f}")
+    fig.update_layout(title=f"Carta {'X̄' if carta == 'X̄-R' else 'I'}", xaxis_title="Data/Hora", yaxis_title="ºC", height=380,
+                      template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font=dict(color="#f0f0f0"))
+    exibir_grafico(fig, "grafico_cep")
+
+    amplitude = amostragem.reduzir_serie(pontos.dropna(subset=["Amplitude"]), col_x="Timestamp", col_y="Amplitude", lse=lim["lsc_amplitude"])
+    fig_r = go.Figure(go.Scatter(x=amplitude["Timestamp"], y=amplitude["Amplitude"], mode='lines', name='Amplitude', line=dict(color='#44ff44')))
+    fig_r.add_hline(y=lim["amplitude_media"], line_color="#f0f0f0", annotation_text=f"{lim['amplitude_media']:.2f}")
+    fig_r.add_hline(y=lim["lsc_amplitude"], line_dash="dash", line_color="#ff4444", annotation_text=f"LSC {lim['lsc_amplitude']:.2f}")
+    fig_r.update_layout(title="Carta R" if carta == "X̄-R" else "Carta AM (amplitude móvel)", xaxis_title="Data/Hora", yaxis_title="ºC", height=280,
+                        template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font=dict(color="#f0f0f0"))
+    exibir_grafico(fig_r, "grafico_cep_amplitude")
+
+    st.markdown("#### 🚦 Regras de Western Electric")
+    st.dataframe(pd.DataFrame({"Regra": list(cep.REGRAS.values()), "Violações": [int(pontos[c].sum()) for c in colunas_regras]}),
+                 use_container_width=True, hide_index=True)
+    if not fora.empty:
+        with st.expander(f"Ver pontos fora de controle ({len(fora)})"):
+            st.dataframe(fora.iloc[::-1], use_container_width=True, hide_index=True)
+
+def tela_performance():
+    st.markdown("## ⏱️ Performance")
+    st.markdown("---")
+
+    ligado = st.toggle("Instrumentação ativa", value=perfil.ativo(), key="perf_ativo")
+    if ligado != perfil.ativo():
+        perfil.ativar(ligado)  # vale para todas as sessões deste processo
+    st.caption(f"Ligada, cada rerun registra o tempo total e de cada etapa (leituras, gravações, agregações, gráficos) em `{perfil.ARQUIVO_PERFIL}`. Desligada, o custo é desprezível.")
+
+    registros = perfil.reruns()
+    if not registros:
+        st.info("Nenhum rerun medido ainda. Ligue a instrumentação e navegue pelas telas.")
+        return
+
+    c1, c2 = st.columns(2)
+    c1.metric("Reruns medidos", len(registros))
+    if c2.button("🧹 Limpar medições", key="perf_limpar"):
+        perfil.limpar()
+        st.rerun()
+
+    st.markdown("#### 🖥️ Por tela (rerun completo, ms)")
+    st.dataframe(perfil.por_tela(registros), use_container_width=True, hide_index=True)
+
+    st.markdown("#### 🧩 Por etapa (ms)")
+    etapas = perfil.por_etapa(registros)
+    if etapas.empty:
+        st.info("Os reruns medidos não passaram por nenhuma etapa instrumentada.")
+        return
+    filtro_tela = st.selectbox("Tela", ["Todas"] + sorted(etapas['tela'].unique()), key="perf_tela")
+    if filtro_tela != "Todas":
+        etapas = etapas[etapas['tela'] == filtro_tela]
+    mais_lentas = etapas.sort_values("p95", ascending=False).head(15).iloc[::-1]
+    rotulos = mais_lentas['etapa'] if filtro_tela != "Todas" else mais_lentas['tela'] + " · " + mais_lentas['etapa']
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=mais_lentas['p50'], y=rotulos, orientation='h', name='p50', marker=dict(color='#479bd8')))
+    fig.add_trace(go.Bar(x=mais_lentas['p95'], y=rotulos, orientation='h', name='p95', marker=dict(color='#ff4444')))
+    fig.update_layout(title="Etapas mais lentas (p95)", barmode='group', xaxis_title="ms", height=max(300, 40 * len(mais_lentas)),
+                      template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', font=dict(color="#f0f0f0"))
+    st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(etapas, use_container_width=True, hide_index=True)
+
+    if os.path.exists(perfil.ARQUIVO_PERFIL):
+        st.download_button("📥 Baixar log estruturado (JSON por linha)", data=perfil.ler_log,
+                           file_name=perfil.ARQUIVO_PERFIL, mime="application/x-ndjson")
 
 # --- NAVEGAÇÃO ---
 if 'usuario_nome' not in st.session_state:
-    tela_login()
+    with perfil.rerun("login"):
+        tela_login()
 else:
-    st.sidebar.title(f"👩🏻‍💻 {st.session_state['usuario_nome']}")
-    menu = st.sidebar.radio("Menu", ["🌡️ Temperatura", "🚚 Não Conformidade", "📊 Análise Gráfica"])
-    
-    if menu == "🌡️ Temperatura": tela_cadastro_temp()
-    elif menu == "🚚 Não Conformidade": tela_nao_conformidade()
-    else: tela_grafico_temp()
+    # O rerun inteiro é medido (inclusive a barra lateral); a tela é conhecida depois do menu
+    with perfil.rerun(None, st.session_state['usuario_nome']) as medicao:
+        st.sidebar.title(f"👩🏻‍💻 {st.session_state['usuario_nome']}")
+        with perfil.etapa("alertas_recentes"):
+            total_alertas, recentes = alertas.ler_recentes(desde=datetime.now() - timedelta(hours=1), maximo=1)
+        if total_alertas:
+            st.sidebar.error(f"🚨 {total_alertas} alerta(s) na última hora\n\n**{recentes[-1]['chave']}**: {recentes[-1]['mensagem']}")
+        opcoes_menu = ["🌡️ Temperatura", "🚚 Não Conformidade", "📊 Análise Gráfica", "📐 Controle Estatístico"]
+        if usuario_admin():
+            opcoes_menu.append("⏱️ Performance")
+        menu = st.sidebar.radio("Menu", opcoes_menu)
+        medicao["tela"] = menu
+        fila = obter_fila_gravacao()
+        pendentes = fila.pendentes()
+        if pendentes:
+            aviso = f"⏳ {pendentes} registro(s) aguardando gravação."
+            if fila.ultimo_erro:
+                aviso += f"\n\nÚltima tentativa: {fila.ultimo_erro}. Se o arquivo estiver aberto no Excel, feche-o; os registros estão guardados e serão gravados."
+            st.sidebar.warning(aviso)
+
+        if menu == "🌡️ Temperatura": tela_cadastro_temp()
+        elif menu == "🚚 Não Conformidade": tela_nao_conformidade()
+        elif menu == "📊 Análise Gráfica": tela_grafico_temp()
+        elif menu == "📐 Controle Estatístico": tela_cep_temp()
+        else: tela_performance()
@@ -0,0 +1,974 @@
+"""Persistência em disco dos registros do ColdSpec (temperatura e NC)."""
+import glob
+import os
+import io
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import dados
+from camaras import CAMARA_PADRAO, validar_ids
+
+try:
+    import pyarrow  # noqa: F401  (motor do pd.read_parquet / to_parquet)
+    PARQUET_DISPONIVEL = True
+except ImportError:
+    PARQUET_DISPONIVEL = False
+
+# --- ESQUEMAS FIXOS ---
+COLUNAS_TEMP = ["Usuario", "Cargo", "Data", "Horario", "Temperatura", "Status"]
+# Linhas de temperatura podem trazer "Camara" (sem ela vale CAMARA_PADRAO).
+# Nos arquivos a câmara não é uma coluna: ela define o shard/partição.
+
+COLUNAS_AVARIAS = ["Quebra_Garrafa", "Lata_Amassada", "Filme_Rasgado", "Falta_SKU",
+                   "Emb_Avariada", "Palete_Quebrado", "Palete_Desalinhado", "Vazamento", "Palete_Molhado"]
+
+COLUNAS_NC = ["Usuario", "Cargo", "SKU", "Descricao_SKU", "Armazem", "Rua",
+              "Local_Avaria", "Observacoes"] + COLUNAS_AVARIAS + ["Data"]
+
+FORMATO_DATA = "%d/%m/%Y"
+FORMATO_HORA = "%H:%M:%S"
+
+SEPARADOR = ";"
+TAMANHO_MAX_ARQUIVO = 20 * 1024 * 1024  # 20 MB antes de rotacionar
+TIMEOUT_TRAVA = 10          # segundos esperando a trava
+TRAVA_ABANDONADA = 60       # trava sem renovação há mais que isso é considerada órfã
+RENOVACAO_TRAVA = TRAVA_ABANDONADA / 4  # quem segura a trava atualiza o mtime nesse intervalo
+LINHAS_BLOCO_EXPORTACAO = 50_000
+MAX_HISTORICOS_ORDENADOS = 8  # históricos de câmara mantidos já concatenados e ordenados
+ORDENACOES_TEMP = {"Timestamp": "ts", "Temperatura": "temperatura"}  # coluna tipada -> coluna SQL
+
+
+class ArquivoTravadoError(PermissionError):
+    """Não foi possível obter a trava do arquivo dentro do tempo limite."""
+
+
+# --- TRAVA ENTRE SESSÕES ---
+
+_travas_ativas = set()            # '.lock' deste processo, renovados pela thread abaixo
+_trava_ativas = threading.Lock()
+_renovador = None
+
+
+def _renovar_travas():
+    while True:
+        time.sleep(RENOVACAO_TRAVA)
+        with _trava_ativas:
+            ativas = list(_travas_ativas)
+        for caminho_trava in ativas:
+            try:
+                os.utime(caminho_trava)
+            except OSError:
+                pass
+
+
+def _registrar_trava(caminho_trava):
+    global _renovador
+    with _trava_ativas:
+        _travas_ativas.add(caminho_trava)
+        if _renovador is None:
+            _renovador = threading.Thread(target=_renovar_travas, name="renovar-travas", daemon=True)
+            _renovador.start()
+
+
+def _abandonada(caminho_trava):
+    return time.time() - os.path.getmtime(caminho_trava) > TRAVA_ABANDONADA
+
+
+def _remover_abandonada(caminho_trava):
+    """Remove a trava órfã; só quem cria o '.tomada' (O_EXCL) pode remover.
+
+    Sem isso dois processos podiam ver a mesma trava velha e um apagava a
+    trava nova que o outro acabou de criar. A idade é conferida de novo com
+    o '.tomada' em mãos: se outro já tomou a trava, ela está recente.
+    """
+    caminho_tomada = caminho_trava + ".tomada"
+    try:
+        fd = os.open(caminho_tomada, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            if _abandonada(caminho_tomada):  # processo caiu no meio da tomada
+                os.remove(caminho_tomada)
+        except OSError:
+            pass
+        return
+    os.close(fd)
+    try:
+        if _abandonada(caminho_trava):
+            os.remove(caminho_trava)
+    except OSError:
+        pass
+    finally:
+        os.remove(caminho_tomada)
+
+
+@contextmanager
+def trava_arquivo(caminho, timeout=TIMEOUT_TRAVA):
+    """Trava exclusiva baseada em arquivo '.lock' (funciona em Windows e Linux).
+
+    Enquanto a trava está com este processo o mtime do '.lock' é renovado;
+    uma trava sem renovação há TRAVA_ABANDONADA segundos é de uma sessão que caiu.
+    """
+    caminho_trava = caminho + ".lock"
+    inicio = time.time()
+    while True:
+        try:
+            fd = os.open(caminho_trava, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            break
+        except FileExistsError:
+            try:
+                if _abandonada(caminho_trava):
+                    _remover_abandonada(caminho_trava)
+            except OSError:
+                pass  # a trava sumiu ou foi tomada entre o open e o stat: tenta de novo
+            # Sempre confere o prazo e espera: um '.tomada' órfão não pode virar laço sem pausa
+            if time.time() - inicio > timeout:
+                raise ArquivoTravadoError(f"Arquivo em uso por outra sessão: {caminho}")
+            time.sleep(0.05)
+    _registrar_trava(caminho_trava)
+    try:
+        yield
+    finally:
+        with _trava_ativas:
+            _travas_ativas.discard(caminho_trava)
+        try:
+            os.remove(caminho_trava)
+        except OSError:
+            pass
+
+
+# --- ESCRITA APPEND-ONLY ---
+
+def ler_cabecalho(caminho, sep=SEPARADOR):
+    """Retorna as colunas da primeira linha do arquivo (ou None se vazio/inexistente)."""
+    if not os.path.exists(caminho) or os.path.getsize(caminho) == 0:
+        return None
+    with open(caminho, "r", encoding="utf-8", errors="replace") as f:
+        primeira = f.readline().strip().lstrip("﻿")
+    return primeira.split(sep) if primeira else None
+
+
+def grupo_gravacao(registro):
+    """(câmara, 'AAAA-MM') do registro cru: o shard/partição onde os backends o gravam.
+
+    Usado pela fila de gravação para confirmar cada shard separadamente.
+    """
+    data = str(registro.get("Data", ""))
+    return registro.get("Camara") or CAMARA_PADRAO, data[6:10] + "-" + data[3:5]
+
+
+def anexar_linhas(caminho, linhas, colunas, sep=SEPARADOR, tamanho_max=TAMANHO_MAX_ARQUIVO):
+    """Anexa registros ao final do arquivo sem reler o histórico.
+
+    O cabeçalho é escrito só quando o arquivo ainda não existe. Se o arquivo
+    antigo tiver outra ordem de colunas, as linhas novas seguem a ordem dele.
+    Ao passar de tamanho_max o arquivo é rotacionado e o segmento antigo é
+    compactado no esquema fixo em segundo plano (ninguém mais escreve nele).
+    """
+    df_novo = pd.DataFrame(list(linhas))
+    if df_novo.empty:
+        return 0
+    with trava_arquivo(caminho):
+        if tamanho_max and os.path.exists(caminho) and os.path.getsize(caminho) >= tamanho_max:
+            rotacionado = rotacionar_arquivo(caminho)
+            threading.Thread(target=_compactar_em_segundo_plano, args=(rotacionado, colunas, sep),
+                             name="compactar-segmento", daemon=True).start()
+        cabecalho = ler_cabecalho(caminho, sep)
+        ordem = cabecalho if cabecalho else colunas
+        df_novo = df_novo.reindex(columns=ordem)
+        if cabecalho and not _termina_com_quebra(caminho):
+            with open(caminho, "ab") as f:
+                f.write(os.linesep.encode())
+        df_novo.to_csv(caminho, mode="a", header=cabecalho is None, index=False, sep=sep)
+    return len(df_novo)
+
+
+def _termina_com_quebra(caminho):
+    with open(caminho, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+# --- ROTAÇÃO E COMPACTAÇÃO ---
+
+def rotacionar_arquivo(caminho):
+    """Renomeia o arquivo atual para '<nome>_AAAAMMDD_HHMMSS.csv'. Chamar com a trava obtida."""
+    base, ext = os.path.splitext(caminho)
+    carimbo = datetime.now().strftime('%Y%m%d_%H%M%S')
+    destino, n = f"{base}_{carimbo}{ext}", 1
+    while os.path.exists(destino):  # duas rotações no mesmo segundo
+        destino, n = f"{base}_{carimbo}_{n}{ext}", n + 1
+    os.replace(caminho, destino)
+    return destino
+
+
+def listar_segmentos(caminho):
+    """Arquivos rotacionados + o arquivo atual, do mais antigo para o mais novo."""
+    base, ext = os.path.splitext(caminho)
+    pasta = os.path.dirname(caminho) or "."
+    prefixo = os.path.basename(base) + "_"
+    segmentos = sorted(
+        os.path.join(pasta, f) for f in os.listdir(pasta)
+        if f.startswith(prefixo) and f.endswith(ext) and f[len(prefixo):-len(ext)].replace("_", "").isdigit()
+    )
+    if os.path.exists(caminho):
+        segmentos.append(caminho)
+    return segmentos
+
+
+def compactar_arquivo(caminho, colunas, sep=SEPARADOR):
+    """Reescreve o arquivo no esquema fixo, descartando linhas vazias ou quebradas."""
+    if not os.path.exists(caminho):
+        return 0
+    with trava_arquivo(caminho):
+        df = pd.read_csv(caminho, sep=sep, dtype=str, on_bad_lines="skip", engine="python")
+        df = df.dropna(how="all").reindex(columns=colunas)
+        temporario = caminho + ".tmp"
+        df.to_csv(temporario, index=False, sep=sep)
+        os.replace(temporario, caminho)
+    return len(df)
+
+
+def _compactar_em_segundo_plano(caminho, colunas, sep):
+    try:
+        compactar_arquivo(caminho, colunas, sep)
+    except (OSError, ValueError, pd.errors.ParserError):
+        pass  # o segmento continua legível como está; só não foi compactado
+
+
+# --- CONVERSÃO ENTRE O LAYOUT CSV E O LAYOUT TIPADO ---
+# No CSV a data/hora são textos dd/mm/AAAA e HH:MM:SS e as avarias são "Sim"/"Não".
+# No layout tipado há um Timestamp real, Temperatura float e avarias booleanas.
+# Linhas cuja data não converte ficam fora do layout tipado; quem passa
+# `invalidas` (lista) recebe essas linhas, no layout CSV, para relatar.
+
+def _sem_data(tipado, original, invalidas):
+    sem_data = tipado["Timestamp"].isna()
+    if not sem_data.any():
+        return tipado
+    if invalidas is not None:
+        invalidas.append(original[sem_data.to_numpy()])
+    return tipado[~sem_data]
+
+
+def recusar_invalidas(invalidas):
+    """Levanta ValueError se a conversão descartou linhas (caminho de gravação: nada some calado)."""
+    total = sum(len(df) for df in invalidas)
+    if total:
+        exemplo = invalidas[0].iloc[0].to_dict()
+        raise ValueError(f"{total} registro(s) com data/hora inválida (ex.: {exemplo})")
+
+
+def tipar_temp(df, invalidas=None):
+    camaras = df["Camara"].fillna(CAMARA_PADRAO).astype(str) if "Camara" in df.columns else CAMARA_PADRAO
+    df = df.reindex(columns=COLUNAS_TEMP)
+    tipado = pd.DataFrame({
+        "Timestamp": pd.to_datetime(df["Data"].astype(str) + " " + df["Horario"].astype(str),
+                                    format=f"{FORMATO_DATA} {FORMATO_HORA}", errors="coerce"),
+        "Usuario": df["Usuario"].astype("string"),
+        "Cargo": df["Cargo"].astype("string"),
+        "Temperatura": pd.to_numeric(df["Temperatura"].astype(str).str.replace(",", "."), errors="coerce"),
+        "Status": df["Status"].astype("string"),
+        "Camara": camaras,
+    })
+    return _sem_data(tipado, df, invalidas)
+
+
+def _data_e_hora(timestamps):
+    """Timestamps -> textos FORMATO_DATA / FORMATO_HORA.
+
+    Recorta a string ISO do numpy em vez de usar dt.strftime, que é ~10x mais
+    lento (o gráfico e o histórico convertem milhares de linhas por rerun).
+    """
+    if timestamps.isna().any():
+        return timestamps.dt.strftime(FORMATO_DATA), timestamps.dt.strftime(FORMATO_HORA)
+    iso = pd.Series(np.datetime_as_string(timestamps.to_numpy(), unit="s"), index=timestamps.index, dtype="string")
+    datas = iso.str.slice(8, 10) + "/" + iso.str.slice(5, 7) + "/" + iso.str.slice(0, 4)
+    return datas, iso.str.slice(11, 19)
+
+
+def destipar_temp(tipado):
+    datas, horas = _data_e_hora(tipado["Timestamp"])
+    df = pd.DataFrame({
+        "Usuario": tipado["Usuario"], "Cargo": tipado["Cargo"],
+        "Data": datas, "Horario": horas,
+        "Temperatura": tipado["Temperatura"], "Status": tipado["Status"],
+    })
+    return df.reset_index(drop=True)
+
+
+def avarias_para_bool(df):
+    """Converte as colunas de avaria presentes ('Sim'/'Não', qualquer caixa) em bool.
+
+    Colunas que já são bool passam direto, então dá para chamar mais de uma vez.
+    """
+    convertidas = {}
+    for col in COLUNAS_AVARIAS:
+        if col not in df.columns:
+            continue
+        serie = df[col]
+        if serie.dtype == bool:
+            convertidas[col] = serie
+        else:
+            convertidas[col] = serie.astype(str).str.strip().str.lower().eq("sim").to_numpy()
+    return pd.DataFrame(convertidas, index=df.index)
+
+
+COLUNAS_CATEGORICAS_NC = ["Armazem", "Local_Avaria", "Cargo", "Usuario"]
+
+
+def normalizar_nc(df):
+    """Avarias em bool e colunas repetitivas como category.
+
+    Reduz bastante a memória por linha e transforma as contagens do dashboard
+    em somas de arrays NumPy. Pode ser chamada de novo sobre o resultado.
+    """
+    if df.empty:
+        return df
+    df = df.copy()
+    bools = avarias_para_bool(df)
+    for col in bools.columns:
+        df[col] = bools[col]
+    for col in COLUNAS_CATEGORICAS_NC:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
+
+
+def nc_para_csv(df):
+    """Bytes CSV ';' no formato original (avarias 'Sim'/'Não'), para os botões de download."""
+    df = df.copy()
+    for col in COLUNAS_AVARIAS:
+        if col in df.columns and df[col].dtype == bool:
+            df[col] = np.where(df[col], "Sim", "Não")
+    return df.to_csv(index=False, sep=SEPARADOR).encode("utf-8")
+
+
+def tipar_nc(df, invalidas=None):
+    bools = avarias_para_bool(df.reindex(columns=COLUNAS_NC))
+    df = df.reindex(columns=COLUNAS_NC)
+    tipado = pd.DataFrame({"Timestamp": pd.to_datetime(df["Data"], format=FORMATO_DATA, errors="coerce")})
+    for col in COLUNAS_NC[:8]:
+        tipado[col] = df[col].astype("string")
+    for col in COLUNAS_AVARIAS:
+        tipado[col] = bools[col]
+    return _sem_data(tipado, df, invalidas)
+
+
+def _tipar_para_gravar(tipar, linhas):
+    invalidas = []
+    tipado = tipar(pd.DataFrame(list(linhas)), invalidas)
+    recusar_invalidas(invalidas)
+    return tipado
+
+
+def destipar_nc(tipado):
+    df = pd.DataFrame({col: tipado[col] for col in COLUNAS_NC[:8]})
+    for col in COLUNAS_AVARIAS:
+        df[col] = tipado[col].map({True: "Sim", False: "Não"})
+    df["Data"] = tipado["Timestamp"].dt.strftime(FORMATO_DATA)
+    return df.reset_index(drop=True)
+
+
+# --- BACKENDS ---
+# Todos expõem a mesma interface: anexar_*, carregar_* (layout CSV),
+# carregar_*_tipado (layout tipado), exportar_*_csv (arquivo binário para
+# download, escrito em blocos) e as consultas contar_temp / ultimas_temp /
+# carregar_temp_periodo / pagina_temp. versao_nc() é uma assinatura barata
+# do histórico de NC (muda a cada gravação), em tipos JSON.
+# As operações de temperatura recebem `camara` (padrão: CAMARA_PADRAO) e
+# camaras_com_dados() lista as câmaras que já têm leituras.
+
+def _com_datetime(tipado):
+    """Layout CSV + coluna 'Datetime' já convertida (usada pelos gráficos)."""
+    df = destipar_temp(tipado)
+    df["Datetime"] = tipado["Timestamp"].reset_index(drop=True)
+    return df
+
+
+def exportar_blocos(blocos, sep=SEPARADOR):
+    """Serializa DataFrames (layout CSV) um bloco por vez num buffer binário, já posicionado no início.
+
+    Nunca existe o texto CSV do histórico inteiro e a cópia em bytes ao mesmo
+    tempo: cada bloco é convertido e descartado antes do próximo.
+    """
+    arquivo = io.BytesIO()
+    cabecalho = True
+    for bloco in blocos:
+        arquivo.write(bloco.to_csv(index=False, sep=sep, header=cabecalho).encode("utf-8"))
+        cabecalho = False
+    arquivo.seek(0)
+    return arquivo
+
+
+def _filtrar_temp(tipado, status=None, usuario=None):
+    mascara = pd.Series(True, index=tipado.index)
+    if status:
+        mascara &= tipado["Status"] == status
+    if usuario:
+        mascara &= tipado["Usuario"].str.contains(usuario, case=False, regex=False).fillna(False)
+    return tipado[mascara]
+
+
+def _fatiar_periodo(tipado, inicio=None, fim=None):
+    """Fatia [inicio, fim] de um histórico ordenado por Timestamp (busca binária)."""
+    coluna = tipado["Timestamp"]
+    unidade = coluna.dt.unit  # Parquet guarda em segundos; o limite precisa caber na mesma unidade
+    ini = coluna.searchsorted(pd.Timestamp(inicio).ceil(unidade).as_unit(unidade), side="left") if inicio is not None else 0
+    fim = coluna.searchsorted(pd.Timestamp(fim).floor(unidade).as_unit(unidade), side="right") if fim is not None else len(tipado)
+    return tipado.iloc[ini:fim]
+
+
+class ConsultasPandas:
+    """Consultas de temperatura feitas em memória, para backends sem índice próprio.
+
+    O backend informa os arquivos de temperatura da câmara (_arquivos_temp) e
+    como ler um deles já tipado e ordenado (_ler_arquivo_temp). O histórico
+    concatenado fica guardado, ordenado por Timestamp, até algum arquivo
+    mudar; período e últimas leituras viram buscas binárias e fatias em vez
+    de converter e ordenar tudo a cada rerun. Os DataFrames devolvidos são
+    compartilhados: não alterar no lugar.
+    """
+
+    def __init__(self):
+        self._ordenados = OrderedDict()   # (câmara, arquivos) -> (assinaturas, histórico ordenado)
+        self._trava_ordenados = threading.Lock()
+
+    def _temp_ordenado(self, camara, inicio=None, fim=None):
+        try:
+            return self._montar_ordenado(camara, inicio, fim)
+        except FileNotFoundError:
+            # Arquivo compactado/rotacionado entre a listagem e a leitura: lista de novo
+            return self._montar_ordenado(camara, inicio, fim)
+
+    def _montar_ordenado(self, camara, inicio, fim):
+        arquivos = tuple(self._arquivos_temp(camara, inicio, fim))
+        assinaturas = tuple(dados.CacheArquivos.assinatura(a) for a in arquivos)
+        chave = (camara, arquivos)
+        with self._trava_ordenados:
+            guardado = self._ordenados.get(chave)
+            if guardado is not None and guardado[0] == assinaturas:
+                self._ordenados.move_to_end(chave)
+                return guardado[1]
+
+        partes = [dados.carregar(a, self._ler_arquivo_temp, copiar=False) for a in arquivos]
+        partes = [p for p in partes if not p.empty]
+        tipado = pd.concat(partes, ignore_index=True) if partes else tipar_temp(pd.DataFrame(columns=COLUNAS_TEMP))
+        # Cada arquivo já vem ordenado; só reordena se eles se sobrepõem no tempo
+        if not tipado["Timestamp"].is_monotonic_increasing:
+            tipado = tipado.sort_values("Timestamp", kind="stable", ignore_index=True)
+        tipado["Camara"] = camara
+
+        with self._trava_ordenados:
+            self._ordenados[chave] = (assinaturas, tipado)
+            self._ordenados.move_to_end(chave)
+            while len(self._ordenados) > MAX_HISTORICOS_ORDENADOS:
+                self._ordenados.popitem(last=False)
+        return tipado
+
+    def carregar_temp_tipado(self, inicio=None, fim=None, camara=CAMARA_PADRAO):
+        return _fatiar_periodo(self._temp_ordenado(camara, inicio, fim), inicio, fim)
+
+    def contar_temp(self, status=None, camara=CAMARA_PADRAO, usuario=None):
+        tipado = self._temp_ordenado(camara)
+        if not status and not usuario:
+            return len(tipado)
+        return len(_filtrar_temp(tipado, status, usuario))
+
+    def pagina_temp(self, inicio, limite, camara=CAMARA_PADRAO, status=None, usuario=None,
+                    ordem="Timestamp", crescente=False):
+        """Só as linhas [inicio, inicio+limite) do histórico filtrado e ordenado (layout CSV)."""
+        tipado = self._temp_ordenado(camara)
+        if status or usuario:
+            tipado = _filtrar_temp(tipado, status, usuario)
+        if ordem != "Timestamp":
+            tipado = tipado.sort_values(ordem, ascending=crescente, kind="stable")
+        elif not crescente:
+            # Já ordenado: a página decrescente é uma fatia contada a partir do fim
+            fim = max(len(tipado) - inicio, 0)
+            return destipar_temp(tipado.iloc[max(fim - limite, 0):fim].iloc[::-1])
+        return destipar_temp(tipado.iloc[inicio:inicio + limite])
+
+    def exportar_temp_csv(self, camara=CAMARA_PADRAO):
+        tipado = self._temp_ordenado(camara)
+        return exportar_blocos(destipar_temp(tipado.iloc[i:i + LINHAS_BLOCO_EXPORTACAO])
+                               for i in range(0, len(tipado), LINHAS_BLOCO_EXPORTACAO))
+
+    def ultimas_temp(self, n, camara=CAMARA_PADRAO):
+        return _com_datetime(self._temp_ordenado(camara).iloc[-n:].iloc[::-1])
+
+    def carregar_temp_periodo(self, inicio, fim=None, camara=CAMARA_PADRAO):
+        # Só lê os shards/partições dos meses do intervalo
+        return _com_datetime(self.carregar_temp_tipado(inicio, fim, camara))
+
+
+def _assinaturas(arquivos):
+    versao = []
+    for arquivo in arquivos:
+        try:
+            st = os.stat(arquivo)
+        except FileNotFoundError:
+            continue
+        versao.append([os.path.basename(arquivo), st.st_size, st.st_mtime_ns])
+    return versao
+
+
+def _mes_da_data(datas):
+    """'dd/mm/AAAA' -> 'AAAA-MM' (vetorizado)."""
+    datas = datas.astype(str)
+    return datas.str[6:10] + "-" + datas.str[3:5]
+
+
+class BackendCSV(ConsultasPandas):
+    """Arquivos ';' append-only (formato histórico do ColdSpec).
+
+    A temperatura é gravada em shards por câmara e mês
+    (dados_temperatura/<câmara>/AAAA-MM.csv). O arquivo único antigo
+    continua sendo lido como histórico da CAMARA_PADRAO.
+    """
+    nome = "csv"
+
+    def __init__(self, arquivo_temp, arquivo_nc):
+        super().__init__()
+        self.arquivo_temp = arquivo_temp
+        self.pasta_temp = os.path.splitext(arquivo_temp)[0]
+        self.arquivo_nc = arquivo_nc
+
+    def _arquivos_temp(self, camara, inicio=None, fim=None):
+        shards = [self.arquivo_temp] if camara == CAMARA_PADRAO and os.path.exists(self.arquivo_temp) else []
+        mes_ini = inicio.strftime("%Y-%m") if inicio is not None else None
+        mes_fim = fim.strftime("%Y-%m") if fim is not None else None
+        for shard in sorted(glob.glob(os.path.join(self.pasta_temp, glob.escape(camara), "*.csv"))):
+            mes = os.path.basename(shard)[:-len(".csv")]
+            if (mes_ini and mes < mes_ini) or (mes_fim and mes > mes_fim):
+                continue
+            shards.append(shard)
+        return shards
+
+    def camaras_com_dados(self):
+        camaras = {CAMARA_PADRAO} if os.path.exists(self.arquivo_temp) else set()
+        if os.path.isdir(self.pasta_temp):
+            camaras.update(d for d in os.listdir(self.pasta_temp) if os.path.isdir(os.path.join(self.pasta_temp, d)))
+        return sorted(camaras)
+
+    def anexar_temp(self, linhas):
+        df = pd.DataFrame(list(linhas))
+        if df.empty:
+            return 0
+        invalidas = []
+        tipar_temp(df, invalidas)  # linha que não relê não entra no arquivo
+        recusar_invalidas(invalidas)
+        camaras = df.pop("Camara").fillna(CAMARA_PADRAO) if "Camara" in df.columns else pd.Series(CAMARA_PADRAO, index=df.index)
+        validar_ids(camaras)  # vira nome de pasta
+        total = 0
+        for (camara, mes), parte in df.groupby([camaras, _mes_da_data(df["Data"])]):
+            pasta = os.path.join(self.pasta_temp, str(camara))
+            os.makedirs(pasta, exist_ok=True)
+            total += anexar_linhas(os.path.join(pasta, f"{mes}.csv"), parte.to_dict("records"), COLUNAS_TEMP, tamanho_max=None)
+        return total
+
+    def anexar_nc(self, linhas):
+        linhas = list(linhas)
+        _tipar_para_gravar(tipar_nc, linhas)
+        return anexar_linhas(self.arquivo_nc, linhas, COLUNAS_NC)
+
+    def versao_nc(self):
+        return _assinaturas(listar_segmentos(self.arquivo_nc))
+
+    def linhas_invalidas(self):
+        """Linhas do histórico CSV que a conversão descarta (data/hora que não converte), com o arquivo de origem."""
+        partes = []
+        for camara in self.camaras_com_dados():
+            for arquivo in self._arquivos_temp(camara):
+                invalidas = []
+                tipar_temp(dados.ler_historico_temp(arquivo), invalidas)
+                partes += [df.assign(Tabela="temperatura", Arquivo=arquivo) for df in invalidas]
+        for arquivo in listar_segmentos(self.arquivo_nc):
+            invalidas = []
+            tipar_nc(dados.ler_csv_nc(arquivo), invalidas)
+            partes += [df.assign(Tabela="nao_conformidade", Arquivo=arquivo) for df in invalidas]
+        return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+
+    @staticmethod
+    def _ler_arquivo_temp(caminho):
+        # Data/Horario viram Timestamp uma vez por versão do arquivo (fica no cache de dados)
+        tipado = tipar_temp(dados.ler_historico_temp(caminho)).drop(columns=["Camara"])
+        return tipado.sort_values("Timestamp", kind="stable", ignore_index=True)
+
+    def carregar_temp(self, camara=CAMARA_PADRAO, inicio=None, fim=None):
+        return destipar_temp(self.carregar_temp_tipado(inicio, fim, camara))
+
+    def carregar_nc(self):
+        # Inclui os arquivos já rotacionados
+        partes = [dados.carregar(seg, dados.ler_csv_nc) for seg in listar_segmentos(self.arquivo_nc)]
+        partes = [p for p in partes if not p.empty]
+        if not partes:
+            return pd.DataFrame()
+        return pd.concat(partes, ignore_index=True)
+
+    def carregar_nc_tipado(self):
+        return tipar_nc(self.carregar_nc())
+
+    def exportar_nc_csv(self):
+        return nc_para_csv(self.carregar_nc())
+
+
+MAX_PARTES_PARTICAO = 50  # arquivos pequenos por mês antes de compactar
+MANIFESTO_PARTICAO = "_arquivos.json"  # arquivos vivos da partição (trocado atomicamente)
+
+
+def _arquivos_particao(particao):
+    """Arquivos da partição segundo o manifesto.
+
+    O escritor troca o manifesto com os.replace depois de gravar a parte ou o
+    arquivo compactado, então o leitor vê a lista antiga ou a nova, nunca o
+    compactado junto com as partes que ele substitui. Partições de antes do
+    manifesto são listadas pelo glob.
+    """
+    try:
+        with open(os.path.join(particao, MANIFESTO_PARTICAO), encoding="utf-8") as f:
+            nomes = json.load(f)
+    except FileNotFoundError:
+        return sorted(glob.glob(os.path.join(particao, "*.parquet")))
+    return [os.path.join(particao, nome) for nome in nomes]
+
+
+def _gravar_manifesto(particao, arquivos):
+    caminho = os.path.join(particao, MANIFESTO_PARTICAO)
+    with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+        json.dump([os.path.basename(a) for a in arquivos], f)
+    os.replace(caminho + ".tmp", caminho)
+
+
+class BackendParquet(ConsultasPandas):
+    """Parquet tipado, particionado por mês: <pasta>/<tabela>/mes=AAAA-MM/*.parquet.
+
+    A temperatura é particionada também por câmara (temperatura/camara=ID/mes=AAAA-MM);
+    partições antigas sem câmara (temperatura/mes=...) pertencem à CAMARA_PADRAO.
+
+    Cada gravação cria um arquivo pequeno na partição do mês; quando a partição
+    acumula MAX_PARTES_PARTICAO arquivos eles são fundidos num só. Os leitores
+    seguem o manifesto da partição (_arquivos_particao), não o glob.
+    """
+    nome = "parquet"
+
+    def __init__(self, pasta):
+        if not PARQUET_DISPONIVEL:
+            raise RuntimeError("Backend Parquet requer o pacote 'pyarrow'.")
+        super().__init__()
+        self.pasta = pasta
+
+    def _particoes(self, tabela, inicio=None, fim=None, camara=None):
+        particoes = []
+        if camara is None or camara == CAMARA_PADRAO:
+            particoes += sorted(glob.glob(os.path.join(self.pasta, tabela, "mes=*")))
+        if camara is not None:
+            particoes += sorted(glob.glob(os.path.join(self.pasta, tabela, f"camara={glob.escape(camara)}", "mes=*")))
+        mes_ini = inicio.strftime("%Y-%m") if inicio is not None else None
+        mes_fim = fim.strftime("%Y-%m") if fim is not None else None
+        selecionadas = []
+        for particao in particoes:
+            if not os.path.isdir(particao):
+                continue  # '<partição>.lock' de uma gravação em andamento
+            mes = particao.rsplit("mes=", 1)[1]
+            if (mes_ini and mes < mes_ini) or (mes_fim and mes > mes_fim):
+                continue
+            selecionadas.append(particao)
+        return selecionadas
+
+    def escrever_tipado(self, tabela, tipado):
+        """Grava um DataFrame já tipado, separando por partição de câmara (se houver) e mês."""
+        if tipado.empty:
+            return 0
+        if "Camara" in tipado.columns:
+            validar_ids(tipado["Camara"])  # vira nome de pasta
+            camaras = "camara=" + tipado["Camara"].astype(str)
+            tipado = tipado.drop(columns=["Camara"])  # a câmara fica no caminho da partição
+        else:
+            camaras = pd.Series("", index=tipado.index)
+        for (camara, mes), parte in tipado.groupby([camaras, tipado["Timestamp"].dt.strftime("%Y-%m")]):
+            particao = os.path.join(self.pasta, tabela, camara, f"mes={mes}")
+            os.makedirs(particao, exist_ok=True)
+            with trava_arquivo(particao):
+                arquivos = _arquivos_particao(particao)
+                nome = os.path.join(particao, f"parte-{time.time_ns()}.parquet")
+                parte.to_parquet(nome, index=False)
+                arquivos.append(nome)
+                _gravar_manifesto(particao, arquivos)
+                if len(arquivos) >= MAX_PARTES_PARTICAO:
+                    self._compactar_particao(particao, arquivos)
+        return len(tipado)
+
+    @staticmethod
+    def _compactar_particao(particao, arquivos):
+        """Funde os arquivos da partição. Chamar com a trava da partição obtida.
+
+        As partes só são apagadas depois que o manifesto passa a apontar para o
+        arquivo compactado.
+        """
+        df = pd.concat([pd.read_parquet(a) for a in arquivos], ignore_index=True)
+        df = df.sort_values("Timestamp", kind="stable")
+        destino = os.path.join(particao, f"compactado-{time.time_ns()}.parquet")
+        df.to_parquet(destino + ".tmp", index=False)
+        os.replace(destino + ".tmp", destino)
+        _gravar_manifesto(particao, [destino])
+        for a in arquivos:
+            os.remove(a)
+
+    @staticmethod
+    def _ler_particao(particao):
+        for _ in range(3):
+            try:
+                return [dados.carregar(a, pd.read_parquet, copiar=False) for a in _arquivos_particao(particao)]
+            except FileNotFoundError:
+                continue  # compactada por outra sessão entre o manifesto e a leitura: lê o manifesto novo
+        return [dados.carregar(a, pd.read_parquet, copiar=False) for a in _arquivos_particao(particao)]
+
+    def _ler(self, tabela, colunas_vazias, inicio=None, fim=None, camara=None):
+        partes = []
+        for particao in self._particoes(tabela, inicio, fim, camara):
+            partes += self._ler_particao(particao)
+        if not partes:
+            vazio = pd.DataFrame(columns=colunas_vazias)
+            vazio["Timestamp"] = pd.to_datetime(vazio["Timestamp"])
+            return vazio
+        df = pd.concat(partes, ignore_index=True)
+        if inicio is not None:
+            df = df[df["Timestamp"] >= inicio]
+        if fim is not None:
+            df = df[df["Timestamp"] <= fim]
+        return df.reset_index(drop=True)
+
+    def anexar_temp(self, linhas):
+        return self.escrever_tipado("temperatura", _tipar_para_gravar(tipar_temp, linhas))
+
+    def anexar_nc(self, linhas):
+        return self.escrever_tipado("nao_conformidade", _tipar_para_gravar(tipar_nc, linhas))
+
+    def camaras_com_dados(self):
+        base = os.path.join(self.pasta, "temperatura")
+        camaras = {CAMARA_PADRAO} if glob.glob(os.path.join(base, "mes=*")) else set()
+        camaras.update(p.rsplit("camara=", 1)[1] for p in glob.glob(os.path.join(base, "camara=*")))
+        return sorted(camaras)
+
+    def _arquivos_temp(self, camara, inicio=None, fim=None):
+        return [arquivo for particao in self._particoes("temperatura", inicio, fim, camara)
+                for arquivo in _arquivos_particao(particao)]
+
+    @staticmethod
+    def _ler_arquivo_temp(caminho):
+        return pd.read_parquet(caminho).sort_values("Timestamp", kind="stable", ignore_index=True)
+
+    def carregar_nc_tipado(self, inicio=None, fim=None):
+        return self._ler("nao_conformidade", ["Timestamp"] + COLUNAS_NC[:8] + COLUNAS_AVARIAS, inicio, fim)
+
+    def versao_nc(self):
+        return _assinaturas(a for particao in self._particoes("nao_conformidade") for a in _arquivos_particao(particao))
+
+    def carregar_temp(self, camara=CAMARA_PADRAO):
+        return destipar_temp(self.carregar_temp_tipado(camara=camara))
+
+    def carregar_nc(self):
+        tipado = self.carregar_nc_tipado()
+        return destipar_nc(tipado) if not tipado.empty else pd.DataFrame()
+
+    def exportar_nc_csv(self):
+        return nc_para_csv(self.carregar_nc())
+
+
+# Colunas do SQLite (snake_case) -> colunas do layout tipado
+COLUNAS_SQL_TEMP = {"ts": "Timestamp", "usuario": "Usuario", "cargo": "Cargo",
+                    "temperatura": "Temperatura", "status": "Status", "camara": "Camara"}
+COLUNAS_SQL_NC = {"ts": "Timestamp", **{c.lower(): c for c in COLUNAS_NC[:8] + COLUNAS_AVARIAS}}
+
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS temperatura (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    usuario TEXT, cargo TEXT,
+    temperatura REAL,
+    status TEXT,
+    camara TEXT NOT NULL DEFAULT 'CF-01'
+);
+CREATE INDEX IF NOT EXISTS idx_temp_ts ON temperatura (ts);
+CREATE INDEX IF NOT EXISTS idx_temp_usuario ON temperatura (usuario, ts);
+CREATE INDEX IF NOT EXISTS idx_temp_status ON temperatura (status, ts);
+
+CREATE TABLE IF NOT EXISTS nao_conformidade (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    usuario TEXT, cargo TEXT, sku TEXT, descricao_sku TEXT,
+    armazem TEXT, rua TEXT, local_avaria TEXT, observacoes TEXT,
+""" + ",\n".join(f"    {c.lower()} INTEGER NOT NULL DEFAULT 0" for c in COLUNAS_AVARIAS) + """
+);
+CREATE INDEX IF NOT EXISTS idx_nc_ts ON nao_conformidade (ts);
+CREATE INDEX IF NOT EXISTS idx_nc_usuario ON nao_conformidade (usuario, ts);
+CREATE INDEX IF NOT EXISTS idx_nc_armazem ON nao_conformidade (armazem, ts);
+"""
+
+FORMATO_TS_SQL = "%Y-%m-%d %H:%M:%S"
+
+
+class BackendSQLite:
+    """Banco SQLite embutido em modo WAL, com índices por data, usuário, armazém e status.
+
+    Cada thread (sessão do Streamlit) usa a própria conexão; o WAL permite
+    leituras concorrentes enquanto outra sessão grava.
+    """
+    nome = "sqlite"
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+        with self._conexao() as con:
+            con.executescript(ESQUEMA_SQLITE)
+            # Bancos criados antes do cadastro de câmaras não têm a coluna
+            colunas = {linha[1] for linha in con.execute("PRAGMA table_info(temperatura)")}
+            if "camara" not in colunas:
+                con.execute(f"ALTER TABLE temperatura ADD COLUMN camara TEXT NOT NULL DEFAULT '{CAMARA_PADRAO}'")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_temp_camara ON temperatura (camara, ts)")
+
+    def _conexao(self):
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.caminho, timeout=TIMEOUT_TRAVA * 3)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def _consultar(self, sql, parametros=()):
+        return pd.read_sql_query(sql, self._conexao(), params=parametros)
+
+    # Escrita
+    def escrever_tipado(self, tabela, tipado):
+        """Insere um DataFrame tipado numa única transação."""
+        if tipado.empty:
+            return 0
+        mapa = COLUNAS_SQL_TEMP if tabela == "temperatura" else COLUNAS_SQL_NC
+        df = tipado.reindex(columns=list(mapa.values())).copy()
+        if "Camara" in df.columns:
+            df["Camara"] = df["Camara"].fillna(CAMARA_PADRAO)
+            validar_ids(df["Camara"])  # mesmo id que o CSV/Parquet aceitam (o histórico pode ser migrado)
+        df["Timestamp"] = df["Timestamp"].dt.strftime(FORMATO_TS_SQL)
+        for col in COLUNAS_AVARIAS:
+            if col in df.columns:
+                df[col] = df[col].fillna(False).astype(int)
+        df = df.astype(object).where(df.notna(), None)
+        colunas = ", ".join(mapa)
+        marcadores = ", ".join("?" * len(mapa))
+        with self._conexao() as con:
+            con.executemany(f"INSERT INTO {tabela} ({colunas}) VALUES ({marcadores})",
+                            df.itertuples(index=False, name=None))
+        return len(df)
+
+    def anexar_temp(self, linhas):
+        return self.escrever_tipado("temperatura", _tipar_para_gravar(tipar_temp, linhas))
+
+    def anexar_nc(self, linhas):
+        return self.escrever_tipado("nao_conformidade", _tipar_para_gravar(tipar_nc, linhas))
+
+    # Leitura
+    def _ler(self, tabela, mapa, filtro="", parametros=(), sufixo=""):
+        selecao = ", ".join(f"{sql} AS {col}" for sql, col in mapa.items())
+        df = self._consultar(f"SELECT {selecao} FROM {tabela} {filtro} {sufixo}", parametros)
+        df["Timestamp"] = pd.to_datetime(df["Timestamp"], format=FORMATO_TS_SQL)
+        for col in COLUNAS_AVARIAS:
+            if col in df.columns:
+                df[col] = df[col].astype(bool)
+        return df
+
+    def carregar_temp_tipado(self, inicio=None, fim=None, camara=CAMARA_PADRAO):
+        filtro, parametros = _filtro_periodo(inicio, fim, camara)
+        return self._ler("temperatura", COLUNAS_SQL_TEMP, filtro, parametros, "ORDER BY ts, id")
+
+    def carregar_nc_tipado(self, inicio=None, fim=None):
+        filtro, parametros = _filtro_periodo(inicio, fim)
+        return self._ler("nao_conformidade", COLUNAS_SQL_NC, filtro, parametros, "ORDER BY ts, id")
+
+    def carregar_temp(self, camara=CAMARA_PADRAO):
+        return destipar_temp(self.carregar_temp_tipado(camara=camara))
+
+    def carregar_nc(self):
+        tipado = self.carregar_nc_tipado()
+        return destipar_nc(tipado) if not tipado.empty else pd.DataFrame()
+
+    def versao_nc(self):
+        return list(self._conexao().execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM nao_conformidade").fetchone())
+
+    # Consultas com filtro/agregação feitos no banco
+    def camaras_com_dados(self):
+        return [linha[0] for linha in self._conexao().execute("SELECT DISTINCT camara FROM temperatura ORDER BY camara")]
+
+    def contar_temp(self, status=None, camara=CAMARA_PADRAO, usuario=None):
+        filtro, parametros = _filtro_periodo(None, None, camara, status, usuario)
+        return self._conexao().execute(f"SELECT COUNT(*) FROM temperatura {filtro}", parametros).fetchone()[0]
+
+    def pagina_temp(self, inicio, limite, camara=CAMARA_PADRAO, status=None, usuario=None,
+                    ordem="Timestamp", crescente=False):
+        # LIMIT/OFFSET no banco: só a página visível sai do SQLite
+        filtro, parametros = _filtro_periodo(None, None, camara, status, usuario)
+        direcao = "ASC" if crescente else "DESC"
+        sufixo = f"ORDER BY {ORDENACOES_TEMP[ordem]} {direcao}, id {direcao} LIMIT ? OFFSET ?"
+        tipado = self._ler("temperatura", COLUNAS_SQL_TEMP, filtro, parametros + (int(limite), int(inicio)), sufixo)
+        return destipar_temp(tipado)
+
+    def ultimas_temp(self, n, camara=CAMARA_PADRAO):
+        tipado = self._ler("temperatura", COLUNAS_SQL_TEMP, "WHERE camara = ?", (camara, int(n)),
+                           "ORDER BY ts DESC, id DESC LIMIT ?")
+        return _com_datetime(tipado)
+
+    def carregar_temp_periodo(self, inicio, fim=None, camara=CAMARA_PADRAO):
+        return _com_datetime(self.carregar_temp_tipado(inicio, fim, camara))
+
+    def exportar_temp_csv(self, camara=CAMARA_PADRAO):
+        selecao = ", ".join(f"{sql} AS {col}" for sql, col in COLUNAS_SQL_TEMP.items())
+        blocos = pd.read_sql_query(f"SELECT {selecao} FROM temperatura WHERE camara = ? ORDER BY ts, id",
+                                   self._conexao(), params=(camara,), chunksize=LINHAS_BLOCO_EXPORTACAO)
+        return exportar_blocos(
+            destipar_temp(bloco.assign(Timestamp=pd.to_datetime(bloco["Timestamp"], format=FORMATO_TS_SQL)))
+            for bloco in blocos)
+
+    def exportar_nc_csv(self):
+        return nc_para_csv(self.carregar_nc())
+
+
+def _filtro_periodo(inicio, fim, camara=None, status=None, usuario=None):
+    condicoes, parametros = [], []
+    if camara is not None:
+        condicoes.append("camara = ?")
+        parametros.append(camara)
+    if status:
+        condicoes.append("status = ?")
+        parametros.append(status)
+    if usuario:
+        condicoes.append("usuario LIKE ? ESCAPE '\\'")
+        parametros.append("%" + usuario.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+    if inicio is not None:
+        condicoes.append("ts >= ?")
+        parametros.append(pd.Timestamp(inicio).strftime(FORMATO_TS_SQL))
+    if fim is not None:
+        condicoes.append("ts <= ?")
+        parametros.append(pd.Timestamp(fim).strftime(FORMATO_TS_SQL))
+    filtro = ("WHERE " + " AND ".join(condicoes)) if condicoes else ""
+    return filtro, tuple(parametros)
+
+
+def criar_backend(nome, arquivo_temp, arquivo_nc, pasta_parquet, arquivo_sqlite=None):
+    """Instancia o backend pelo nome ('csv', 'parquet' ou 'sqlite')."""
+    if nome == "parquet":
+        return BackendParquet(pasta_parquet)
+    if nome == "sqlite":
+        return BackendSQLite(arquivo_sqlite)
+    if nome == "csv":
+        return BackendCSV(arquivo_temp, arquivo_nc)
+    raise ValueError(f"Backend de armazenamento desconhecido: {nome}")
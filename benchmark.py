@@ -0,0 +1,433 @@
+"""Benchmark dos caminhos de dados do ColdSpec (sem Streamlit), com dados sintéticos.
+
+Uso:
+    python benchmark.py [--linhas 1000 10000 100000] [--backend csv parquet sqlite]
+                        [--repeticoes 3] [--saida relatorio.json] [--base anterior.json] [--tolerancia 0.25]
+
+Para cada tamanho gera usuários, SKUs (latin1, 'Código Promax;Material'), leituras
+de temperatura e registros de NC numa pasta temporária e mede cada caminho:
+gravação (carga em lote e uma linha por vez, como salvar_temp/salvar_nc),
+leituras (frias e com cache), busca de SKU, login e as agregações dos dashboards.
+O tempo é o menor de `--repeticoes` execuções; o pico de memória (tracemalloc)
+vem de uma execução extra. Com --base, sai com código 1 se algum caminho ficou
+mais lento que a tolerância em relação ao relatório anterior.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import agregados_nc
+import amostragem
+import analise_nc
+import cep
+import dados
+import fila_gravacao
+from armazenamento import (COLUNAS_AVARIAS, COLUNAS_NC, FORMATO_DATA, FORMATO_HORA, PARQUET_DISPONIVEL,
+                           criar_backend, grupo_gravacao, normalizar_nc, tipar_nc)
+from camaras import CAMARA_PADRAO, LIE_PADRAO, LSE_PADRAO
+from indices import construir_diretorio_usuarios, construir_indice_sku
+
+LINHAS_PADRAO = [1_000, 10_000, 100_000]
+BLOCO_CARGA = 100_000      # registros por chamada de anexar na carga em lote
+GRAVACOES_UNITARIAS = 20   # linhas gravadas uma a uma nos cenários salvar_*
+CONSULTAS = 1_000          # buscas nos cenários de SKU e login
+DIAS_HISTORICO = 365
+FOLGA_REGRESSAO = 0.005    # segundos: diferenças menores que isso são ruído de medição
+PONTOS_REDUCAO = 10 * amostragem.PONTOS_MAXIMOS  # série mínima do cenário reduzir_serie (abaixo do alvo ela volta inteira)
+
+ARMAZENS = ["Armazém A", "Armazém B", "Armazém C", "Armazém R", "Armazém M"]
+NIVEIS = ["Topo", "Meio", "Base"]
+CARGOS = ["AJUDANTE", "CONFERENTE", "OPERADOR", "SUPERVISOR"]
+PALAVRAS_MATERIAL = ["CERVEJA", "REFRIGERANTE", "AGUA", "SUCO", "ENERGETICO", "LATA", "LITRAO", "LONG NECK",
+                     "CX", "PACK", "PET", "350ML", "600ML", "1L", "2L", "INTEGRAL", "ZERO", "LIMAO", "GUARANÁ"]
+
+
+# --- GERADORES ---
+
+def gerar_usuarios(n, rng):
+    # Matrículas de 8 dígitos distintas, em ordem aleatória
+    ids = 10_000_000 + rng.permutation(n) * (89_999_999 // n)
+    return pd.DataFrame({
+        "nome": [f"USUARIO SINTETICO {i}" for i in range(n)],
+        "id_login": ids.astype(str),
+        "tipo": rng.choice(CARGOS, size=n),
+    })
+
+
+def gerar_skus(n, rng):
+    """Mesmo formato do 'sku (1).csv': código numérico e material com espaço à esquerda."""
+    codigos = 90_000_000 + rng.permutation(n) * max(1, 9_999_999 // n)
+    palavras = rng.choice(PALAVRAS_MATERIAL, size=(n, 4))
+    return pd.DataFrame({
+        "Código Promax": codigos.astype(str),
+        "Material": [" " + " ".join(p) + " " for p in palavras],
+    })
+
+
+def gerar_temperaturas(n, rng, fim=None, dias=DIAS_HISTORICO):
+    """Leituras a intervalos regulares até `fim`, em torno de 4,5ºC com algumas excursões."""
+    fim = fim or datetime.now()
+    passo = timedelta(days=dias) / n
+    instantes = pd.Timestamp(fim - passo * (n - 1)) + pd.to_timedelta(np.arange(n) * passo.total_seconds(), unit="s")
+    temperaturas = 4.5 + rng.normal(0, 0.8, n)
+    excursoes = rng.random(n) < 0.02
+    temperaturas[excursoes] += rng.choice([-4.0, 4.0], size=excursoes.sum())
+    temperaturas = temperaturas.round(1)
+    return pd.DataFrame({
+        "Usuario": "SENSOR", "Cargo": "Sensor",
+        "Data": instantes.strftime(FORMATO_DATA), "Horario": instantes.strftime(FORMATO_HORA),
+        "Temperatura": temperaturas,
+        "Status": np.where((temperaturas < LIE_PADRAO) | (temperaturas > LSE_PADRAO), "ERRO", "OK"),
+        "Camara": CAMARA_PADRAO,
+    })
+
+
+def gerar_nc(n, rng, skus, usuarios, fim=None, dias=DIAS_HISTORICO):
+    fim = fim or datetime.now()
+    datas = pd.Timestamp(fim) - pd.to_timedelta(rng.integers(0, dias, n), unit="D")
+    indices_sku = rng.integers(0, len(skus), n)
+    indices_usuario = rng.integers(0, len(usuarios), n)
+    df = pd.DataFrame({
+        "Usuario": usuarios["nome"].to_numpy()[indices_usuario],
+        "Cargo": usuarios["tipo"].to_numpy()[indices_usuario],
+        "SKU": skus["Código Promax"].to_numpy()[indices_sku],
+        "Descricao_SKU": skus["Material"].str.strip().to_numpy()[indices_sku],
+        "Armazem": rng.choice(ARMAZENS, n),
+        "Rua": rng.integers(1, 40, n).astype(str),
+        "Local_Avaria": rng.choice(NIVEIS, n),
+        "Observacoes": "",
+    })
+    marcadas = rng.random((n, len(COLUNAS_AVARIAS))) < 0.15
+    for i, col in enumerate(COLUNAS_AVARIAS):
+        df[col] = np.where(marcadas[:, i], "Sim", "Não")
+    df["Data"] = datas.strftime(FORMATO_DATA)
+    return df[COLUNAS_NC]
+
+
+def gravar_em_lote(anexar, df, bloco=BLOCO_CARGA):
+    """Grava um DataFrame grande pelo caminho público de anexar, em blocos de registros."""
+    total = 0
+    for i in range(0, len(df), bloco):
+        total += anexar(df.iloc[i:i + bloco].to_dict("records"))
+    return total
+
+
+# --- AMBIENTE ---
+
+class Ambiente:
+    """Pasta temporária com os arquivos sintéticos de um tamanho e um backend carregado."""
+
+    def __init__(self, pasta, n, seed=0):
+        self.pasta, self.n, self.seed = pasta, n, seed
+        rng = np.random.default_rng(seed)
+        self.usuarios = gerar_usuarios(n, rng)
+        self.skus = gerar_skus(n, rng)
+        self.temp = gerar_temperaturas(n, rng)
+        self.nc = gerar_nc(n, rng, self.skus, self.usuarios)
+        self.arquivo_usuarios = os.path.join(pasta, "users.csv")
+        self.arquivo_sku = os.path.join(pasta, "sku.csv")
+        self.usuarios.to_csv(self.arquivo_usuarios, sep=";", index=False, encoding="latin1")
+        self.skus.to_csv(self.arquivo_sku, sep=";", index=False, encoding="latin1")
+        self.consultas_sku = self.skus["Código Promax"].sample(CONSULTAS, replace=True, random_state=seed).tolist()
+        self.consultas_login = self.usuarios["id_login"].sample(CONSULTAS, replace=True, random_state=seed).tolist()
+        self.tipado_temp = None
+        self.serie = None
+        self.backend = None
+        self.nome_backend = None
+
+    def novo_backend(self, nome, subpasta):
+        base = os.path.join(self.pasta, subpasta)
+        os.makedirs(base, exist_ok=True)
+        return criar_backend(nome, os.path.join(base, "dados_temperatura.csv"), os.path.join(base, "dados_nao_conformidade.csv"),
+                             os.path.join(base, "dados_parquet"), os.path.join(base, "coldspec.db"))
+
+    def carregar_backend(self, nome):
+        """Backend com todo o histórico sintético (não cronometrado) para os cenários de leitura."""
+        self.nome_backend = nome
+        self.backend = self.novo_backend(nome, f"backend_{nome}")
+        gravar_em_lote(self.backend.anexar_temp, self.temp)
+        gravar_em_lote(self.backend.anexar_nc, self.nc)
+        self.arquivo_agregado = os.path.join(self.pasta, f"backend_{nome}", "agregado_nc.json")
+        agregados_nc.reconstruir(self.arquivo_agregado, self.backend.carregar_nc, self.backend.versao_nc)
+
+    def reabrir_backend(self):
+        """Descarta os caches (de arquivo e do backend) para medir uma leitura fria."""
+        dados.cache.invalidar()
+        self.backend = self.novo_backend(self.nome_backend, f"backend_{self.nome_backend}")
+
+
+# --- CENÁRIOS ---
+# Cada cenário devolve quantos itens processou (linhas, gravações ou consultas).
+
+def _carga(tabela):
+    def preparar(amb):
+        amb.pasta_carga = tempfile.mkdtemp(dir=amb.pasta, prefix="carga_")
+        amb.backend_carga = amb.novo_backend(amb.nome_backend, os.path.basename(amb.pasta_carga))
+
+    def executar(amb):
+        if tabela == "temperatura":
+            return gravar_em_lote(amb.backend_carga.anexar_temp, amb.temp)
+        return gravar_em_lote(amb.backend_carga.anexar_nc, amb.nc)
+
+    def limpar(amb):
+        amb.backend_carga = None
+        shutil.rmtree(amb.pasta_carga, ignore_errors=True)
+    return preparar, executar, limpar
+
+
+def salvar_temp(amb):
+    """Como o salvar_temp do app: uma linha por chamada no histórico já cheio."""
+    for _ in range(GRAVACOES_UNITARIAS):
+        agora = datetime.now()
+        amb.backend.anexar_temp([{"Usuario": "BENCH", "Cargo": "Sensor", "Data": agora.strftime(FORMATO_DATA),
+                                  "Horario": agora.strftime(FORMATO_HORA), "Temperatura": 4.5, "Status": "OK",
+                                  "Camara": CAMARA_PADRAO}])
+    return GRAVACOES_UNITARIAS
+
+
+def salvar_nc(amb):
+    """Como o salvar_nc do app: anexa o registro e atualiza o agregado do dashboard."""
+    registro = amb.nc.iloc[0].to_dict()
+    for _ in range(GRAVACOES_UNITARIAS):
+        linha = dict(registro, Data=datetime.now().strftime(FORMATO_DATA))
+        agregados_nc.gravar(amb.arquivo_agregado, [linha], amb.backend.anexar_nc, amb.backend.versao_nc)
+    return GRAVACOES_UNITARIAS
+
+
+def _fila():
+    """Salvar pela fila de gravação: mede só o que o clique espera (o log); a descarga fica fora do tempo."""
+    def preparar(amb):
+        amb.fila = fila_gravacao.FilaGravacao({"temp": amb.backend.anexar_temp},
+                                              os.path.join(amb.pasta, "fila_gravacao.jsonl"),
+                                              agrupar=grupo_gravacao).iniciar()
+
+    def executar(amb):
+        agora = datetime.now()
+        for _ in range(GRAVACOES_UNITARIAS):
+            amb.fila.enfileirar("temp", {"Usuario": "BENCH", "Cargo": "Sensor", "Data": agora.strftime(FORMATO_DATA),
+                                         "Horario": agora.strftime(FORMATO_HORA), "Temperatura": 4.5, "Status": "OK",
+                                         "Camara": CAMARA_PADRAO})
+        return GRAVACOES_UNITARIAS
+
+    def limpar(amb):
+        amb.fila.parar()
+        amb.fila = None
+    return preparar, executar, limpar
+
+
+def carregar_temp_7d(amb):
+    return len(amb.backend.carregar_temp_periodo(datetime.now() - timedelta(days=7)))
+
+
+def pagina_temp(amb):
+    return len(amb.backend.pagina_temp(0, 50))
+
+
+def carregar_nc(amb):
+    return len(normalizar_nc(amb.backend.carregar_nc()))
+
+
+def indice_sku(amb):
+    return len(construir_indice_sku(amb.arquivo_sku))
+
+
+def busca_sku(amb):
+    indice = dados.carregar(amb.arquivo_sku, construir_indice_sku)
+    for codigo in amb.consultas_sku:
+        indice.buscar(codigo)
+    for codigo in amb.consultas_sku[:CONSULTAS // 10]:
+        indice.sugerir(codigo[:-2] + "99")
+    return CONSULTAS + CONSULTAS // 10
+
+
+def login(amb):
+    diretorio = dados.carregar(amb.arquivo_usuarios, construir_diretorio_usuarios)
+    for id_login in amb.consultas_login:
+        diretorio.buscar(id_login)
+    return CONSULTAS
+
+
+def agregado_nc(amb):
+    return agregados_nc.AgregadoNC.de_dataframe(amb.nc).total
+
+
+def analise_nc_completa(amb):
+    combinado = analise_nc.combinar([analise_nc.parcial(tipar_nc(amb.nc))])
+    analise_nc.tendencia_semanal(combinado)
+    analise_nc.top_skus(combinado)
+    analise_nc.pontos_criticos(combinado)
+    return len(amb.nc)
+
+
+def _tipado_temp(amb):
+    if amb.tipado_temp is None:
+        amb.tipado_temp = amb.backend.carregar_temp_tipado()
+    return amb.tipado_temp
+
+
+def cep_imr(amb):
+    tipado = _tipado_temp(amb)
+    cep.analisar(tipado, CAMARA_PADRAO, LIE_PADRAO, LSE_PADRAO, "I-AM", cache_cep=cep.CacheCEP())
+    return len(tipado)
+
+
+def _preparar_serie(amb):
+    """Histórico do backend ou, se for curto demais para ser reduzido, uma série sintética de PONTOS_REDUCAO leituras."""
+    tipado = _tipado_temp(amb)
+    if len(tipado) < PONTOS_REDUCAO:
+        sinteticas = gerar_temperaturas(PONTOS_REDUCAO, np.random.default_rng(amb.seed))
+        momentos = pd.to_datetime(sinteticas["Data"] + " " + sinteticas["Horario"], format=f"{FORMATO_DATA} {FORMATO_HORA}")
+        tipado = pd.DataFrame({"Timestamp": momentos, "Temperatura": sinteticas["Temperatura"]})
+    amb.serie = tipado
+
+
+def reduzir_serie(amb):
+    amostragem.reduzir_serie(amb.serie, col_x="Timestamp", lie=LIE_PADRAO, lse=LSE_PADRAO)
+    return len(amb.serie)
+
+
+def _frio(executar):
+    return (lambda amb: amb.reabrir_backend()), executar, None
+
+
+# nome -> (preparar, executar, limpar); preparar/limpar não entram no tempo
+CENARIOS_BACKEND = {
+    "carga_temp": _carga("temperatura"),
+    "carga_nc": _carga("nao_conformidade"),
+    "salvar_temp": (None, salvar_temp, None),
+    "salvar_nc": (None, salvar_nc, None),
+    "enfileirar_temp": _fila(),
+    "carregar_temp_7d_frio": _frio(carregar_temp_7d),
+    "carregar_temp_7d_cache": (None, carregar_temp_7d, None),
+    "pagina_temp_frio": _frio(pagina_temp),
+    "pagina_temp_cache": (None, pagina_temp, None),
+    "carregar_nc_frio": _frio(carregar_nc),
+}
+
+# Não dependem do backend: rodam uma vez por tamanho
+CENARIOS_GERAIS = {
+    "indice_sku": (None, indice_sku, None),
+    "busca_sku": (None, busca_sku, None),
+    "login": (None, login, None),
+    "agregado_nc": (None, agregado_nc, None),
+    "analise_nc": (None, analise_nc_completa, None),
+    "cep_imr": (None, cep_imr, None),
+    "reduzir_serie": (_preparar_serie, reduzir_serie, None),
+}
+
+
+def medir(amb, cenario, repeticoes):
+    """(segundos da execução mais rápida, itens, pico de memória em bytes)."""
+    preparar, executar, limpar = cenario
+    tempos, itens = [], 0
+    for rastrear in [False] * repeticoes + [True]:
+        if preparar:
+            preparar(amb)
+        if rastrear:
+            tracemalloc.start()
+        inicio = time.perf_counter()
+        itens = executar(amb)
+        duracao = time.perf_counter() - inicio
+        if rastrear:
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            tempos.append(duracao)
+        if limpar:
+            limpar(amb)
+    return min(tempos), itens, pico
+
+
+# --- EXECUÇÃO E RELATÓRIO ---
+
+def rodar(linhas, backends, repeticoes, seed=0, pasta=None):
+    resultados = []
+    for n in linhas:
+        base = tempfile.mkdtemp(prefix=f"coldspec_bench_{n}_", dir=pasta)
+        try:
+            inicio = time.perf_counter()
+            amb = Ambiente(base, n, seed)
+            print(f"\n{n} linhas (dados gerados em {time.perf_counter() - inicio:.1f}s)")
+            for nome_backend in backends:
+                inicio = time.perf_counter()
+                amb.carregar_backend(nome_backend)
+                amb.tipado_temp = None
+                print(f"  [{nome_backend}] histórico carregado em {time.perf_counter() - inicio:.1f}s")
+                cenarios = dict(CENARIOS_BACKEND, **(CENARIOS_GERAIS if nome_backend == backends[0] else {}))
+                for nome, cenario in cenarios.items():
+                    segundos, itens, pico = medir(amb, cenario, repeticoes)
+                    geral = nome in CENARIOS_GERAIS
+                    resultados.append({
+                        "cenario": nome, "backend": None if geral else nome_backend, "linhas": n,
+                        "itens": int(itens), "segundos": segundos,
+                        "itens_por_segundo": itens / segundos if segundos > 0 else None,
+                        "pico_memoria_bytes": int(pico),
+                    })
+                    print(f"  {nome:<24} {'-' if geral else nome_backend:<8} {segundos * 1000:>10.1f} ms "
+                          f"{itens / segundos if segundos > 0 else 0:>14,.0f} itens/s {pico / 1024 ** 2:>9.1f} MB")
+                dados.cache.invalidar()
+        finally:
+            shutil.rmtree(base, ignore_errors=True)
+    return resultados
+
+
+def comparar(resultados, base, tolerancia):
+    """Caminhos que ficaram mais de `tolerancia` (fração) mais lentos que no relatório base."""
+    anteriores = {(r["cenario"], r["backend"], r["linhas"]): r["segundos"] for r in base["resultados"]}
+    regressoes = []
+    for r in resultados:
+        anterior = anteriores.get((r["cenario"], r["backend"], r["linhas"]))
+        if anterior and r["segundos"] > anterior * (1 + tolerancia) and r["segundos"] - anterior > FOLGA_REGRESSAO:
+            regressoes.append(dict(r, segundos_base=anterior, variacao=r["segundos"] / anterior - 1))
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=lambda v: int(float(v)), nargs="+", default=LINHAS_PADRAO,
+                        help="tamanhos dos conjuntos sintéticos (ex.: 1e3 1e5 1e7)")
+    parser.add_argument("--backend", nargs="+", choices=["csv", "parquet", "sqlite"],
+                        default=["csv", "sqlite"] + (["parquet"] if PARQUET_DISPONIVEL else []))
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pasta", help="onde criar os dados temporários (padrão: pasta temporária do sistema)")
+    parser.add_argument("--saida", default="relatorio_benchmark.json")
+    parser.add_argument("--base", help="relatório anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="fração de piora aceita com --base")
+    args = parser.parse_args(argv)
+
+    resultados = rodar(args.linhas, args.backend, args.repeticoes, args.seed, args.pasta)
+    relatorio = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "ambiente": {"python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+                     "plataforma": platform.platform(), "cpus": os.cpu_count()},
+        "parametros": {"linhas": args.linhas, "backends": args.backend, "repeticoes": args.repeticoes, "seed": args.seed},
+        "resultados": resultados,
+    }
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=1)
+    print(f"\nRelatório: {args.saida}")
+
+    if args.base:
+        with open(args.base, "r", encoding="utf-8") as f:
+            regressoes = comparar(resultados, json.load(f), args.tolerancia)
+        for r in regressoes:
+            print(f"REGRESSÃO {r['cenario']} [{r['backend'] or '-'}] {r['linhas']} linhas: "
+                  f"{r['segundos_base'] * 1000:.1f} ms -> {r['segundos'] * 1000:.1f} ms (+{r['variacao']:.0%})")
+        if regressoes:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Cadastro de câmaras frias (limites por câmara) e visão geral entre câmaras."""
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+CAMARA_PADRAO = "CF-01"
+LIE_PADRAO = 2.0
+LSE_PADRAO = 7.0
+
+# O id da câmara vira nome de pasta (shards CSV, partições Parquet): só letras, dígitos, '_' e '-'
+PADRAO_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+class CamaraInvalidaError(ValueError):
+    """Id de câmara fora de PADRAO_ID (ex.: '../x')."""
+
+
+def id_valido(id_camara):
+    return isinstance(id_camara, str) and PADRAO_ID.fullmatch(id_camara) is not None
+
+
+def validar_ids(ids):
+    """Levanta CamaraInvalidaError se algum id não seguir PADRAO_ID."""
+    invalidos = sorted({str(c) for c in pd.unique(pd.Series(ids, dtype=object)) if not id_valido(c)})
+    if invalidos:
+        raise CamaraInvalidaError(f"Id de câmara inválido: {', '.join(repr(c) for c in invalidos[:5])}"
+                                  " (use só letras, dígitos, '_' e '-')")
+
+
+def ler_camaras(caminho):
+    """Lê camaras.csv (id;nome;site;lie;lse) -> {id: {'nome', 'site', 'lie', 'lse'}}.
+
+    Linhas sem id, com id repetido ou fora de PADRAO_ID são ignoradas.
+    """
+    df = pd.read_csv(caminho, sep=";", dtype=str, encoding="utf-8")
+    df.columns = df.columns.str.strip().str.lower()
+    camaras = {}
+    for linha in df.itertuples(index=False):
+        id_camara = str(linha.id).strip()
+        if not id_valido(id_camara) or id_camara in camaras:
+            continue
+        camaras[id_camara] = {
+            "nome": str(getattr(linha, "nome", id_camara)).strip(),
+            "site": str(getattr(linha, "site", "")).strip(),
+            "lie": float(str(linha.lie).replace(",", ".")),
+            "lse": float(str(linha.lse).replace(",", ".")),
+        }
+    return camaras
+
+
+def camaras_padrao():
+    return {CAMARA_PADRAO: {"nome": "Câmara Fria", "site": "", "lie": LIE_PADRAO, "lse": LSE_PADRAO}}
+
+
+def rotulo(camaras, id_camara):
+    camara = camaras.get(id_camara, {})
+    partes = [camara.get("site"), camara.get("nome") or id_camara]
+    return f"{id_camara} · " + " — ".join(p for p in partes if p)
+
+
+def limites(camaras, id_camara):
+    """(LIE, LSE) da câmara; câmaras fora do cadastro usam os limites padrão."""
+    camara = camaras.get(id_camara)
+    if camara is None:
+        return LIE_PADRAO, LSE_PADRAO
+    return camara["lie"], camara["lse"]
+
+
+# --- VISÃO GERAL ---
+
+def _resumo(backend, id_camara, inicio):
+    df = backend.carregar_temp_periodo(inicio, camara=id_camara)
+    temperaturas = pd.to_numeric(df["Temperatura"], errors="coerce")
+    ultima = df.iloc[-1] if not df.empty else None
+    return {
+        "Câmara": id_camara,
+        "Leituras": len(df),
+        "Desvios (ERRO)": int((df["Status"] == "ERRO").sum()),
+        "Mín (ºC)": temperaturas.min(),
+        "Média (ºC)": round(temperaturas.mean(), 2) if len(df) else None,
+        "Máx (ºC)": temperaturas.max(),
+        "Última (ºC)": ultima["Temperatura"] if ultima is not None else None,
+        "Última leitura": ultima["Datetime"] if ultima is not None else None,
+    }
+
+
+def visao_geral(backend, camaras, inicio, max_threads=8):
+    """Resumo do período para todas as câmaras, lendo os shards de cada uma em paralelo."""
+    ids = list(camaras)
+    if not ids:
+        return pd.DataFrame()
+    with ThreadPoolExecutor(max_workers=min(max_threads, len(ids))) as executor:
+        resumos = list(executor.map(lambda c: _resumo(backend, c, inicio), ids))
+    df = pd.DataFrame(resumos)
+    df.insert(1, "Site", [camaras[c].get("site", "") for c in ids])
+    df.insert(2, "Faixa", [f"{camaras[c]['lie']}–{camaras[c]['lse']}ºC" for c in ids])
+    return df
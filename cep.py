@@ -0,0 +1,196 @@
+"""Controle estatístico de processo (CEP) das leituras de temperatura.
+
+Cartas I-AM (valores individuais e amplitude móvel) e X̄-R (subgrupos de n
+leituras consecutivas do mesmo dia), regras de Western Electric e índices de
+capacidade Cp/Cpk contra os limites LIE/LSE da câmara.
+
+Os resumos (somas, amplitudes e subgrupos) são guardados por câmara e dia:
+dias já fechados não são recalculados ao mudar o período ou a cada rerun,
+só o dia que recebeu leituras novas. Os limites do período saem da soma dos
+resumos diários.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Fatores das cartas por tamanho de subgrupo: n -> (A2, D3, D4, d2)
+FATORES = {
+    2: (1.880, 0.0, 3.267, 1.128),
+    3: (1.023, 0.0, 2.574, 1.693),
+    4: (0.729, 0.0, 2.282, 2.059),
+    5: (0.577, 0.0, 2.114, 2.326),
+    6: (0.483, 0.0, 2.004, 2.534),
+    7: (0.419, 0.076, 1.924, 2.704),
+    8: (0.373, 0.136, 1.864, 2.847),
+    9: (0.337, 0.184, 1.816, 2.970),
+    10: (0.308, 0.223, 1.777, 3.078),
+}
+
+REGRAS = {
+    1: "1 ponto além de 3σ",
+    2: "2 de 3 além de 2σ (mesmo lado)",
+    3: "4 de 5 além de 1σ (mesmo lado)",
+    4: "8 seguidos do mesmo lado da média",
+}
+
+MAX_DIAS_CACHE = 4096
+
+
+# --- REGRAS DE WESTERN ELECTRIC ---
+
+def _na_janela(marcas, k):
+    """Quantos pontos marcados há nos k últimos, para cada posição (vetorizado)."""
+    return np.convolve(marcas.astype(np.int64), np.ones(k, dtype=np.int64))[:len(marcas)]
+
+
+def regras_western_electric(valores, centro, sigma):
+    """{regra: array bool} marcando o ponto que completa cada padrão."""
+    valores = np.asarray(valores, dtype=float)
+    if sigma <= 0 or not np.isfinite(sigma):
+        return {r: np.zeros(len(valores), dtype=bool) for r in REGRAS}
+    z = (valores - centro) / sigma
+    violacoes = {1: np.abs(z) > 3, 2: np.zeros(len(z), dtype=bool), 3: np.zeros(len(z), dtype=bool)}
+    for lado in (1, -1):
+        zl = z * lado
+        violacoes[2] |= (zl > 2) & (_na_janela(zl > 2, 3) >= 2)
+        violacoes[3] |= (zl > 1) & (_na_janela(zl > 1, 5) >= 4)
+    violacoes[4] = (_na_janela(z > 0, 8) == 8) | (_na_janela(z < 0, 8) == 8)
+    return violacoes
+
+
+# --- RESUMO POR DIA (CACHE) ---
+
+def resumir_dia(timestamps, valores, n):
+    """Somas do dia para as cartas: indivíduos, amplitudes móveis e subgrupos de n leituras."""
+    k = len(valores) // n
+    subgrupos = valores[:k * n].reshape(k, n)
+    return {
+        "n": len(valores),
+        "soma": float(valores.sum()),
+        "soma_quadrados": float(np.square(valores).sum()),
+        "soma_am": float(np.abs(np.diff(valores)).sum()),
+        "primeiro": float(valores[0]),
+        "ultimo": float(valores[-1]),
+        "medias": subgrupos.mean(axis=1),
+        "amplitudes": np.ptp(subgrupos, axis=1),
+        "fim_subgrupos": timestamps[n - 1:k * n:n],
+    }
+
+
+class CacheCEP:
+    """Resumos diários por (câmara, dia, n), válidos enquanto o dia tiver as mesmas leituras."""
+
+    def __init__(self, max_entradas=MAX_DIAS_CACHE):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._trava = threading.Lock()
+        self.recalculados = 0
+
+    def resumos(self, camara, tipado, n):
+        """Resumo de cada dia do `tipado` (ordenado por Timestamp) e quantos dias foram recalculados."""
+        timestamps = tipado["Timestamp"].to_numpy()
+        valores = tipado["Temperatura"].to_numpy(dtype=float)
+        dias = timestamps.astype("datetime64[D]")
+        inicios = np.flatnonzero(np.r_[True, dias[1:] != dias[:-1]]) if len(dias) else np.array([], dtype=int)
+        fins = np.r_[inicios[1:], len(dias)]
+
+        resultado, recalculados = [], 0
+        for a, b in zip(inicios, fins):
+            chave = (camara, dias[a], n)
+            assinatura = (b - a, timestamps[b - 1])
+            with self._trava:
+                entrada = self._entradas.get(chave)
+                if entrada is not None and entrada[0] == assinatura:
+                    self._entradas.move_to_end(chave)
+                    resultado.append(entrada[1])
+                    continue
+            resumo = resumir_dia(timestamps[a:b], valores[a:b], n)
+            recalculados += 1
+            with self._trava:
+                self._entradas[chave] = (assinatura, resumo)
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+            resultado.append(resumo)
+        with self._trava:
+            self.recalculados += recalculados
+        return resultado, recalculados
+
+
+cache = CacheCEP()
+
+
+# --- CARTAS E CAPACIDADE ---
+
+def _estatisticas(resumos):
+    """Média, desvio global e amplitude móvel média do período a partir dos resumos diários."""
+    n = sum(r["n"] for r in resumos)
+    soma = sum(r["soma"] for r in resumos)
+    # Amplitudes móveis dentro de cada dia + as da virada entre dias consecutivos
+    soma_am = sum(r["soma_am"] for r in resumos) + sum(abs(b["primeiro"] - a["ultimo"]) for a, b in zip(resumos, resumos[1:]))
+    media = soma / n
+    variancia = (sum(r["soma_quadrados"] for r in resumos) - soma * media) / (n - 1) if n > 1 else 0.0
+    return {"n": n, "media": media, "desvio_global": float(np.sqrt(max(variancia, 0.0))),
+            "am_media": soma_am / (n - 1) if n > 1 else 0.0}
+
+
+def capacidade(media, sigma_dentro, sigma_global, lie, lse):
+    """Cp/Cpk (variação dentro dos subgrupos) e Pp/Ppk (variação global)."""
+    def indices(sigma):
+        if sigma <= 0:
+            return float("nan"), float("nan")
+        return (lse - lie) / (6 * sigma), min(lse - media, media - lie) / (3 * sigma)
+    cp, cpk = indices(sigma_dentro)
+    pp, ppk = indices(sigma_global)
+    return {"Cp": cp, "Cpk": cpk, "Pp": pp, "Ppk": ppk}
+
+
+def analisar(tipado, camara, lie, lse, carta="I-AM", n=5, cache_cep=None):
+    """Carta de controle + violações + capacidade do período.
+
+    `tipado` é o layout do armazenamento (Timestamp, Temperatura), em ordem de Timestamp.
+    Devolve dict com 'pontos' (DataFrame da carta), 'limites', 'capacidade' e 'recalculados'.
+    """
+    cache_cep = cache_cep or cache
+    tipado = tipado.dropna(subset=["Temperatura"])
+    if tipado.empty:
+        return None
+    resumos, recalculados = cache_cep.resumos(camara, tipado, n if carta == "X̄-R" else 2)
+    estat = _estatisticas(resumos)
+
+    if carta == "X̄-R":
+        a2, d3, d4, d2 = FATORES[n]
+        medias = np.concatenate([r["medias"] for r in resumos])
+        if len(medias) == 0:
+            return None
+        amplitudes = np.concatenate([r["amplitudes"] for r in resumos])
+        centro, r_medio = float(medias.mean()), float(amplitudes.mean())
+        sigma_dentro = r_medio / d2
+        pontos = pd.DataFrame({"Timestamp": np.concatenate([r["fim_subgrupos"] for r in resumos]),
+                               "Valor": medias, "Amplitude": amplitudes})
+        limites = {"centro": centro, "lsc": centro + a2 * r_medio, "lic": centro - a2 * r_medio,
+                   "amplitude_media": r_medio, "lsc_amplitude": d4 * r_medio, "lic_amplitude": d3 * r_medio}
+        sigma_pontos = a2 * r_medio / 3
+    else:
+        _, d3, d4, d2 = FATORES[2]
+        centro, am_medio = estat["media"], estat["am_media"]
+        sigma_dentro = am_medio / d2
+        valores = tipado["Temperatura"].to_numpy(dtype=float)
+        pontos = pd.DataFrame({"Timestamp": tipado["Timestamp"].to_numpy(), "Valor": valores,
+                               "Amplitude": np.abs(np.diff(valores, prepend=np.nan))})
+        limites = {"centro": centro, "lsc": centro + 3 * sigma_dentro, "lic": centro - 3 * sigma_dentro,
+                   "amplitude_media": am_medio, "lsc_amplitude": d4 * am_medio, "lic_amplitude": d3 * am_medio}
+        sigma_pontos = sigma_dentro
+
+    violacoes = regras_western_electric(pontos["Valor"].to_numpy(), limites["centro"], sigma_pontos)
+    for regra, marcas in violacoes.items():
+        pontos[f"Regra_{regra}"] = marcas
+    return {
+        "pontos": pontos,
+        "limites": limites,
+        "capacidade": capacidade(estat["media"], sigma_dentro, estat["desvio_global"], lie, lse),
+        "leituras": estat["n"],
+        "recalculados": recalculados,
+        "dias": len(resumos),
+    }
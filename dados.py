@@ -0,0 +1,141 @@
+"""Camada de acesso a dados: leitura dos CSVs com cache compartilhado entre sessões."""
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+import perfil
+
+MAX_ENTRADAS_CACHE = 32
+MAX_BYTES_CACHE = 256 * 1024 * 1024  # 256 MB de DataFrames em memória
+
+
+# --- CACHE INVALIDADO POR MTIME/TAMANHO ---
+
+class CacheArquivos:
+    """Cache LRU de DataFrames lidos do disco.
+
+    Cada entrada guarda o (mtime, tamanho) do arquivo no momento da leitura;
+    se o arquivo mudar, a próxima consulta relê. O módulo fica em memória
+    entre os reruns do Streamlit, então o cache é compartilhado por todas as sessões.
+    """
+
+    def __init__(self, max_entradas=MAX_ENTRADAS_CACHE, max_bytes=MAX_BYTES_CACHE):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.bytes_usados = 0
+
+    @staticmethod
+    def assinatura(caminho):
+        st = os.stat(caminho)
+        return (st.st_mtime_ns, st.st_size)
+
+    def obter(self, caminho, leitor, copiar=True):
+        """Retorna o resultado de leitor(caminho), relendo só se o arquivo mudou."""
+        chave = (os.path.abspath(caminho), getattr(leitor, "__name__", repr(leitor)))
+        assinatura = self.assinatura(caminho)
+        with self._trava:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and entrada[0] == assinatura:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                valor = entrada[1]
+                return valor.copy() if copiar and isinstance(valor, pd.DataFrame) else valor
+            self.falhas += 1
+
+        # Só as leituras de fato (falhas do cache) aparecem na instrumentação
+        with perfil.etapa(f"ler_arquivo:{chave[1]}"):
+            valor = leitor(caminho)
+        tamanho = _tamanho_em_memoria(valor)
+        with self._trava:
+            antiga = self._entradas.pop(chave, None)
+            if antiga is not None:
+                self.bytes_usados -= antiga[2]
+            if tamanho <= self.max_bytes:
+                self._entradas[chave] = (assinatura, valor, tamanho)
+                self.bytes_usados += tamanho
+                self._despejar()
+        return valor.copy() if copiar and isinstance(valor, pd.DataFrame) else valor
+
+    def _despejar(self):
+        while self._entradas and (len(self._entradas) > self.max_entradas or self.bytes_usados > self.max_bytes):
+            _, (_, _, tamanho) = self._entradas.popitem(last=False)
+            self.bytes_usados -= tamanho
+
+    def invalidar(self, caminho=None):
+        with self._trava:
+            if caminho is None:
+                self._entradas.clear()
+                self.bytes_usados = 0
+                return
+            alvo = os.path.abspath(caminho)
+            for chave in [c for c in self._entradas if c[0] == alvo]:
+                self.bytes_usados -= self._entradas.pop(chave)[2]
+
+    def estatisticas(self):
+        with self._trava:
+            total = self.acertos + self.falhas
+            return {
+                "entradas": len(self._entradas),
+                "bytes": self.bytes_usados,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "taxa_acerto": self.acertos / total if total else 0.0,
+            }
+
+
+def _tamanho_em_memoria(valor):
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    return 0
+
+
+cache = CacheArquivos()
+
+
+# --- LEITORES ---
+
+def detectar_separador(caminho, encoding="latin1", candidatos=(";", ",")):
+    """Escolhe o separador olhando apenas a linha de cabeçalho."""
+    with open(caminho, "r", encoding=encoding, errors="replace") as f:
+        cabecalho = f.readline()
+    return max(candidatos, key=cabecalho.count)
+
+
+def ler_usuarios(caminho):
+    df = pd.read_csv(caminho, sep=';', encoding='latin1', dtype=str)
+    df.columns = df.columns.str.strip().str.lower()
+    return df
+
+
+def ler_sku(caminho):
+    return pd.read_csv(caminho, sep=detectar_separador(caminho), encoding='latin1', dtype=str)
+
+
+def ler_historico_temp(caminho):
+    try:
+        return pd.read_csv(caminho, sep=";")
+    except Exception:
+        return pd.read_csv(caminho, sep=";", on_bad_lines='skip', engine='python')
+
+
+def ler_csv_nc(caminho):
+    try:
+        # Tenta ler com utf-8 primeiro
+        return pd.read_csv(caminho, sep=";", encoding='utf-8')
+    except Exception:
+        try:
+            # Tenta latin1 se falhar
+            return pd.read_csv(caminho, sep=";", encoding='latin1', on_bad_lines='skip', engine='python')
+        except Exception:
+            return pd.DataFrame()
+
+
+def carregar(caminho, leitor, copiar=True):
+    """Atalho para ler um arquivo pelo cache compartilhado."""
+    return cache.obter(caminho, leitor, copiar=copiar)
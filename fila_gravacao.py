@@ -0,0 +1,262 @@
+"""Fila de gravação com log local (write-ahead) para as leituras de temperatura e NC.
+
+`enfileirar` só acrescenta o registro ao log em disco (uma linha JSON, com
+fsync) e volta: o clique em salvar não espera o CSV/Parquet/SQLite. Uma
+thread descarrega a fila em lotes pelo gravador de cada tipo e tira do log o
+que foi gravado. Arquivo travado (Excel aberto, trava de outro processo) ou
+erro de disco não perde nada: o lote fica na fila e é tentado de novo com
+espera crescente. Se o app cair, o log é relido na próxima inicialização.
+
+Um gravador que escreve em vários arquivos (shards por câmara e mês) não é
+atômico: se um shard estiver travado, os outros já foram gravados. Com
+`agrupar` (registro -> chave do shard) a fila grava e confirma cada grupo
+separadamente, e a nova tentativa só reenvia os grupos que falharam.
+
+Depois de gravar um lote, a fila acrescenta ao log uma linha de confirmação
+({"gravados": [ids]}, com fsync); ao reler o log, entradas confirmadas são
+puladas. Reescrever o log sem as entradas gravadas é só compactação: se
+falhar (antivírus ou Excel segurando o arquivo), nada se perde nem se repete.
+Só uma queda entre a gravação no armazenamento e a confirmação (alguns ms)
+faz o lote ser gravado de novo ao reiniciar.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+ARQUIVO_FILA = "fila_gravacao.jsonl"
+LOTE_MAXIMO = 500
+ESPERA_LOTE = 0.05           # segundos juntando registros antes de descarregar
+ESPERA_MINIMA = 0.5          # primeira espera depois de uma falha (dobra a cada nova falha)
+ESPERA_MAXIMA = 30.0
+MAX_TENTATIVAS_DADOS = 5     # registro recusado por erro que não é de arquivo: depois disso vai para <fila>.rejeitados
+MAX_CONFIRMACOES = 200       # linhas de confirmação no log antes de compactar com pendentes
+
+
+class FilaGravacao:
+    def __init__(self, gravadores, caminho=ARQUIVO_FILA, lote_maximo=LOTE_MAXIMO, fsync=True, agrupar=None):
+        """`gravadores`: {tipo: função(lista de registros)} — ex.: {"temp": backend.anexar_temp}.
+
+        `agrupar`: função(registro) -> chave do arquivo onde o gravador o escreve
+        (ex.: armazenamento.grupo_gravacao); sem ela cada tipo é um grupo só.
+        """
+        self.gravadores = gravadores
+        self.agrupar = agrupar
+        self.caminho = caminho
+        self.lote_maximo = lote_maximo
+        self.fsync = fsync
+        self.gravados = 0
+        self.falhas = 0
+        self.rejeitados = 0
+        self.ultimo_erro = None
+        self._pendentes = []     # [{"id", "tipo", "registro", "enfileirado_em"}], em ordem de chegada
+        self._proximo_id = 0
+        self._tentativas = {}    # id -> vezes que o registro foi recusado por erro de dado
+        self._confirmacoes = 0   # linhas de confirmação no log desde a última compactação
+        self._trava = threading.Lock()
+        self._novo = threading.Event()
+        self._parar = threading.Event()
+        self._vazia = threading.Condition(self._trava)
+        self._thread = threading.Thread(target=self._laco, name="fila-gravacao", daemon=True)
+        self._recuperar()
+
+    # --- Log em disco ---
+
+    def _recuperar(self):
+        """Relê o que ficou no log sem confirmação (app encerrado antes de descarregar)."""
+        if not os.path.exists(self.caminho):
+            return
+        entradas, gravados, maior_id = [], set(), -1
+        with open(self.caminho, "r", encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    entrada = json.loads(linha)
+                except json.JSONDecodeError:
+                    continue  # linha cortada por uma queda no meio da escrita
+                if "gravados" in entrada:
+                    gravados.update(entrada["gravados"])
+                else:
+                    entradas.append(entrada)
+                    maior_id = max(maior_id, entrada["id"])
+        self._pendentes = [e for e in entradas if e["id"] not in gravados]
+        self._proximo_id = max([maior_id] + list(gravados)) + 1
+        try:
+            # Sem linha cortada no fim (o próximo append colaria nela) e sem o que já foi gravado
+            self._reescrever_log()
+        except OSError:
+            pass
+
+    def _anexar_log(self, conteudo):
+        """Acrescenta uma linha JSON ao log (com fsync). Chamar com a trava."""
+        with open(self.caminho, "a", encoding="utf-8") as f:
+            f.write(json.dumps(conteudo, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def _reescrever_log(self):
+        """Compacta: deixa no log só o que ainda está pendente. Chamar com a trava."""
+        temporario = self.caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            for entrada in self._pendentes:
+                f.write(json.dumps(entrada, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(temporario, self.caminho)
+        self._confirmacoes = 0
+
+    # --- API ---
+
+    def iniciar(self):
+        self._thread.start()
+        if self._pendentes:
+            self._novo.set()
+        return self
+
+    def parar(self, timeout=10):
+        """Tenta descarregar o que falta e encerra a thread (o que sobrar continua no log)."""
+        self.esperar_vazia(timeout)
+        self._parar.set()
+        self._novo.set()
+        self._thread.join()
+
+    def enfileirar(self, tipo, registro):
+        """Grava o registro no log e volta; levanta OSError só se nem o log puder ser escrito."""
+        if tipo not in self.gravadores:
+            raise ValueError(f"Tipo de registro desconhecido: {tipo}")
+        with self._trava:
+            entrada = {"id": self._proximo_id, "tipo": tipo, "registro": registro,
+                       "enfileirado_em": datetime.now().isoformat(timespec="seconds")}
+            self._anexar_log(entrada)
+            self._proximo_id += 1
+            self._pendentes.append(entrada)
+        self._novo.set()
+        return entrada["id"]
+
+    def pendentes(self):
+        with self._trava:
+            return len(self._pendentes)
+
+    def esperar_vazia(self, timeout=None):
+        """Bloqueia até a fila esvaziar (ou o timeout); devolve True se esvaziou."""
+        with self._vazia:
+            return self._vazia.wait_for(lambda: not self._pendentes, timeout)
+
+    # --- Descarga ---
+
+    def _grupo(self, entrada):
+        if self.agrupar is None:
+            return None
+        try:
+            return self.agrupar(entrada["registro"])
+        except Exception:
+            return None  # registro malformado: o gravador recusa e ele é isolado abaixo
+
+    def descarregar(self):
+        """Grava um lote (até lote_maximo registros) por tipo e grupo; devolve False se algum grupo falhou.
+
+        Cada grupo gravado é confirmado no log antes do próximo: um grupo que
+        falha não faz os outros serem gravados de novo.
+        """
+        with self._trava:
+            lote = self._pendentes[:self.lote_maximo]
+        por_grupo = {}
+        for entrada in lote:
+            por_grupo.setdefault((entrada["tipo"], self._grupo(entrada)), []).append(entrada)
+
+        rejeitados, tudo_certo = [], True
+        for (tipo, _), entradas in por_grupo.items():
+            gravados = set()
+            try:
+                self.gravadores[tipo]([e["registro"] for e in entradas])
+                gravados.update(e["id"] for e in entradas)
+            except OSError as e:
+                # PermissionError inclui arquivo aberto no Excel e trava de outro processo
+                self._registrar_erro(e)
+                tudo_certo = False
+            except Exception as e:
+                # Erro de dado: grava um a um para separar o registro problemático dos demais
+                self._registrar_erro(e)
+                tudo_certo = False
+                for entrada in entradas:
+                    try:
+                        self.gravadores[tipo]([entrada["registro"]])
+                    except OSError as e:
+                        self._registrar_erro(e)
+                        break
+                    except Exception as e:
+                        self._registrar_erro(e)
+                        recusas = self._tentativas[entrada["id"]] = self._tentativas.get(entrada["id"], 0) + 1
+                        if recusas >= MAX_TENTATIVAS_DADOS:
+                            # Registro que o gravador recusa sempre não pode segurar a fila inteira
+                            rejeitados.append(dict(entrada, erro=self.ultimo_erro))
+                            del self._tentativas[entrada["id"]]
+                    else:
+                        gravados.add(entrada["id"])
+            if gravados:
+                self._confirmar(gravados)
+                self.gravados += len(gravados)
+
+        if rejeitados:
+            try:
+                with open(self.caminho + ".rejeitados", "a", encoding="utf-8") as f:
+                    for entrada in rejeitados:
+                        f.write(json.dumps(entrada, ensure_ascii=False, default=str) + "\n")
+                self.rejeitados += len(rejeitados)
+            except OSError as e:
+                # Sem onde separar: os registros continuam pendentes (e voltam a ser tentados)
+                self._registrar_erro(e)
+                tudo_certo = False
+                rejeitados = []
+        if rejeitados:
+            self._confirmar({e["id"] for e in rejeitados})
+        if tudo_certo:
+            self.ultimo_erro = None
+        return tudo_certo
+
+    def _confirmar(self, ids):
+        """Marca no log os ids já gravados e só então os tira da memória."""
+        with self._vazia:
+            try:
+                self._anexar_log({"gravados": sorted(ids)})
+                self._confirmacoes += 1
+            except OSError as e:
+                # Já estão no armazenamento: tirar da memória evita gravar de novo neste processo
+                self._registrar_erro(e)
+            self._pendentes = [e for e in self._pendentes if e["id"] not in ids]
+            if not self._pendentes or self._confirmacoes >= MAX_CONFIRMACOES:
+                try:
+                    self._reescrever_log()
+                except OSError:
+                    pass  # compactação fica para a próxima; as confirmações já valem na releitura
+            if not self._pendentes:
+                self._vazia.notify_all()
+
+    def _registrar_erro(self, erro):
+        self.falhas += 1
+        self.ultimo_erro = f"{type(erro).__name__}: {erro}"
+
+    def _laco(self):
+        espera = ESPERA_MINIMA
+        while not self._parar.is_set():
+            self._novo.wait()
+            self._novo.clear()
+            if self._parar.is_set():
+                return
+            time.sleep(ESPERA_LOTE)  # junta os registros que chegam juntos num lote só
+            while self.pendentes() and not self._parar.is_set():
+                try:
+                    certo = self.descarregar()
+                except Exception as e:
+                    # Nada pode matar a thread: a fila para de andar e o app continua dizendo que salvou
+                    self._registrar_erro(e)
+                    certo = False
+                if certo:
+                    espera = ESPERA_MINIMA
+                    continue
+                # Arquivo travado / sem disco: espera e tenta de novo (acorda antes se pedirem parar)
+                if self._parar.wait(espera):
+                    return
+                espera = min(espera * 2, ESPERA_MAXIMA)
@@ -0,0 +1,194 @@
+"""Histórico de CSVs de NC enviados pelo app, endereçado por conteúdo.
+
+Cada arquivo é guardado uma única vez como <pasta>/<hash>.csv (sha256 do
+conteúdo): reenviar o mesmo arquivo, com o mesmo nome ou outro, não grava
+de novo. Um manifesto (manifesto.json) guarda nome, tamanho, linhas e
+período de cada envio, e os dados já lidos ficam em <hash>.parquet; listar
+e abrir um arquivo do histórico não precisa de stat por arquivo nem de
+reler o CSV. A retenção roda numa thread de limpeza em segundo plano.
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+import dados
+from armazenamento import FORMATO_DATA, PARQUET_DISPONIVEL, trava_arquivo
+
+PASTA_PADRAO = "historico_uploads"
+NOME_MANIFESTO = "manifesto.json"
+DIAS_RETENCAO = 15
+INTERVALO_LIMPEZA = 3600  # segundos entre varreduras
+
+
+def caminho_manifesto(pasta):
+    return os.path.join(pasta, NOME_MANIFESTO)
+
+
+def _ler_manifesto(caminho):
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def ler_manifesto(pasta):
+    """{hash: entrada} (lido pelo cache de dados: só relê quando o manifesto muda)."""
+    caminho = caminho_manifesto(pasta)
+    if not os.path.exists(caminho):
+        return {}
+    try:
+        return dados.carregar(caminho, _ler_manifesto, copiar=False)
+    except (OSError, ValueError):
+        return {}
+
+
+def _gravar_manifesto(pasta, manifesto):
+    caminho = caminho_manifesto(pasta)
+    with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=1)
+    os.replace(caminho + ".tmp", caminho)
+
+
+def _resumo(caminho_csv):
+    """Linhas e período (pela coluna Data) do CSV de NC; grava o cache Parquet quando possível."""
+    df = dados.ler_csv_nc(caminho_csv)
+    datas = pd.to_datetime(df["Data"], format=FORMATO_DATA, errors="coerce") if "Data" in df.columns else pd.Series(dtype="datetime64[ns]")
+    parquet = False
+    if PARQUET_DISPONIVEL and not df.empty:
+        destino = os.path.splitext(caminho_csv)[0] + ".parquet"
+        try:
+            df.to_parquet(destino + ".tmp", index=False)
+            os.replace(destino + ".tmp", destino)
+            parquet = True
+        except Exception:
+            # Colunas com tipos misturados não viram Parquet: o CSV continua valendo
+            if os.path.exists(destino + ".tmp"):
+                os.remove(destino + ".tmp")
+    return {
+        "linhas": len(df),
+        "data_min": datas.min().strftime("%Y-%m-%d") if datas.notna().any() else None,
+        "data_max": datas.max().strftime("%Y-%m-%d") if datas.notna().any() else None,
+        "parquet": parquet,
+    }
+
+
+def salvar(pasta, conteudo, nome, enviado_em=None):
+    """Guarda o conteúdo (bytes) e registra o envio; devolve o caminho do CSV.
+
+    Se o mesmo conteúdo já está no histórico só o nome e a data do envio são atualizados.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    chave = hashlib.sha256(conteudo).hexdigest()
+    caminho = os.path.join(pasta, f"{chave}.csv")
+    novo = not os.path.exists(caminho)
+    if novo:
+        with open(caminho + ".tmp", "wb") as f:
+            f.write(conteudo)
+        os.replace(caminho + ".tmp", caminho)
+    with trava_arquivo(caminho_manifesto(pasta)):
+        manifesto = dict(ler_manifesto(pasta))
+        entrada = dict(manifesto.get(chave) or {})
+        if novo or "linhas" not in entrada:
+            entrada.update(_resumo(caminho))
+        entrada.update({
+            "nome": nome,
+            "tamanho": len(conteudo),
+            "enviado_em": (enviado_em or datetime.now()).isoformat(timespec="seconds"),
+        })
+        manifesto[chave] = entrada
+        _gravar_manifesto(pasta, manifesto)
+    return caminho
+
+
+def listar(pasta):
+    """Entradas do manifesto (com 'hash' e 'caminho'), da mais recente para a mais antiga."""
+    entradas = [dict(e, hash=h, caminho=os.path.join(pasta, f"{h}.csv")) for h, e in ler_manifesto(pasta).items()]
+    return sorted(entradas, key=lambda e: e["enviado_em"], reverse=True)
+
+
+def ler_nc(caminho_csv):
+    """Dados de um arquivo do histórico: do cache Parquet se existir, senão do CSV."""
+    parquet = os.path.splitext(caminho_csv)[0] + ".parquet"
+    if os.path.exists(parquet):
+        try:
+            return pd.read_parquet(parquet)
+        except Exception:
+            pass
+    return dados.ler_csv_nc(caminho_csv)
+
+
+# --- RETENÇÃO ---
+
+def varrer(pasta, dias=DIAS_RETENCAO, agora=None):
+    """Remove envios mais antigos que `dias` e adota arquivos soltos (uploads antigos, nome original).
+
+    Devolve quantos envios foram removidos.
+    """
+    if not os.path.isdir(pasta):
+        return 0
+    agora = agora or datetime.now()
+    limite = agora.timestamp() - dias * 86400
+
+    # Arquivos gravados antes do manifesto: entram no histórico com a data de modificação
+    conhecidos = set(ler_manifesto(pasta))
+    for arquivo in os.listdir(pasta):
+        base, extensao = os.path.splitext(arquivo)
+        if extensao != ".csv" or base in conhecidos:
+            continue
+        caminho = os.path.join(pasta, arquivo)
+        modificado = os.path.getmtime(caminho)
+        if modificado >= limite:
+            with open(caminho, "rb") as f:
+                conteudo = f.read()
+            # Um <hash>.csv sem entrada (gravação interrompida) é o próprio destino: não apagar
+            if salvar(pasta, conteudo, arquivo, datetime.fromtimestamp(modificado)) == caminho:
+                continue
+        os.remove(caminho)
+
+    removidos = 0
+    with trava_arquivo(caminho_manifesto(pasta)):
+        manifesto = dict(ler_manifesto(pasta))
+        for chave, entrada in list(manifesto.items()):
+            if datetime.fromisoformat(entrada["enviado_em"]).timestamp() >= limite:
+                continue
+            for extensao in (".csv", ".parquet", ".parcial.parquet"):
+                try:
+                    os.remove(os.path.join(pasta, chave + extensao))
+                except FileNotFoundError:
+                    pass
+            del manifesto[chave]
+            removidos += 1
+        if removidos:
+            _gravar_manifesto(pasta, manifesto)
+    return removidos
+
+
+class LimpezaHistorico:
+    """Thread que roda `varrer` a cada `intervalo` segundos (a primeira varredura é imediata)."""
+
+    def __init__(self, pasta, dias=DIAS_RETENCAO, intervalo=INTERVALO_LIMPEZA):
+        self.pasta, self.dias, self.intervalo = pasta, dias, intervalo
+        self.varreduras = 0
+        self.removidos = 0
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._laco, name="limpeza-historico", daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join()
+
+    def _laco(self):
+        while True:
+            try:
+                self.removidos += varrer(self.pasta, self.dias)
+            except Exception:
+                pass  # a limpeza não pode derrubar o app; tenta de novo no próximo ciclo
+            self.varreduras += 1
+            if self._parar.wait(self.intervalo):
+                return
@@ -0,0 +1,44 @@
+"""Importa usuários em lote para o users.csv do ColdSpec.
+
+Uso:
+    python importar_usuarios.py NOVOS.csv [--usuarios users.csv]
+
+O arquivo de entrada precisa das colunas nome, id_login e tipo (separador ';' ou ',').
+Matrículas já cadastradas (ou repetidas no arquivo) são ignoradas; o app
+passa a enxergar os novos usuários no próximo login, sem reiniciar.
+"""
+import argparse
+import sys
+
+import pandas as pd
+
+from dados import detectar_separador
+from indices import importar_usuarios
+
+ARQUIVO_USUARIOS = "users.csv"
+
+
+def ler_planilha(caminho):
+    try:
+        return pd.read_csv(caminho, sep=detectar_separador(caminho, "utf-8-sig"), encoding="utf-8-sig", dtype=str)
+    except UnicodeDecodeError:
+        # Planilha exportada pelo Excel em ANSI
+        return pd.read_csv(caminho, sep=detectar_separador(caminho), encoding="latin1", dtype=str)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("arquivo", help="CSV com as colunas nome, id_login e tipo")
+    parser.add_argument("--usuarios", default=ARQUIVO_USUARIOS)
+    args = parser.parse_args(argv)
+
+    novos = ler_planilha(args.arquivo)
+    try:
+        adicionados = importar_usuarios(args.usuarios, novos)
+    except ValueError as e:
+        raise SystemExit(f"Erro: {e}")
+    print(f"{adicionados} usuário(s) adicionado(s) de {len(novos)} linha(s) em {args.arquivo}.")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""Índices em memória para consultas rápidas (SKU e usuários)."""
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict, defaultdict
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import anexar_linhas, ler_cabecalho
+from dados import ler_sku, ler_usuarios
+
+
+def normalizar_codigo(codigo):
+    """Código como chave: sem espaços e sem o '.0' que o Excel às vezes adiciona."""
+    texto = str(codigo).strip()
+    if texto.endswith(".0") and texto[:-2].isdigit():
+        texto = texto[:-2]
+    return texto
+
+
+def _normalizar_codigos(codigos):
+    """normalizar_codigo vetorizado."""
+    texto = codigos.astype(str).str.strip()
+    com_ponto_zero = texto.str.endswith(".0") & texto.str[:-2].str.isdigit()
+    return texto.where(~com_ponto_zero, texto.str[:-2])
+
+
+def normalizar_texto(texto):
+    texto = unicodedata.normalize("NFKD", str(texto))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.lower().split())
+
+
+def trigramas(texto):
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+# --- ÍNDICE DE SKU ---
+
+MAX_POSTAGEM_TRIGRAMA = 2_000   # códigos guardados por trigrama de descrição (trigrama comum não discrimina)
+MAX_CANDIDATOS = 20_000         # entradas de trigramas somadas por consulta
+MAX_VIZINHOS = 200              # códigos com o mesmo prefixo comparados posição a posição
+MAX_SUGESTOES_CACHE = 256
+
+
+def _normalizar_textos(textos):
+    """normalizar_texto vetorizado (sem acento, minúsculo, espaços simples)."""
+    return (textos.str.normalize("NFKD").str.replace("[\u0300-\u036f]", "", regex=True)
+            .str.lower().str.split().str.join(" "))
+
+
+class IndiceSKU:
+    """Código Promax -> Material.
+
+    Códigos são buscados no dicionário e na lista ordenada (bisect): por
+    prefixo e, para código digitado errado, pelos códigos a uma edição de
+    distância e pelos vizinhos com o maior prefixo em comum.
+    Trigramas indexam só as descrições, com listas limitadas a
+    MAX_POSTAGEM_TRIGRAMA; uma consulta soma no máximo MAX_CANDIDATOS
+    entradas, começando pelos trigramas mais raros. As sugestões ficam num
+    LRU pequeno (o app pede a mesma a cada rerun enquanto o campo não muda).
+    """
+
+    def __init__(self, df_sku):
+        self.materiais = {}
+        if df_sku is not None and not df_sku.empty:
+            codigos = _normalizar_codigos(df_sku.iloc[:, 0])
+            if df_sku.shape[1] > 1:
+                materiais = df_sku.iloc[:, 1].fillna("").astype(str).str.strip()
+            else:
+                materiais = pd.Series("Encontrado", index=df_sku.index)
+            # Em caso de código repetido vale a primeira ocorrência, como no filtro antigo
+            pares = pd.DataFrame({"codigo": codigos.to_numpy(), "material": materiais.to_numpy()})
+            pares = pares[pares["codigo"].notna() & (pares["codigo"] != "")].drop_duplicates("codigo")
+            self.materiais = dict(zip(pares["codigo"], pares["material"]))
+        self.codigos_ordenados = sorted(self.materiais)
+        self._alfabeto = sorted(set("".join(self.codigos_ordenados)))
+        self._por_trigrama = self._indexar_descricoes()
+        self._sugestoes = OrderedDict()
+        self._trava = threading.Lock()
+
+    def _indexar_descricoes(self):
+        """Trigrama -> posições em codigos_ordenados (array de int, no máximo MAX_POSTAGEM_TRIGRAMA)."""
+        materiais = pd.Series([self.materiais[c] for c in self.codigos_ordenados], dtype=object)
+        # Descrição repetida é processada uma vez só
+        grupos, descricoes = pd.factorize(_normalizar_textos(materiais))
+        ordem = np.argsort(grupos, kind="stable")
+        limites = np.searchsorted(grupos[ordem], np.arange(len(descricoes) + 1))
+        postagens = defaultdict(lambda: array("i"))
+        for g, descricao in enumerate(descricoes):
+            if not descricao:
+                continue
+            posicoes = ordem[limites[g]:limites[g + 1]]
+            for tri in trigramas(descricao):
+                lista = postagens[tri]
+                if len(lista) < MAX_POSTAGEM_TRIGRAMA:
+                    lista.extend(posicoes[:MAX_POSTAGEM_TRIGRAMA - len(lista)].tolist())
+        return dict(postagens)
+
+    def __len__(self):
+        return len(self.materiais)
+
+    def buscar(self, codigo):
+        """Busca exata. Retorna o material ou None."""
+        return self.materiais.get(normalizar_codigo(codigo))
+
+    def por_prefixo(self, prefixo, limite=10):
+        prefixo = normalizar_codigo(prefixo)
+        if not prefixo:
+            return []
+        resultado = []
+        i = bisect_left(self.codigos_ordenados, prefixo)
+        while i < len(self.codigos_ordenados) and len(resultado) < limite:
+            codigo = self.codigos_ordenados[i]
+            if not codigo.startswith(prefixo):
+                break
+            resultado.append(codigo)
+            i += 1
+        return resultado
+
+    def _edicoes(self, codigo):
+        """Códigos a uma troca, falta, sobra ou inversão de caractere (só os que existem no catálogo)."""
+        partes = [(codigo[:i], codigo[i:]) for i in range(len(codigo) + 1)]
+        variantes = {a + b[1:] for a, b in partes if b}
+        variantes |= {a + b[1] + b[0] + b[2:] for a, b in partes if len(b) > 1}
+        variantes |= {a + c + b[1:] for a, b in partes if b for c in self._alfabeto}
+        variantes |= {a + c + b for a, b in partes for c in self._alfabeto}
+        variantes.discard(codigo)
+        return sorted(v for v in variantes if v in self.materiais)
+
+    def vizinhos(self, codigo, limite=10):
+        """Códigos parecidos: a uma edição de distância e, para completar, os de maior prefixo em comum."""
+        codigo = normalizar_codigo(codigo)
+        if not codigo:
+            return []
+        achados = self._edicoes(codigo)[:limite]
+        candidatos = []
+        for tamanho in range(len(codigo) - 1, len(codigo) // 2 - 1, -1):
+            candidatos = self.por_prefixo(codigo[:tamanho], MAX_VIZINHOS)
+            if len(candidatos) >= limite:
+                break
+
+        def iguais(outro):
+            return sum(a == b for a, b in zip(codigo, outro)) - abs(len(codigo) - len(outro))
+        achados += [c for c in sorted(candidatos, key=lambda c: (-iguais(c), c)) if c not in achados and c != codigo]
+        return achados[:limite]
+
+    def aproximados(self, consulta, limite=10):
+        """Ranqueia códigos pela proporção de trigramas da descrição em comum com a consulta."""
+        tris = trigramas(normalizar_texto(consulta))
+        postagens = sorted((self._por_trigrama[t] for t in tris if t in self._por_trigrama), key=len)
+        if not postagens:
+            return []
+        pontos, somadas = Counter(), 0
+        for lista in postagens:  # mais raros primeiro: são os que discriminam
+            if somadas + len(lista) > MAX_CANDIDATOS:
+                break
+            pontos.update(lista)
+            somadas += len(lista)
+        melhores = sorted(pontos.items(), key=lambda item: (-item[1], item[0]))[:limite]
+        return [self.codigos_ordenados[i] for i, n in melhores if n / len(tris) >= 0.3]
+
+    def sugerir(self, consulta, limite=5):
+        """Sugestões para autocompletar: por prefixo, vizinhos do código e descrição aproximada."""
+        chave = (normalizar_texto(consulta), limite)
+        with self._trava:
+            if chave in self._sugestoes:
+                self._sugestoes.move_to_end(chave)
+                return self._sugestoes[chave]
+        codigos = self.por_prefixo(consulta, limite)
+        for busca in (self.vizinhos, self.aproximados):
+            if len(codigos) >= limite:
+                break
+            codigos += [c for c in busca(consulta, limite) if c not in codigos]
+        sugestoes = [(c, self.materiais[c]) for c in codigos[:limite]]
+        with self._trava:
+            self._sugestoes[chave] = sugestoes
+            while len(self._sugestoes) > MAX_SUGESTOES_CACHE:
+                self._sugestoes.popitem(last=False)
+        return sugestoes
+
+
+def construir_indice_sku(caminho):
+    """Leitor para o cache de dados: o índice é reconstruído só quando o arquivo muda."""
+    return IndiceSKU(ler_sku(caminho))
+
+
+# --- DIRETÓRIO DE USUÁRIOS ---
+
+MAX_TENTATIVAS_LOGIN = 5
+BLOQUEIO_LOGIN = 5 * 60  # segundos de bloqueio após estourar as tentativas
+MAX_MATRICULAS_CONTROLADAS = 10_000  # matrículas com falhas guardadas (as mais antigas saem)
+
+
+class DiretorioUsuarios:
+    """Matrícula normalizada -> {'nome', 'tipo'} para login em tempo constante."""
+
+    def __init__(self, df_users):
+        self.usuarios = {}
+        self.vazio = df_users is None or df_users.empty
+        self.tem_id_login = df_users is not None and 'id_login' in df_users.columns
+        if self.tem_id_login:
+            nomes = df_users['nome'] if 'nome' in df_users.columns else [""] * len(df_users)
+            tipos = df_users['tipo'] if 'tipo' in df_users.columns else [""] * len(df_users)
+            for id_login, nome, tipo in zip(df_users['id_login'], nomes, tipos):
+                if pd.isna(id_login):
+                    continue
+                chave = normalizar_codigo(id_login)
+                if chave and chave not in self.usuarios:
+                    self.usuarios[chave] = {'nome': nome, 'tipo': tipo}
+
+    def __len__(self):
+        return len(self.usuarios)
+
+    def __contains__(self, id_login):
+        return normalizar_codigo(id_login) in self.usuarios
+
+    def buscar(self, id_login):
+        return self.usuarios.get(normalizar_codigo(id_login))
+
+
+def construir_diretorio_usuarios(caminho):
+    return DiretorioUsuarios(ler_usuarios(caminho))
+
+
+def importar_usuarios(caminho, df_novos):
+    """Importa usuários em lote (colunas nome, id_login, tipo), ignorando matrículas já cadastradas.
+
+    Retorna a quantidade de usuários adicionados.
+    """
+    df_novos = df_novos.copy()
+    df_novos.columns = df_novos.columns.str.strip().str.lower()
+    faltando = {'nome', 'id_login', 'tipo'} - set(df_novos.columns)
+    if faltando:
+        raise ValueError(f"Colunas ausentes: {', '.join(sorted(faltando))}")
+
+    existentes = set()
+    try:
+        existentes = set(construir_diretorio_usuarios(caminho).usuarios)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        pass
+
+    df_novos = df_novos.dropna(subset=['id_login'])
+    df_novos['id_login'] = df_novos['id_login'].map(normalizar_codigo)
+    df_novos = df_novos[~df_novos['id_login'].isin(existentes)].drop_duplicates('id_login')
+    colunas = ler_cabecalho(caminho) or ['nome', 'id_login', 'tipo']
+    return anexar_linhas(caminho, df_novos.to_dict('records'), colunas, tamanho_max=None)
+
+
+class ControleTentativas:
+    """Contador de tentativas de login com falha, por matrícula.
+
+    As entradas ficam em ordem de última falha: as que passaram do tempo de
+    bloqueio expiram e, acima de max_matriculas, as mais antigas saem. Digitar
+    matrículas aleatórias não faz o contador crescer sem limite.
+    """
+
+    def __init__(self, max_tentativas=MAX_TENTATIVAS_LOGIN, bloqueio=BLOQUEIO_LOGIN,
+                 max_matriculas=MAX_MATRICULAS_CONTROLADAS):
+        self.max_tentativas = max_tentativas
+        self.bloqueio = bloqueio
+        self.max_matriculas = max_matriculas
+        self._falhas = OrderedDict()  # matrícula -> (quantidade, instante da última falha)
+        self._trava = threading.Lock()
+
+    def __len__(self):
+        return len(self._falhas)
+
+    def bloqueado(self, id_login):
+        """Segundos restantes de bloqueio (0 se liberado)."""
+        with self._trava:
+            quantidade, ultima = self._falhas.get(normalizar_codigo(id_login), (0, 0.0))
+        if quantidade < self.max_tentativas:
+            return 0
+        return max(0, int(ultima + self.bloqueio - time.time()))
+
+    def registrar_falha(self, id_login):
+        chave = normalizar_codigo(id_login)
+        with self._trava:
+            quantidade, ultima = self._falhas.get(chave, (0, 0.0))
+            agora = time.time()
+            if quantidade >= self.max_tentativas and agora - ultima >= self.bloqueio:
+                quantidade = 0  # bloqueio anterior já expirou
+            self._falhas[chave] = (quantidade + 1, agora)
+            self._falhas.move_to_end(chave)
+            self._expirar(agora)
+            return quantidade + 1
+
+    def _expirar(self, agora):
+        """Descarta do início (falhas mais antigas). Chamar com a trava."""
+        while self._falhas:
+            _, ultima = next(iter(self._falhas.values()))
+            if len(self._falhas) <= self.max_matriculas and agora - ultima < self.bloqueio:
+                break
+            self._falhas.popitem(last=False)
+
+    def registrar_sucesso(self, id_login):
+        with self._trava:
+            self._falhas.pop(normalizar_codigo(id_login), None)
+
+
+tentativas_login = ControleTentativas()
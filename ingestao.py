@@ -0,0 +1,115 @@
+"""Leitura em blocos de CSVs externos de temperatura (exportações do Forms).
+
+Encoding, separador e formato de data são detectados uma única vez a partir
+de uma amostra; o arquivo é então lido em blocos, mantendo só as colunas
+necessárias já convertidas, para que arquivos de centenas de MB não estourem
+a memória do worker do Streamlit.
+"""
+import numpy as np
+import pandas as pd
+
+COL_DATA_FORMS = "Hora de conclusão"
+COL_TEMP_FORMS = "Temperatura da Câmara Fria:"
+COLUNAS_EXTRAS_FORMS = ["Nome", "Conferente coletor:"]
+
+TAMANHO_AMOSTRA = 64 * 1024
+TAMANHO_BLOCO = 100_000  # linhas por bloco
+
+FORMATOS_DATA = [
+    "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%y %H:%M:%S", "%d/%m/%y %H:%M",
+    "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%d/%m/%Y",
+]
+
+
+class ColunasAusentesError(ValueError):
+    """O CSV não tem as colunas de data e temperatura esperadas."""
+
+
+# --- DETECÇÃO (UMA VEZ, PELA AMOSTRA) ---
+
+def detectar_encoding(amostra):
+    # A amostra pode ter cortado um caractere multibyte no final
+    for corte in range(4):
+        try:
+            amostra[:len(amostra) - corte].decode("utf-8")
+            return "utf-8-sig" if amostra.startswith(b"\xef\xbb\xbf") else "utf-8"
+        except UnicodeDecodeError:
+            continue
+    return "latin1"
+
+
+def detectar_separador(cabecalho, candidatos=(";", ",", "\t")):
+    return max(candidatos, key=cabecalho.count)
+
+
+def detectar_formato_data(valores, minimo=0.9):
+    """Primeiro formato de FORMATOS_DATA que converte pelo menos 90% da amostra (None = inferência)."""
+    valores = pd.Series(valores).dropna().astype(str).str.strip()
+    valores = valores[valores != ""]
+    if valores.empty:
+        return None
+    for formato in FORMATOS_DATA:
+        convertidos = pd.to_datetime(valores, format=formato, errors="coerce")
+        if convertidos.notna().mean() >= minimo:
+            return formato
+    return None
+
+
+# --- LEITURA EM BLOCOS ---
+
+def converter_bloco(bloco, col_data, col_temp, formato_data):
+    temperatura = pd.to_numeric(bloco[col_temp].astype(str).str.replace(",", ".", regex=False), errors="coerce")
+    if formato_data:
+        datas = pd.to_datetime(bloco[col_data], format=formato_data, errors="coerce")
+    else:
+        datas = pd.to_datetime(bloco[col_data], dayfirst=True, errors="coerce")
+    convertido = pd.DataFrame({"Datetime": datas, "Temperatura": temperatura.astype(np.float32)}, index=bloco.index)
+    for col in bloco.columns:
+        if col not in (col_data, col_temp):
+            convertido[col] = bloco[col].astype("category")
+    return convertido.dropna(subset=["Datetime", "Temperatura"])
+
+
+def ler_temperaturas(arquivo, col_data=COL_DATA_FORMS, col_temp=COL_TEMP_FORMS,
+                     colunas_extras=COLUNAS_EXTRAS_FORMS, tamanho_bloco=TAMANHO_BLOCO):
+    """Lê um CSV de temperaturas em blocos e devolve Datetime/Temperatura (+ extras), ordenado por Datetime.
+
+    `arquivo` pode ser um caminho ou um objeto binário com seek (ex.: o UploadedFile do Streamlit).
+    """
+    if isinstance(arquivo, str):
+        with open(arquivo, "rb") as binario:
+            return _ler_temperaturas(binario, col_data, col_temp, colunas_extras, tamanho_bloco)
+    arquivo.seek(0)
+    return _ler_temperaturas(arquivo, col_data, col_temp, colunas_extras, tamanho_bloco)
+
+
+def _ler_temperaturas(binario, col_data, col_temp, colunas_extras, tamanho_bloco):
+    amostra = binario.read(TAMANHO_AMOSTRA)
+    encoding = detectar_encoding(amostra)
+    texto_amostra = amostra.decode(encoding, errors="replace")
+    sep = detectar_separador(texto_amostra.splitlines()[0] if texto_amostra else "")
+
+    binario.seek(0)
+    colunas = pd.read_csv(binario, sep=sep, encoding=encoding, nrows=0).columns.str.strip()
+    if col_data not in colunas or col_temp not in colunas:
+        raise ColunasAusentesError(f"O CSV precisa ter as colunas: '{col_data}' e '{col_temp}'")
+    usar = [col_data, col_temp] + [c for c in colunas_extras if c in colunas]
+
+    binario.seek(0)
+    leitor = pd.read_csv(binario, sep=sep, encoding=encoding, dtype=str, chunksize=tamanho_bloco,
+                         usecols=lambda c: c.strip() in usar, on_bad_lines="skip")
+    formato_data = None
+    partes = []
+    for i, bloco in enumerate(leitor):
+        bloco.columns = bloco.columns.str.strip()
+        if i == 0:
+            formato_data = detectar_formato_data(bloco[col_data].head(1000))
+        partes.append(converter_bloco(bloco, col_data, col_temp, formato_data))
+
+    if not partes:
+        return pd.DataFrame(columns=["Datetime", "Temperatura"] + usar[2:])
+    # Blocos com categorias diferentes viram object no concat; reconverte no final
+    df = pd.concat(partes, ignore_index=True)
+    for col in usar[2:]:
+        df[col] = df[col].astype("category")
+    return df.sort_values("Datetime", kind="stable").reset_index(drop=True)
@@ -0,0 +1,86 @@
+"""Migra o histórico em CSV (temperatura e NC) para o backend Parquet ou SQLite.
+
+Uso:
+    python migrar_historico.py [--backend parquet|sqlite] [--destino CAMINHO] [--forcar] [--descartar-invalidas]
+
+Depois da migração, rode o app com COLDSPEC_BACKEND=parquet (ou sqlite).
+Os CSVs originais não são alterados.
+
+Linhas com data/hora que não converte não cabem no layout tipado: elas vão
+para <destino>_quarentena.csv e a migração para (código de saída 1), a não
+ser que --descartar-invalidas seja passado.
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+
+import pandas as pd
+
+from armazenamento import BackendCSV, BackendParquet, BackendSQLite
+
+ARQUIVO_DADOS_TEMP = "dados_temperatura.csv"
+ARQUIVO_DADOS_NC = "dados_nao_conformidade.csv"
+PASTA_PARQUET = "dados_parquet"
+ARQUIVO_SQLITE = "coldspec.db"
+
+
+def tamanho_em_disco(caminho):
+    if os.path.isfile(caminho):
+        return os.path.getsize(caminho)
+    return sum(os.path.getsize(os.path.join(raiz, f)) for raiz, _, arquivos in os.walk(caminho) for f in arquivos)
+
+
+def migrar(arquivo_temp, arquivo_nc, tipo, caminho, forcar=False, descartar_invalidas=False):
+    origem = BackendCSV(arquivo_temp, arquivo_nc)
+    invalidas = origem.linhas_invalidas()
+    if not invalidas.empty:
+        quarentena = f"{os.path.splitext(caminho.rstrip(os.sep))[0]}_quarentena.csv"
+        invalidas.to_csv(quarentena, index=False, sep=";")
+        por_tabela = invalidas["Tabela"].value_counts().to_dict()
+        print(f"{len(invalidas)} linha(s) com data/hora inválida {por_tabela} -> {quarentena}")
+        if not descartar_invalidas:
+            raise SystemExit("Corrija as linhas (ou use --descartar-invalidas) e rode de novo.")
+
+    if os.path.exists(caminho) and (os.path.isfile(caminho) or os.listdir(caminho)):
+        if not forcar:
+            raise SystemExit(f"'{caminho}' já tem dados. Use --forcar para recriar.")
+        if os.path.isfile(caminho):
+            os.remove(caminho)
+        else:
+            shutil.rmtree(caminho)
+
+    destino = BackendParquet(caminho) if tipo == "parquet" else BackendSQLite(caminho)
+
+    inicio = time.perf_counter()
+    camaras = origem.camaras_com_dados()
+    temp = pd.concat([origem.carregar_temp_tipado(camara=c) for c in camaras], ignore_index=True) if camaras else origem.carregar_temp_tipado()
+    nc = origem.carregar_nc_tipado()
+    # Grava tudo em lote (sem passar pelo caminho de uma linha por vez)
+    destino.escrever_tipado("temperatura", temp)
+    destino.escrever_tipado("nao_conformidade", nc)
+    duracao = time.perf_counter() - inicio
+
+    bytes_csv = sum(tamanho_em_disco(a) for a in (arquivo_temp, origem.pasta_temp, arquivo_nc) if os.path.exists(a))
+    print(f"Temperatura: {len(temp)} leituras de {len(camaras)} câmara(s) | NC: {len(nc)} registros | "
+          f"{len(invalidas)} descartada(s) | {duracao:.2f}s")
+    print(f"Tamanho: CSV {bytes_csv / 1024:.1f} KB -> {tipo} {tamanho_em_disco(caminho) / 1024:.1f} KB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--temp", default=ARQUIVO_DADOS_TEMP)
+    parser.add_argument("--nc", default=ARQUIVO_DADOS_NC)
+    parser.add_argument("--backend", choices=["parquet", "sqlite"], default="parquet")
+    parser.add_argument("--destino", help=f"pasta Parquet ou arquivo SQLite (padrão: {PASTA_PARQUET} / {ARQUIVO_SQLITE})")
+    parser.add_argument("--forcar", action="store_true", help="apaga o destino antes de migrar")
+    parser.add_argument("--descartar-invalidas", action="store_true",
+                        help="migra mesmo com linhas de data/hora inválida (elas ficam só na quarentena)")
+    args = parser.parse_args(argv)
+    destino = args.destino or (PASTA_PARQUET if args.backend == "parquet" else ARQUIVO_SQLITE)
+    migrar(args.temp, args.nc, args.backend, destino, args.forcar, args.descartar_invalidas)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""Instrumentação dos reruns: tempo por tela e por etapa (leitura, gravação, agregação, gráfico).
+
+Desligada, cada ponto instrumentado custa só a checagem de uma flag. Ligada,
+as etapas de um rerun são acumuladas na thread da sessão (o Streamlit roda
+cada rerun numa thread) e, no fim do rerun, gravadas de uma vez como uma
+linha JSON em perfil.log. Os últimos reruns ficam em memória para a página
+de Performance calcular p50/p95.
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+
+ARQUIVO_PERFIL = "perfil.log"
+MAX_RERUNS = 2000                    # reruns guardados em memória
+TAMANHO_MAX_LOG = 10 * 1024 * 1024   # perfil.log vira perfil.log.1 ao passar disso
+
+_ativo = os.environ.get("COLDSPEC_PERFIL", "") == "1"
+_local = threading.local()
+_reruns = deque(maxlen=MAX_RERUNS)
+_trava = threading.Lock()
+_NULO = contextlib.nullcontext()
+
+
+def ativo():
+    return _ativo
+
+
+def ativar(ligado=True):
+    global _ativo
+    _ativo = ligado
+
+
+# --- PONTOS DE MEDIÇÃO ---
+
+class _Etapa:
+    __slots__ = ("nome", "inicio")
+
+    def __init__(self, nome):
+        self.nome = nome
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        etapas = getattr(_local, "etapas", None)
+        if etapas is not None:
+            etapas.append((self.nome, (time.perf_counter() - self.inicio) * 1000))
+        return False
+
+
+def etapa(nome):
+    """`with perfil.etapa("grafico_temp"): ...` — fora de um rerun medido não registra nada."""
+    return _Etapa(nome) if _ativo else _NULO
+
+
+def medido(nome=None):
+    """Decorador: mede cada chamada da função como uma etapa (nome padrão: o da função)."""
+    def decorar(funcao):
+        rotulo = nome or funcao.__name__
+
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            if not _ativo:
+                return funcao(*args, **kwargs)
+            with _Etapa(rotulo):
+                return funcao(*args, **kwargs)
+        return medida
+    return decorar
+
+
+@contextlib.contextmanager
+def rerun(tela, usuario=None, caminho=ARQUIVO_PERFIL):
+    """Envolve o rerun inteiro; no fim registra o total e as etapas.
+
+    Devolve o registro do rerun: a tela pode ser trocada depois de conhecida (registro["tela"] = ...).
+    """
+    registro = {"timestamp": datetime.now().isoformat(timespec="milliseconds"), "tela": tela, "usuario": usuario}
+    if not _ativo:
+        yield registro
+        return
+    _local.etapas = []
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        # st.rerun()/st.stop() saem por exceção: o rerun interrompido também conta
+        registro["total_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+        registro["etapas"] = [{"etapa": n, "ms": round(ms, 2)} for n, ms in _local.etapas]
+        _local.etapas = None
+        with _trava:
+            _reruns.append(registro)
+            _gravar(caminho, registro)
+
+
+def _gravar(caminho, registro):
+    try:
+        if os.path.exists(caminho) and os.path.getsize(caminho) >= TAMANHO_MAX_LOG:
+            os.replace(caminho, caminho + ".1")
+        with open(caminho, "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    except OSError:
+        pass  # o log é diagnóstico: não pode derrubar a tela
+
+
+# --- CONSULTAS ---
+
+def ler_log(caminho=ARQUIVO_PERFIL):
+    with open(caminho, "rb") as f:
+        return f.read()
+
+def reruns():
+    with _trava:
+        return list(_reruns)
+
+
+def limpar():
+    with _trava:
+        _reruns.clear()
+
+
+def _percentis(df, grupos, coluna):
+    resumo = df.groupby(grupos)[coluna].agg(
+        execucoes="count",
+        p50=lambda s: s.quantile(0.5),
+        p95=lambda s: s.quantile(0.95),
+        maximo="max",
+        total="sum",
+    )
+    return resumo.sort_values("total", ascending=False).round(1).reset_index()
+
+
+def por_tela(registros=None):
+    """p50/p95 do rerun inteiro por tela (ms)."""
+    registros = reruns() if registros is None else registros
+    if not registros:
+        return pd.DataFrame()
+    return _percentis(pd.DataFrame(registros), "tela", "total_ms")
+
+
+def por_etapa(registros=None):
+    """p50/p95 por (tela, etapa) (ms); uma etapa chamada várias vezes no rerun conta cada chamada."""
+    registros = reruns() if registros is None else registros
+    linhas = [{"tela": r["tela"], "etapa": e["etapa"], "ms": e["ms"]} for r in registros for e in r["etapas"]]
+    if not linhas:
+        return pd.DataFrame()
+    return _percentis(pd.DataFrame(linhas), ["tela", "etapa"], "ms")
@@ -0,0 +1,364 @@
+"""Serviço de ingestão automática de leituras de sensores de temperatura.
+
+Roda fora do Streamlit, como processo separado:
+
+    python servico_sensores.py servir [--porta 8765]
+    python servico_sensores.py simular --camaras 5 --taxa 2000 --duracao 30
+
+`servir` abre um endpoint HTTP local que aceita lotes de leituras em JSON:
+
+    POST /leituras  {"leituras": [{"sensor": "CF-01", "temperatura": 4.2,
+                                    "timestamp": "2025-12-11T19:19:42"}, ...]}
+
+Cada leitura pode indicar a "camara"; sem ela, o id do sensor é usado como
+câmara. O id precisa seguir camaras.PADRAO_ID (vira nome de pasta); um lote
+com id inválido é recusado com 400. O timestamp é ISO 8601: com fuso ("Z",
+"-03:00") é convertido para a hora local sem fuso, como o resto do
+histórico; sem fuso já é hora local; sem timestamp vale a hora do
+recebimento. Timestamp que não converte recusa o lote com 400. O Status usa
+o LIE/LSE da câmara no cadastro (camaras.csv).
+
+As leituras entram numa fila e uma thread grava em lote, a cada meio segundo,
+pelo mesmo backend de armazenamento do app (COLDSPEC_BACKEND), já com o
+Status OK/ERRO calculado de forma vetorizada. Cada lote gravado também é
+publicado no motor de alertas (alertas.py). Lote que falha fica na frente da
+fila e é tentado de novo; se a falha não for de arquivo/disco e se repetir,
+o lote vai para leituras_nao_gravadas.jsonl. SIGTERM (ou Ctrl+C) grava o
+que está na fila antes de sair. `simular` é um sensor de mentira para
+testes: gera leituras de várias câmaras e envia ao serviço.
+"""
+import argparse
+import json
+import os
+import queue
+import random
+import signal
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+from dateutil.tz import tzlocal
+
+import alertas
+import camaras as cadastro_camaras
+from armazenamento import FORMATO_DATA, FORMATO_HORA, criar_backend
+
+# Mesmos arquivos e limites do app.py
+ARQUIVO_DADOS_TEMP = "dados_temperatura.csv"
+ARQUIVO_DADOS_NC = "dados_nao_conformidade.csv"
+PASTA_PARQUET = "dados_parquet"
+ARQUIVO_SQLITE = "coldspec.db"
+ARQUIVO_CAMARAS = "camaras.csv"
+LIE = cadastro_camaras.LIE_PADRAO
+LSE = cadastro_camaras.LSE_PADRAO
+
+PORTA_PADRAO = 8765
+LOTE_MAXIMO = 20_000       # leituras por gravação
+INTERVALO_GRAVACAO = 0.5   # segundos entre gravações
+MAX_TENTATIVAS_LOTE = 5    # falhas que não são de arquivo antes de separar o lote
+ARQUIVO_NAO_GRAVADAS = "leituras_nao_gravadas.jsonl"
+CARGO_SENSOR = "Sensor"
+PADRAO_FUSO = r"(?:[zZ]|[+-]\d{2}:?\d{2})$"   # sufixo de fuso num timestamp ISO 8601
+
+
+def classificar(temperaturas, lie=LIE, lse=LSE):
+    """Status OK/ERRO para um array inteiro de temperaturas (lie/lse podem ser arrays, um por leitura)."""
+    temperaturas = np.asarray(temperaturas, dtype=np.float64)
+    return np.where((temperaturas >= lie) & (temperaturas <= lse), "OK", "ERRO")
+
+
+def converter_timestamps(valores):
+    """Timestamps ISO 8601 -> hora local sem fuso; ausente (None) vira a hora atual.
+
+    Levanta ValueError com os valores que não convertem: nada é recarimbado como "agora".
+    """
+    valores = pd.Series(valores, dtype=object)
+    ausentes = valores.isna()
+    texto = valores.where(~ausentes, "").astype(str).str.strip()
+    com_fuso = texto.str.contains(PADRAO_FUSO)
+    momentos = pd.to_datetime(texto.where(~com_fuso & ~ausentes), errors="coerce", format="ISO8601")
+    if com_fuso.any():
+        utc = pd.to_datetime(texto[com_fuso], errors="coerce", utc=True, format="ISO8601")
+        momentos[com_fuso] = utc.dt.tz_convert(tzlocal()).dt.tz_localize(None)
+    invalidos = momentos.isna() & ~ausentes
+    if invalidos.any():
+        exemplos = ", ".join(repr(v) for v in valores[invalidos].head(3))
+        raise ValueError(f"{int(invalidos.sum())} timestamp(s) inválido(s) (use ISO 8601): {exemplos}")
+    return momentos.fillna(pd.Timestamp.now())
+
+
+def preparar_lote(leituras, lie=LIE, lse=LSE, camaras=None):
+    """Converte leituras recebidas em linhas no layout do histórico de temperatura (+ Camara e Timestamp).
+
+    Com o cadastro `camaras`, cada leitura é classificada pelos limites da sua câmara.
+    """
+    df = pd.DataFrame(leituras)
+    if df.empty or "temperatura" not in df.columns:
+        return pd.DataFrame()
+    df["temperatura"] = pd.to_numeric(df["temperatura"], errors="coerce")
+    if "timestamp" in df.columns:
+        momentos = converter_timestamps(df["timestamp"])
+    else:
+        momentos = pd.Series(pd.Timestamp.now(), index=df.index)
+    sensores = df["sensor"].astype(str) if "sensor" in df.columns else pd.Series("SENSOR", index=df.index)
+    ids_camara = df["camara"].fillna(sensores).astype(str) if "camara" in df.columns else sensores
+    cadastro_camaras.validar_ids(ids_camara)
+    if camaras:
+        unicas = ids_camara.unique()
+        faixa = {c: cadastro_camaras.limites(camaras, c) if c in camaras else (lie, lse) for c in unicas}
+        lie = ids_camara.map({c: f[0] for c, f in faixa.items()}).to_numpy(dtype=np.float64)
+        lse = ids_camara.map({c: f[1] for c, f in faixa.items()}).to_numpy(dtype=np.float64)
+    df = pd.DataFrame({
+        "Usuario": sensores,
+        "Cargo": CARGO_SENSOR,
+        "Data": momentos.dt.strftime(FORMATO_DATA),
+        "Horario": momentos.dt.strftime(FORMATO_HORA),
+        "Temperatura": df["temperatura"].round(1),
+        "Status": classificar(df["temperatura"], lie, lse),
+        "Camara": ids_camara,
+        "Timestamp": momentos,
+    })
+    return df.dropna(subset=["Temperatura"])
+
+
+class ServicoIngestao:
+    """Fila de leituras + thread de gravação em lote."""
+
+    def __init__(self, backend, lie=LIE, lse=LSE, lote_maximo=LOTE_MAXIMO, intervalo=INTERVALO_GRAVACAO,
+                 motor=None, camaras=None, arquivo_nao_gravadas=ARQUIVO_NAO_GRAVADAS):
+        self.backend = backend
+        self.motor = motor
+        self.lie, self.lse = lie, lse
+        self.camaras = camaras
+        self.lote_maximo = lote_maximo
+        self.intervalo = intervalo
+        self.arquivo_nao_gravadas = arquivo_nao_gravadas
+        self.fila = queue.Queue()
+        self.recebidas = 0
+        self.gravadas = 0
+        self.falhas_gravacao = 0
+        self.nao_gravadas = 0
+        self.ultimo_erro = None
+        self._pendente = []     # lote que falhou: sai antes do resto da fila
+        self._tentativas = 0    # falhas seguidas do lote pendente que não foram de arquivo
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._laco_gravacao, name="gravacao-sensores", daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join()
+        self.drenar()
+        restantes = self._retirar_lote(sem_limite=True)
+        if restantes:
+            # Nada some ao encerrar: o que não deu para gravar fica num arquivo para reenviar
+            self._separar(restantes)
+
+    def receber(self, leituras):
+        """Enfileira o lote inteiro ou nada (ValueError se alguma leitura for inválida)."""
+        for leitura in leituras:
+            if not isinstance(leitura, dict):
+                raise ValueError("cada leitura deve ser um objeto JSON")
+            camara = leitura.get("camara")
+            cadastro_camaras.validar_ids([str(camara if camara is not None else leitura.get("sensor", "SENSOR"))])
+        converter_timestamps([leitura.get("timestamp") for leitura in leituras])  # depois do 202 seria tarde
+        for leitura in leituras:
+            self.fila.put(leitura)
+        self.recebidas += len(leituras)
+        return len(leituras)
+
+    def _retirar_lote(self, sem_limite=False):
+        if self._pendente and not sem_limite:
+            lote, self._pendente = self._pendente, []
+            return lote
+        lote, self._pendente = self._pendente, []
+        while sem_limite or len(lote) < self.lote_maximo:
+            try:
+                lote.append(self.fila.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def gravar(self, lote):
+        """Grava o lote; devolve as leituras gravadas ou None se falhou (o lote fica pendente)."""
+        try:
+            linhas = preparar_lote(lote, self.lie, self.lse, self.camaras)
+            if linhas.empty:
+                return 0
+            self.backend.anexar_temp(linhas.drop(columns=["Timestamp"]).to_dict("records"))
+        except Exception as e:
+            self.falhas_gravacao += 1
+            self.ultimo_erro = f"{type(e).__name__}: {e}"
+            if not isinstance(e, OSError):
+                self._tentativas += 1
+            if self._tentativas >= MAX_TENTATIVAS_LOTE:
+                # Erro de dado que se repete: o lote não pode segurar a fila para sempre
+                self._separar(lote)
+            else:
+                # Arquivo travado (ex.: aberto no Excel), disco, trava: tenta de novo no próximo ciclo
+                self._pendente = lote
+            return None
+        self._tentativas = 0
+        self.gravadas += len(linhas)
+        if self.motor is not None:
+            try:
+                self.motor.publicar_lote(linhas["Camara"], linhas["Temperatura"], linhas["Timestamp"])
+            except Exception as e:
+                self.ultimo_erro = f"alertas: {type(e).__name__}: {e}"  # já gravado: não volta para a fila
+        return len(linhas)
+
+    def _separar(self, lote):
+        self._tentativas = 0
+        try:
+            with open(self.arquivo_nao_gravadas, "a", encoding="utf-8") as f:
+                for leitura in lote:
+                    f.write(json.dumps(leitura, ensure_ascii=False, default=str) + "\n")
+        except OSError as e:
+            self.ultimo_erro = f"{type(e).__name__}: {e}"
+            self._pendente = lote  # nem o arquivo de separação deu: continua pendente
+            return
+        self.nao_gravadas += len(lote)
+
+    def drenar(self):
+        while True:
+            lote = self._retirar_lote()
+            if not lote or self.gravar(lote) is None:
+                return
+
+    def _laco_gravacao(self):
+        while not self._parar.wait(self.intervalo):
+            lote = self._retirar_lote()
+            while lote:
+                if self.gravar(lote) is None:
+                    break
+                lote = self._retirar_lote() if len(lote) == self.lote_maximo else []
+
+    def estatisticas(self):
+        return {"recebidas": self.recebidas, "gravadas": self.gravadas,
+                "na_fila": self.fila.qsize() + len(self._pendente), "falhas_gravacao": self.falhas_gravacao,
+                "nao_gravadas": self.nao_gravadas, "ultimo_erro": self.ultimo_erro}
+
+
+# --- HTTP ---
+
+def criar_handler(servico):
+    class Handler(BaseHTTPRequestHandler):
+        def _responder(self, codigo, corpo):
+            dados = json.dumps(corpo).encode("utf-8")
+            self.send_response(codigo)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_GET(self):
+            if self.path == "/saude":
+                self._responder(200, servico.estatisticas())
+            else:
+                self._responder(404, {"erro": "rota não encontrada"})
+
+        def do_POST(self):
+            if self.path != "/leituras":
+                self._responder(404, {"erro": "rota não encontrada"})
+                return
+            try:
+                tamanho = int(self.headers.get("Content-Length", 0))
+                corpo = json.loads(self.rfile.read(tamanho) or b"{}")
+                leituras = corpo.get("leituras", []) if isinstance(corpo, dict) else corpo
+                if not isinstance(leituras, list):
+                    raise ValueError("'leituras' deve ser uma lista")
+                aceitas = servico.receber(leituras)
+            except (ValueError, json.JSONDecodeError) as e:
+                self._responder(400, {"erro": str(e)})
+                return
+            self._responder(202, {"aceitas": aceitas})
+
+        def log_message(self, formato, *args):
+            pass  # uma linha de log por lote de sensor poluiria o terminal
+
+    return Handler
+
+
+def servir(porta=PORTA_PADRAO, backend_nome=None, lie=LIE, lse=LSE, arquivo_alertas=alertas.ARQUIVO_ALERTAS, webhook=None):
+    backend_nome = backend_nome or os.environ.get("COLDSPEC_BACKEND", "csv")
+    backend = criar_backend(backend_nome, ARQUIVO_DADOS_TEMP, ARQUIVO_DADOS_NC, PASTA_PARQUET, ARQUIVO_SQLITE)
+    camaras = cadastro_camaras.ler_camaras(ARQUIVO_CAMARAS) if os.path.exists(ARQUIVO_CAMARAS) else {}
+    sinks = [alertas.SinkArquivo(arquivo_alertas)] + ([alertas.SinkWebhook(webhook)] if webhook else [])
+    regras = alertas.regras_padrao(lie, lse, limites=lambda c: cadastro_camaras.limites(camaras, c) if c in camaras else (lie, lse))
+    motor = alertas.MotorAlertas(regras, sinks).iniciar()
+    servico = ServicoIngestao(backend, lie, lse, motor=motor, camaras=camaras)
+    servico.iniciar()
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), criar_handler(servico))
+    print(f"Recebendo leituras em http://127.0.0.1:{porta}/leituras (backend: {backend_nome})")
+    # shutdown() espera o serve_forever terminar: chamado de outra thread, não do handler
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=servidor.shutdown).start())
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servico.parar()
+        motor.parar()
+        print(f"Encerrado: {servico.estatisticas()}")
+
+
+# --- SENSOR SIMULADO ---
+
+def simular(url, camaras=3, taxa=100, duracao=10, lote=500):
+    """Envia `taxa` leituras/s divididas entre `camaras` sensores, por `duracao` segundos."""
+    temperaturas = {f"CF-{i + 1:02d}": random.uniform(3, 6) for i in range(camaras)}
+    enviadas = 0
+    inicio = time.time()
+    while time.time() - inicio < duracao:
+        ciclo = time.time()
+        leituras = []
+        for _ in range(min(lote, taxa)):
+            sensor = random.choice(list(temperaturas))
+            # Passeio aleatório com excursões ocasionais acima do LSE
+            temperaturas[sensor] += random.gauss(0, 0.1) + (2.0 if random.random() < 0.001 else 0)
+            temperaturas[sensor] += (4.5 - temperaturas[sensor]) * 0.05
+            leituras.append({"sensor": sensor, "temperatura": round(temperaturas[sensor], 2),
+                             "timestamp": datetime.now().isoformat(timespec="seconds")})
+        requisicao = urllib.request.Request(url, data=json.dumps({"leituras": leituras}).encode("utf-8"),
+                                            headers={"Content-Type": "application/json"})
+        urllib.request.urlopen(requisicao).read()
+        enviadas += len(leituras)
+        time.sleep(max(0.0, len(leituras) / taxa - (time.time() - ciclo)))
+    print(f"{enviadas} leituras enviadas em {time.time() - inicio:.1f}s")
+    return enviadas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingestão de leituras de sensores de temperatura")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_servir = sub.add_parser("servir", help="inicia o endpoint HTTP local")
+    p_servir.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    p_servir.add_argument("--backend", choices=["csv", "parquet", "sqlite"])
+    p_servir.add_argument("--lie", type=float, default=LIE)
+    p_servir.add_argument("--lse", type=float, default=LSE)
+    p_servir.add_argument("--alertas", default=alertas.ARQUIVO_ALERTAS, help="arquivo de log dos alertas")
+    p_servir.add_argument("--webhook", help="URL que recebe cada alerta em JSON")
+
+    p_simular = sub.add_parser("simular", help="envia leituras de sensores simulados")
+    p_simular.add_argument("--url", default=f"http://127.0.0.1:{PORTA_PADRAO}/leituras")
+    p_simular.add_argument("--camaras", type=int, default=3)
+    p_simular.add_argument("--taxa", type=int, default=100, help="leituras por segundo")
+    p_simular.add_argument("--duracao", type=float, default=10, help="segundos")
+
+    args = parser.parse_args(argv)
+    if args.comando == "servir":
+        servir(args.porta, args.backend, args.lie, args.lse, args.alertas, args.webhook)
+    else:
+        simular(args.url, args.camaras, args.taxa, args.duracao)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+from alertas import MotorAlertas, RegraConsecutivos, RegraTaxaSubida, RegraTempoAcima, SinkArquivo, ler_recentes
+
+INICIO = datetime(2026, 1, 5, 8, 0)
+
+
+def _leituras(temperaturas, passo_segundos=60):
+    return [{"timestamp": INICIO + timedelta(seconds=i * passo_segundos), "temperatura": t}
+            for i, t in enumerate(temperaturas)]
+
+
+def _disparos(regra, temperaturas, chave="camara1", passo_segundos=60):
+    return [i for i, leitura in enumerate(_leituras(temperaturas, passo_segundos))
+            if regra.avaliar(chave, leitura) is not None]
+
+
+def test_consecutivos_dispara_uma_vez_por_sequencia():
+    regra = RegraConsecutivos(3, 0, 4)
+    assert _disparos(regra, [2, 5, 6, 7, 8, 9, 2, -1, 5, 2]) == [3]
+    regra = RegraConsecutivos(3, 0, 4)
+    assert _disparos(regra, [5, 5, 5, 2, 5, 5, 5]) == [2, 6]
+
+
+def test_consecutivos_conta_por_chave():
+    regra = RegraConsecutivos(2, 0, 4)
+    leituras = _leituras([5, 5])
+    assert regra.avaliar("a", leituras[0]) is None
+    assert regra.avaliar("b", leituras[0]) is None
+    assert regra.avaliar("a", leituras[1])["chave"] == "a"
+
+
+def test_tempo_acima_dispara_depois_da_duracao_e_rearma_ao_voltar():
+    regra = RegraTempoAcima(15, 4)
+    temperaturas = [5] * 20 + [3] + [5] * 16
+    # 1ª subida começa em 0 (dispara aos 15 min); volta em 20; 2ª começa em 21 (dispara em 36)
+    assert _disparos(regra, temperaturas) == [15, 36]
+
+
+def test_tempo_acima_usa_limites_por_chave():
+    regra = RegraTempoAcima(1, 4, limites=lambda chave: (None, 10 if chave == "congelado" else 4))
+    assert _disparos(regra, [6, 6, 6], chave="congelado") == []
+    assert _disparos(regra, [6, 6, 6], chave="resfriado") == [1]
+
+
+def test_taxa_subida_detecta_rampa():
+    regra = RegraTaxaSubida(0.5, janela_minutos=5)
+    # 1ºC/min a cada 30 s: detecta assim que a janela cobre o span mínimo
+    disparos = _disparos(regra, [2 + 0.5 * i for i in range(20)], passo_segundos=30)
+    assert disparos == [4]
+
+
+def test_taxa_subida_ignora_ruido_entre_leituras_proximas():
+    regra = RegraTaxaSubida(0.5, janela_minutos=5)
+    aleatorio = random.Random(1)
+    temperaturas = [2 + aleatorio.uniform(-0.4, 0.4) for _ in range(2000)]
+    assert _disparos(regra, temperaturas, passo_segundos=5) == []
+
+
+def _rampas(taxas, minutos=8):
+    temperaturas = [2.0]
+    for taxa in taxas:
+        temperaturas += [temperaturas[-1] + taxa * i for i in range(1, minutos + 1)]
+    return temperaturas
+
+
+def test_taxa_subida_so_rearma_quando_a_taxa_cai():
+    # Taxa oscilando em volta do limite (1 -> 0,4 -> 1ºC/min) não repete o alerta...
+    oscilando = _rampas([1, 0.4, 1])
+    assert len(_disparos(RegraTaxaSubida(0.5, janela_minutos=5, rearme=0.5), oscilando)) == 1
+    assert len(_disparos(RegraTaxaSubida(0.5, janela_minutos=5, rearme=1), oscilando)) == 2
+    # ...mas uma nova subida depois de estabilizar, sim
+    assert len(_disparos(RegraTaxaSubida(0.5, janela_minutos=5, rearme=0.5), _rampas([1, 0, 1]))) == 2
+
+
+def test_alerta_de_leitura_com_fuso_fica_em_hora_local(tmp_path):
+    caminho = str(tmp_path / "alertas.log")
+    motor = MotorAlertas([RegraConsecutivos(1, 0, 4)], [SinkArquivo(caminho)])
+    motor.avaliar("CF-01", {"temperatura": 9.0, "timestamp": datetime.now(timezone.utc)})
+    total, recentes = ler_recentes(caminho, desde=datetime.now() - timedelta(hours=1))
+    assert total == 1
+    assert datetime.fromisoformat(recentes[0]["timestamp"]).tzinfo is None
+
+
+def test_ler_recentes_segue_a_ordem_de_registro(tmp_path):
+    caminho = tmp_path / "alertas.log"
+    agora = datetime.now()
+    linhas = [
+        {"chave": "CF-01", "timestamp": (agora - timedelta(minutes=10)).isoformat(), "mensagem": "a"},
+        # Reenvio de leituras de ontem: alerta novo com timestamp antigo
+        {"chave": "CF-02", "timestamp": (agora - timedelta(days=1)).isoformat(),
+         "registrado_em": (agora - timedelta(minutes=5)).isoformat(), "mensagem": "b"},
+        # Log antigo com fuso e linha sem data legível não derrubam a leitura
+        {"chave": "CF-03", "timestamp": datetime.now(timezone.utc).isoformat(), "mensagem": "c"},
+        {"chave": "CF-04", "timestamp": "ontem", "mensagem": "d"},
+    ]
+    caminho.write_text("".join(json.dumps(linha) + "\n" for linha in linhas), encoding="utf-8")
+    total, recentes = ler_recentes(str(caminho), desde=agora - timedelta(hours=1))
+    assert total == 3
+    assert [a["mensagem"] for a in recentes] == ["a", "b", "c"]
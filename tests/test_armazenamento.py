@@ -0,0 +1,30 @@
+import os
+import time
+
+import pytest
+
+import armazenamento
+
+
+def test_trava_respeita_o_timeout_com_tomada_orfa(tmp_path):
+    caminho = str(tmp_path / "dados.csv")
+    antigo = time.time() - 2 * armazenamento.TRAVA_ABANDONADA
+    for sufixo, instante in ((".lock", antigo), (".lock.tomada", time.time())):
+        open(caminho + sufixo, "w").close()
+        os.utime(caminho + sufixo, (instante, instante))
+
+    inicio = time.time()
+    with pytest.raises(armazenamento.ArquivoTravadoError):
+        with armazenamento.trava_arquivo(caminho, timeout=0.3):
+            pass
+    assert time.time() - inicio < 2
+
+
+def test_trava_abandonada_e_tomada(tmp_path):
+    caminho = str(tmp_path / "dados.csv")
+    open(caminho + ".lock", "w").close()
+    antigo = time.time() - 2 * armazenamento.TRAVA_ABANDONADA
+    os.utime(caminho + ".lock", (antigo, antigo))
+    with armazenamento.trava_arquivo(caminho, timeout=1):
+        assert os.path.exists(caminho + ".lock")
+    assert not os.path.exists(caminho + ".lock")
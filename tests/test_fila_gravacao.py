@@ -0,0 +1,113 @@
+import json
+import os
+
+import fila_gravacao
+from fila_gravacao import FilaGravacao
+
+
+class Gravador:
+    """Gravador de teste: guarda os registros e falha com os erros da lista `falhas`, em ordem."""
+
+    def __init__(self, falhas=()):
+        self.registros = []
+        self.falhas = list(falhas)
+
+    def __call__(self, registros):
+        if self.falhas:
+            raise self.falhas.pop(0)
+        self.registros.extend(registros)
+
+
+def _fila(tmp_path, gravador):
+    return FilaGravacao({"nc": gravador}, caminho=str(tmp_path / "fila.jsonl"), fsync=False)
+
+
+def test_releitura_grava_o_que_ficou_no_log(tmp_path):
+    fila = _fila(tmp_path, Gravador())
+    fila.enfileirar("nc", {"i": 1})
+    fila.enfileirar("nc", {"i": 2})
+
+    gravador = Gravador()
+    reaberta = _fila(tmp_path, gravador)   # app caiu antes de descarregar
+    assert reaberta.pendentes() == 2
+    assert reaberta.descarregar()
+    assert gravador.registros == [{"i": 1}, {"i": 2}]
+    assert _fila(tmp_path, Gravador()).pendentes() == 0
+
+
+def test_releitura_nao_repete_lote_confirmado(tmp_path, monkeypatch):
+    gravador = Gravador()
+    fila = _fila(tmp_path, gravador)
+    fila.enfileirar("nc", {"i": 1})
+
+    def replace_travado(*_):
+        raise PermissionError("arquivo em uso")
+    monkeypatch.setattr(fila_gravacao.os, "replace", replace_travado)
+    assert fila.descarregar()            # compactação falhou, confirmação ficou no log
+    monkeypatch.undo()
+
+    reaberta = _fila(tmp_path, gravador)
+    assert reaberta.pendentes() == 0
+    reaberta.descarregar()
+    assert gravador.registros == [{"i": 1}]
+
+
+def test_linha_cortada_no_fim_do_log(tmp_path):
+    fila = _fila(tmp_path, Gravador())
+    fila.enfileirar("nc", {"i": 1})
+    with open(fila.caminho, "a", encoding="utf-8") as f:
+        f.write('{"id": 7, "tipo": "nc", "regis')   # queda no meio da escrita
+
+    reaberta = _fila(tmp_path, Gravador())
+    assert reaberta.pendentes() == 1
+    reaberta.enfileirar("nc", {"i": 2})            # não pode colar na linha cortada
+    assert [e["registro"] for e in _fila(tmp_path, Gravador())._pendentes] == [{"i": 1}, {"i": 2}]
+
+
+def test_registro_recusado_vai_para_rejeitados(tmp_path):
+    gravador = Gravador(falhas=[ValueError("coluna inválida")] * (2 * fila_gravacao.MAX_TENTATIVAS_DADOS))
+    fila = _fila(tmp_path, gravador)
+    fila.enfileirar("nc", {"i": 1})
+
+    for _ in range(fila_gravacao.MAX_TENTATIVAS_DADOS):
+        assert not fila.descarregar()
+    assert fila.pendentes() == 0
+    assert fila.rejeitados == 1
+    with open(fila.caminho + ".rejeitados", encoding="utf-8") as f:
+        rejeitado = json.loads(f.readline())
+    assert rejeitado["registro"] == {"i": 1}
+    assert "coluna inválida" in rejeitado["erro"]
+
+
+def test_permission_error_mantem_lote_e_tenta_de_novo(tmp_path):
+    gravador = Gravador(falhas=[PermissionError("aberto no Excel")])
+    fila = _fila(tmp_path, gravador)
+    fila.enfileirar("nc", {"i": 1})
+
+    assert not fila.descarregar()
+    assert fila.pendentes() == 1
+    assert "PermissionError" in fila.ultimo_erro
+    assert fila.descarregar()
+    assert fila.pendentes() == 0
+    assert gravador.registros == [{"i": 1}]
+    assert fila.ultimo_erro is None
+    assert not os.path.exists(fila.caminho + ".rejeitados")
+
+
+def test_grupo_travado_nao_repete_os_grupos_ja_gravados(tmp_path):
+    gravados = []
+
+    def gravador(registros):
+        if any(r["camara"] == "CF-02" for r in registros) and len(gravados) < 4:
+            gravados.append(None)  # CF-02 aberto no Excel nas 4 primeiras tentativas
+            raise PermissionError("aberto no Excel")
+        gravados.extend(registros)
+
+    fila = FilaGravacao({"temp": gravador}, caminho=str(tmp_path / "fila.jsonl"), fsync=False,
+                        agrupar=lambda registro: registro["camara"])
+    fila.enfileirar("temp", {"camara": "CF-01"})
+    fila.enfileirar("temp", {"camara": "CF-02"})
+    for _ in range(5):
+        fila.descarregar()
+    assert fila.pendentes() == 0
+    assert [r for r in gravados if r] == [{"camara": "CF-01"}, {"camara": "CF-02"}]
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from indices import IndiceSKU
+
+
+def _indice():
+    return IndiceSKU(pd.DataFrame({
+        "Código Promax": ["90000104", "90000119", "90000101", "101489", "101490", "90000104"],
+        "Material": [" AG CERVEJA LITRÃO INTEGRAL ", " AG LITRINHO CX 23 INTEGRAL ", " AG SKOL 1/1 ",
+                     " BARRIL CHOPP 30L ", " BARRIL CHOPP 50L ", " REPETIDO "],
+    }))
+
+
+def test_busca_exata_e_por_prefixo():
+    indice = _indice()
+    assert indice.buscar("90000104.0") == "AG CERVEJA LITRÃO INTEGRAL"  # código repetido: vale o primeiro
+    assert indice.por_prefixo("1014") == ["101489", "101490"]
+
+
+def test_codigo_digitado_errado_sugere_os_vizinhos():
+    indice = _indice()
+    assert indice.sugerir("90001104", limite=1) == [("90000104", "AG CERVEJA LITRÃO INTEGRAL")]  # troca
+    assert indice.sugerir("9000104", limite=1)[0][0] == "90000104"                                # falta
+    assert indice.sugerir("90000140", limite=1)[0][0] == "90000104"                               # inversão
+
+
+def test_descricao_aproximada_sem_acento():
+    codigos = [codigo for codigo, _ in _indice().sugerir("cerveja litrao", limite=2)]
+    assert codigos[0] == "90000104"
+    assert [codigo for codigo, _ in _indice().sugerir("barril chop", limite=2)] == ["101489", "101490"]
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from servico_sensores import ServicoIngestao, converter_timestamps
+
+
+def test_timestamp_com_fuso_vira_hora_local_sem_fuso():
+    local = datetime.fromisoformat("2026-10-17T19:19:40+00:00").astimezone().replace(tzinfo=None)
+    momentos = converter_timestamps(["2026-10-17T19:19:40Z", "2026-10-17T16:19:40-03:00", local.isoformat()])
+    assert momentos.dt.tz is None
+    assert momentos.tolist() == [pd.Timestamp(local)] * 3
+
+
+def test_timestamp_invalido_recusa_o_lote_inteiro():
+    servico = ServicoIngestao(backend=None)
+    with pytest.raises(ValueError, match="timestamp"):
+        servico.receber([{"sensor": "CF-01", "temperatura": 4.0, "timestamp": "2026-10-17T19:19:40Z"},
+                         {"sensor": "CF-01", "temperatura": 4.1, "timestamp": "ontem"}])
+    assert servico.fila.qsize() == 0
+
+
+def test_sem_timestamp_vale_a_hora_do_recebimento():
+    antes = pd.Timestamp.now()
+    assert converter_timestamps([None])[0] >= antes